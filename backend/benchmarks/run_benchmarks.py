@@ -0,0 +1,240 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+
+from route_recommendation.benchmarks.synthetic import (
+    synthetic_network,
+    synthetic_pois,
+    synthetic_profiles,
+    synthetic_routes,
+)
+from route_recommendation.src.data.download_osm import load_network
+from route_recommendation.src.data.extract_road_features import extract_edge_features
+from route_recommendation.src.data.simulate_traffic import simulate_current_traffic
+from route_recommendation.src.features.poi_features import add_poi_features_to_routes, calculate_poi_proximity
+from route_recommendation.src.features.route_features import RouteFeatureExtractor, to_ragged
+from route_recommendation.src.models.profile_store import ProfileStore
+from route_recommendation.src.models.road_graph import RoadGraph
+from route_recommendation.src.models.user_profile import UserProfile
+
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_REPEAT = 5
+
+# POIs per edge and routes scored per size
+POIS_PER_EDGE = 0.05
+N_ROUTES = 500
+
+# Slowdown (relative to the baseline median) reported as a regression
+REGRESSION_THRESHOLD = 0.25
+
+# Fixed traffic time so runs are comparable
+TRAFFIC_TIME = datetime(2024, 2, 5, 8, 0)
+
+
+def measure(func, repeat=DEFAULT_REPEAT):
+    """
+    Time func() repeat times (after one warm-up call), silencing its prints
+
+    Returns:
+        Dictionary with min, median, mean and max seconds
+    """
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return {
+        'min': min(times),
+        'median': float(np.median(times)),
+        'mean': float(np.mean(times)),
+        'max': max(times),
+        'repeat': repeat,
+    }
+
+
+def network_benchmarks(n_edges, layout, workdir):
+    """Benchmarks that scale with the network size: yields (name, counts, func)"""
+    G = synthetic_network(n_edges, layout)
+    pois = synthetic_pois(G, max(10, int(n_edges * POIS_PER_EDGE)))
+    routes = synthetic_routes(G, N_ROUTES)
+
+    pickle_path = os.path.join(workdir, 'network.pkl')
+    with open(pickle_path, 'wb') as f:
+        pickle.dump(G, f)
+    graph_dir = os.path.join(workdir, 'network.graph')
+    RoadGraph.from_networkx(G).save(graph_dir)
+    features_path = os.path.join(workdir, 'edge_features.parquet')
+    graph = RoadGraph.from_networkx(G)
+    extractor = RouteFeatureExtractor(graph)
+    route_edges = to_ragged([[graph.edge_index(u, v) for u, v in zip(nodes[:-1], nodes[1:])]
+                             for nodes in routes['nodes']])
+
+    benchmarks = {
+        'graph_load_pickle': lambda: load_network(pickle_path),
+        'graph_load_mmap': lambda: RoadGraph.load(graph_dir),
+        'road_graph_from_networkx': lambda: RoadGraph.from_networkx(G),
+        'simulate_current_traffic': lambda: simulate_current_traffic(G, TRAFFIC_TIME, rng=0),
+        'extract_edge_features': lambda: extract_edge_features(G, save_path=features_path),
+        'calculate_poi_proximity': lambda: calculate_poi_proximity(routes.geometry.iloc[0], pois),
+        'add_poi_features_to_routes': lambda: add_poi_features_to_routes(routes.copy(), pois),
+        'route_features': lambda: extractor.extract(*route_edges),
+    }
+    counts = {'edges': G.number_of_edges(), 'nodes': G.number_of_nodes(), 'pois': len(pois), 'routes': len(routes)}
+    for name, func in benchmarks.items():
+        yield name, counts, func
+
+
+def profile_benchmarks(n_users, workdir):
+    """Profile persistence, per-user JSON files and the SQLite store: yields (name, counts, func)"""
+    profiles = synthetic_profiles(n_users)
+    json_dir = os.path.join(workdir, 'profiles')
+    db_path = os.path.join(workdir, 'profiles.sqlite')
+
+    def save_json():
+        for profile in profiles:
+            profile.save(os.path.join(json_dir, f'{profile.user_id}.json'))
+
+    def load_json():
+        return [UserProfile.load(os.path.join(json_dir, name)) for name in sorted(os.listdir(json_dir))]
+
+    def save_store():
+        with ProfileStore(db_path) as store:
+            store.save_profiles(profiles)
+
+    def load_store():
+        with ProfileStore(db_path) as store:
+            return store.preference_matrix()
+
+    save_json()
+    save_store()
+    benchmarks = {
+        'profile_save_json': save_json,
+        'profile_load_json': load_json,
+        'profile_save_store': save_store,
+        'profile_load_store': load_store,
+    }
+    counts = {'users': n_users, 'history_per_user': len(profiles[0].history)}
+    for name, func in benchmarks.items():
+        yield name, counts, func
+    for profile in profiles:
+        profile.store = None
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, layout='grid', n_users=1_000, repeat=DEFAULT_REPEAT, only=None):
+    """
+    Run the suite on synthetic data (no network access needed)
+
+    Args:
+        sizes: Network sizes in edges
+        layout: 'grid' or 'radial' (see synthetic_network)
+        n_users: Profiles for the persistence benchmarks
+        repeat: Timed calls per benchmark
+        only: Optional list of benchmark names to run
+
+    Returns:
+        Dictionary with 'meta' (commit, versions, parameters) and 'results'
+        (one entry per benchmark and size)
+    """
+    results = []
+
+    def record(name, size, counts, func):
+        if only is not None and name not in only:
+            return
+        stats = measure(func, repeat)
+        results.append({'benchmark': name, 'size': size, **counts, **stats})
+        print(f"  {name:<28} {size:>9,}  median {stats['median'] * 1000:10.2f} ms")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"\nNetwork with ~{size:,} edges ({layout})")
+            for name, counts, func in network_benchmarks(size, layout, workdir):
+                record(name, size, counts, func)
+        print(f"\nProfiles ({n_users:,} users)")
+        for name, counts, func in profile_benchmarks(n_users, workdir):
+            record(name, n_users, counts, func)
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'layout': layout,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Median timings of two runs side by side
+
+    Returns:
+        List of (benchmark, size, baseline seconds, current seconds, ratio)
+        for the benchmarks slower than (1 + threshold) times the baseline
+    """
+    previous = {(r['benchmark'], r['size']): r['median'] for r in baseline['results']}
+    regressions = []
+    print(f"\nComparison with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    for r in current['results']:
+        key = (r['benchmark'], r['size'])
+        if key not in previous:
+            continue
+        ratio = r['median'] / previous[key]
+        flag = '  REGRESSION' if ratio > 1 + threshold else ''
+        print(f"  {r['benchmark']:<28} {r['size']:>9,}  {ratio:6.2f}x{flag}")
+        if flag:
+            regressions.append((*key, previous[key], r['median'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hot paths on synthetic road networks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="network sizes in edges")
+    parser.add_argument('--layout', choices=['grid', 'radial'], default='grid')
+    parser.add_argument('--users', type=int, default=1_000, help="profiles for the persistence benchmarks")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--only', nargs='+', help="benchmark names to run")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.layout, args.users, args.repeat, args.only)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
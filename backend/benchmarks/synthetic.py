@@ -0,0 +1,212 @@
+import math
+import networkx as nx
+import numpy as np
+import geopandas as gpd
+
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS, UserProfile
+from route_recommendation.src.routing.search import haversine
+
+
+# Victory Square, Timisoara
+CENTER = (21.2272, 45.7489)  # (lon, lat)
+
+# Spacing between neighbouring intersections (degrees, roughly 150 m)
+SPACING = 0.0015
+
+# Speed per road class, as ox.add_edge_speeds would impute it
+SPEEDS = {'primary': 60.0, 'secondary': 50.0, 'tertiary': 40.0, 'residential': 30.0}
+
+# Share of street segments that are one-way
+ONEWAY_SHARE = 0.15
+
+# Categories and the OSM tags they come from (see download_pois)
+POI_CATEGORIES = {
+    'parks': ('leisure', 'park'),
+    'restaurants': ('amenity', 'restaurant'),
+    'gas_stations': ('amenity', 'fuel'),
+    'hospitals': ('amenity', 'hospital'),
+    'historic': ('historic', 'memorial'),
+}
+
+
+def _grid_layout(n_edges, rng):
+    """Perturbed grid: every 8th street is primary, every 4th secondary"""
+    side = max(2, math.ceil(math.sqrt(n_edges / 4)) + 1)
+    i, j = np.divmod(np.arange(side * side), side)
+    x = CENTER[0] + (j - side / 2) * SPACING + rng.uniform(-0.2, 0.2, side * side) * SPACING
+    y = CENTER[1] + (i - side / 2) * SPACING + rng.uniform(-0.2, 0.2, side * side) * SPACING
+
+    def road_class(line):
+        return np.where(line % 8 == 0, 'primary', np.where(line % 4 == 0, 'secondary',
+                        np.where(line % 2 == 0, 'tertiary', 'residential')))
+
+    node = np.arange(side * side).reshape(side, side)
+    u = np.concatenate([node[:, :-1].ravel(), node[:-1, :].ravel()])
+    v = np.concatenate([node[:, 1:].ravel(), node[1:, :].ravel()])
+    highway = np.concatenate([np.repeat(road_class(np.arange(side)), side - 1),
+                              np.tile(road_class(np.arange(side)), side - 1)])
+    return x, y, u, v, highway
+
+
+def _radial_layout(n_edges, rng):
+    """Ring roads and spokes around the center: spokes are primary, every 4th ring secondary"""
+    rings = max(2, math.ceil(math.sqrt(n_edges / 8)))
+    spokes = max(4, 2 * rings)
+    ring, spoke = np.divmod(np.arange(rings * spokes), spokes)
+    radius = (ring + 1) * SPACING * (1 + rng.uniform(-0.1, 0.1, rings * spokes))
+    angle = 2 * np.pi * spoke / spokes
+    x = np.concatenate([[CENTER[0]], CENTER[0] + radius * np.cos(angle) / np.cos(np.radians(CENTER[1]))])
+    y = np.concatenate([[CENTER[1]], CENTER[1] + radius * np.sin(angle)])
+
+    node = 1 + np.arange(rings * spokes).reshape(rings, spokes)
+    u = np.concatenate([node.ravel(), np.zeros(spokes, dtype=np.int64), node[:-1].ravel()])
+    v = np.concatenate([np.roll(node, -1, axis=1).ravel(), node[0], node[1:].ravel()])
+    ring_class = np.where(np.arange(rings) % 4 == 3, 'secondary', 'residential')
+    spoke_class = np.where(np.arange(spokes) % 4 == 0, 'primary', 'tertiary')
+    highway = np.concatenate([np.repeat(ring_class, spokes), spoke_class, np.tile(spoke_class, rings - 1)])
+    return x, y, u, v, highway
+
+
+def synthetic_network(n_edges, layout='grid', seed=0):
+    """
+    OSMnx-shaped street network of about n_edges directed edges
+
+    Nodes carry x, y and street_count; edges carry osmid, highway, oneway,
+    lanes (sometimes), name, length, speed_kph and travel_time, as after
+    ox.graph_from_place + add_edge_speeds + add_edge_travel_times.
+
+    Args:
+        n_edges: Approximate number of directed edges
+        layout: 'grid' or 'radial'
+        seed: Random seed
+
+    Returns:
+        NetworkX MultiDiGraph (crs EPSG:4326)
+    """
+    rng = np.random.default_rng(seed)
+    if layout == 'grid':
+        x, y, u, v, highway = _grid_layout(n_edges, rng)
+    elif layout == 'radial':
+        x, y, u, v, highway = _radial_layout(n_edges, rng)
+    else:
+        raise ValueError(f"Unknown layout '{layout}', expected 'grid' or 'radial'")
+
+    # Both directions except for one-way residential/tertiary streets
+    oneway = (rng.random(len(u)) < ONEWAY_SHARE) & np.isin(highway, ['residential', 'tertiary'])
+    flip = rng.random(len(u)) < 0.5
+    u, v = np.where(flip & oneway, v, u), np.where(flip & oneway, u, v)
+    two_way = ~oneway
+    segment = np.concatenate([np.arange(len(u)), np.flatnonzero(two_way)])
+    tails = np.concatenate([u, v[two_way]])
+    heads = np.concatenate([v, u[two_way]])
+
+    length = haversine(x[tails], y[tails], x[heads], y[heads]) * rng.uniform(1.0, 1.15, len(segment))[segment]
+    highway = highway[segment]
+    speed = np.array([SPEEDS[h] for h in highway.tolist()])
+    travel_time = length / (speed / 3.6)
+    lanes = np.where(highway == 'primary', '3', np.where(highway == 'secondary', '2', None))
+    osmid = 1_000_000 + segment
+
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    degree = np.bincount(np.concatenate([u, v]), minlength=len(x))
+    G.add_nodes_from((i, {'x': float(x[i]), 'y': float(y[i]), 'street_count': int(degree[i])})
+                     for i in range(len(x)))
+
+    rows = zip(tails.tolist(), heads.tolist(), osmid.tolist(), highway.tolist(), oneway[segment].tolist(),
+               lanes.tolist(), length.tolist(), speed.tolist(), travel_time.tolist())
+    edges = []
+    for tail, head, way, road, is_oneway, lane_count, meters, kph, seconds in rows:
+        data = {'osmid': way, 'highway': road, 'oneway': is_oneway, 'reversed': False,
+                'name': f'Strada {way % 997}', 'length': meters, 'speed_kph': kph, 'travel_time': seconds}
+        if lane_count is not None:
+            data['lanes'] = lane_count
+        edges.append((tail, head, data))
+    G.add_edges_from(edges)
+    return G
+
+
+def synthetic_pois(G, n_pois, seed=0):
+    """
+    POIs scattered over the network's bounding box
+
+    Args:
+        G: Network from synthetic_network (or any graph with x/y nodes)
+        n_pois: Number of POIs
+        seed: Random seed
+
+    Returns:
+        GeoDataFrame (EPSG:4326) with category, name and the OSM tag
+        columns download_pois would keep
+    """
+    rng = np.random.default_rng(seed)
+    x = np.fromiter((data['x'] for _, data in G.nodes(data=True)), dtype=float)
+    y = np.fromiter((data['y'] for _, data in G.nodes(data=True)), dtype=float)
+
+    categories = np.array(list(POI_CATEGORIES))[rng.integers(len(POI_CATEGORIES), size=n_pois)]
+    columns = {'category': categories, 'name': [f'POI {i}' for i in range(n_pois)]}
+    for key in {key for key, _ in POI_CATEGORIES.values()}:
+        columns[key] = [POI_CATEGORIES[c][1] if POI_CATEGORIES[c][0] == key else None for c in categories]
+    points = gpd.points_from_xy(rng.uniform(x.min(), x.max(), n_pois), rng.uniform(y.min(), y.max(), n_pois))
+    return gpd.GeoDataFrame(columns, geometry=points, crs='EPSG:4326')
+
+
+def synthetic_routes(G, n_routes, n_edges=30, seed=0):
+    """
+    Random walks used as candidate routes
+
+    Returns:
+        GeoDataFrame (EPSG:4326) with a LineString 'geometry' and the walked
+        'nodes' per route
+    """
+    from shapely.geometry import LineString
+
+    rng = np.random.default_rng(seed)
+    nodes = list(G.nodes)
+    routes = []
+    while len(routes) < n_routes:
+        walk = [nodes[rng.integers(len(nodes))]]
+        for _ in range(n_edges):
+            successors = list(G.successors(walk[-1]))
+            if not successors:
+                break
+            walk.append(successors[rng.integers(len(successors))])
+        if len(walk) > 1:
+            routes.append(walk)
+    geometries = [LineString([(G.nodes[n]['x'], G.nodes[n]['y']) for n in walk]) for walk in routes]
+    return gpd.GeoDataFrame({'nodes': routes}, geometry=geometries, crs='EPSG:4326')
+
+
+def synthetic_profiles(n_users, history_length=20, seed=0):
+    """
+    User profiles with random preferences, constraints and route history
+
+    Returns:
+        List of UserProfile
+    """
+    rng = np.random.default_rng(seed)
+    profiles = []
+    for i in range(n_users):
+        user = UserProfile(user_id=f'user-{seed}-{i:06d}',
+                           preferences=dict(zip(PREFERENCE_KEYS, rng.dirichlet(np.ones(len(PREFERENCE_KEYS))))),
+                           constraints={'max_time': [None, 30, 45][i % 3], 'max_distance': None,
+                                        'avoid_highways': bool(i % 4 == 0), 'prefer_bike_lanes': False})
+        for _ in range(history_length):
+            routes = rng.uniform(100, 1000, size=(4, len(PREFERENCE_KEYS))).round(1)
+            user.add_route_to_history(int(rng.integers(1_000)), int(rng.integers(1_000)),
+                                      {'features': routes[0].tolist()},
+                                      [{'features': r.tolist()} for r in routes[1:]],
+                                      {'hour': int(rng.integers(24))})
+        profiles.append(user)
+    return profiles
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+
+    for layout in ['grid', 'radial']:
+        for n_edges in [1_000, 10_000, 100_000]:
+            start = time.perf_counter()
+            G = synthetic_network(n_edges, layout)
+            print(f"{layout:>6} {n_edges:>8,}: {G.number_of_nodes():>7,} nodes, {G.number_of_edges():>8,} edges "
+                  f"in {time.perf_counter() - start:.2f}s")
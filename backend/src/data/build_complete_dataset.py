@@ -1,86 +1,156 @@
-import pickle
 import os
-from download_osm import download_city_network, load_network
-from download_pois import download_pois
-from generate_user_profiles import generate_diverse_user_profiles
-from simulate_traffic import simulate_current_traffic
-import geopandas as gpd
-
-
-def build_complete_dataset(city_name="Timişoara, Romania"):
+from datetime import datetime
+from route_recommendation.src.data.download_osm import (
+    download_city_network,
+    load_network,
+    load_road_graph,
+    offline_network,
+)
+from route_recommendation.src.data.download_pois import download_pois, load_pois, offline_fetcher
+from route_recommendation.src.data.generate_user_profiles import generate_diverse_user_profiles
+from route_recommendation.src.data.pipeline import Pipeline, Stage
+from route_recommendation.src.data.simulate_traffic import simulate_graph_traffic
+from route_recommendation.src.data.traffic_overlay import TrafficOverlay
+from route_recommendation.src.models.profile_store import ProfileStore
+from route_recommendation.src.models.road_graph import HEADER_FILE, RoadGraph
+
+
+POI_TAGS = {
+    'parks': {'leisure': 'park'},
+    'restaurants': {'amenity': 'restaurant'},
+    'gas_stations': {'amenity': 'fuel'},
+    'hospitals': {'amenity': 'hospital'},
+    'historic': {'historic': True},
+}
+
+
+def build_complete_dataset(city_name="Timişoara, Romania", data_dir='../../data', offline_dir=None,
+                           num_users=50, traffic_time=None, force=(), max_workers=4):
     """
     Complete data pipeline - downloads and processes all data sources
+
+    Runs as a stage DAG (see pipeline.py): the road network, POIs and user
+    profiles are built concurrently, traffic follows the network. Stages
+    whose inputs and outputs are unchanged since the last run are skipped,
+    and a failed run resumes from the last finished stage. Without
+    offline_dir a network or POI file that already exists is reused rather
+    than downloaded again, unless its stage is in force.
+
+    Args:
+        city_name: Name of city (e.g., "Bucharest, Romania")
+        data_dir: Root of the data directory
+        offline_dir: Directory with a saved network (<city>_drive.pkl) and POIs
+            (<city>_pois.parquet) used instead of OSM/Overpass
+        num_users: Simulated user profiles to generate if none exist
+        traffic_time: datetime of the simulated traffic (default: the current
+            hour, so traffic is re-simulated once per hour)
+        force: Stage names to rebuild even if cached ('all' for everything)
+        max_workers: Stages run at the same time
+
+    Returns:
+        (RoadGraph with traffic columns, POI GeoDataFrame)
     """
     print("=" * 60)
     print("BUILDING COMPLETE DATASET FOR ROUTE RECOMMENDATION")
     print("=" * 60)
 
-    # Step 1: Road Network
-    print("\n[1/4] Downloading road network...")
-    network_path = f'../../data/raw/osm/{city_name.replace(" ", "_").replace(",", "")}_drive.pkl'
-
-    if os.path.exists(network_path):
-        print(f"  Loading existing network from {network_path}")
-        G = load_network(network_path)
-    else:
-        G = download_city_network(city_name, 'drive')
+    city_slug = city_name.replace(" ", "_").replace(",", "")
+    osm_dir = os.path.join(data_dir, 'raw', 'osm')
+    network_path = os.path.join(osm_dir, f'{city_slug}_drive.pkl')
+    graph_dir = network_path.replace('.pkl', '.graph')
+    poi_dir = os.path.join(data_dir, 'raw', 'pois')
+    poi_path = os.path.join(poi_dir, f'{city_slug}_pois.parquet')
+    profile_dir = os.path.join(data_dir, 'processed', 'user_profiles')
+    profile_db = os.path.join(data_dir, 'processed', 'user_profiles.sqlite')
+    traffic_path = os.path.join(graph_dir, 'overlays', 'traffic')
+    if traffic_time is None:
+        traffic_time = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    if offline_dir is not None:
+        network_source = os.path.join(offline_dir, f'{city_slug}_drive.pkl')
+        poi_source = os.path.join(offline_dir, f'{city_slug}_pois.parquet')
+
+    def forced(name):
+        return force == 'all' or name in force
 
-    print(f"  ✓ Network: {G.number_of_nodes():,} nodes, {G.number_of_edges():,} edges")
+    # Step 1: Road Network
+    def build_network():
+        if offline_dir is None and os.path.exists(network_path) and not forced('network'):
+            print(f"  Reusing existing network {network_path}")
+            if not os.path.exists(os.path.join(graph_dir, HEADER_FILE)):
+                RoadGraph.from_networkx(load_network(network_path)).save(graph_dir)
+            return
+        fetch = offline_network(network_source) if offline_dir is not None else None
+        download_city_network(city_name, 'drive', save_dir=osm_dir, fetch=fetch)
 
     # Step 2: POIs
-    print("\n[2/4] Downloading Points of Interest...")
-    poi_path = f'../../data/raw/pois/{city_name.replace(" ", "_").replace(",", "")}_pois.gpkg'
-
-    if os.path.exists(poi_path):
-        print(f"  Loading existing POIs from {poi_path}")
-        pois = gpd.read_file(poi_path)
-    else:
-        POI_TAGS = {
-            'parks': {'leisure': 'park'},
-            'restaurants': {'amenity': 'restaurant'},
-            'gas_stations': {'amenity': 'fuel'},
-            'hospitals': {'amenity': 'hospital'},
-            'historic': {'historic': True},
-        }
-        pois = download_pois(city_name, POI_TAGS)
-
-    print(f"  ✓ POIs: {len(pois):,} points across {pois['category'].nunique()} categories")
-
-    # Step 3: User Profiles
-    print("\n[3/4] Generating user profiles...")
-    profile_dir = '../../data/processed/user_profiles'
-
-    if os.path.exists(profile_dir) and len(os.listdir(profile_dir)) > 0:
-        print(f"  User profiles already exist in {profile_dir}")
-        num_profiles = len([f for f in os.listdir(profile_dir) if f.endswith('.json')])
-        print(f"  ✓ Found {num_profiles} existing profiles")
-    else:
-        generate_diverse_user_profiles(num_users=50)
-        print(f"  ✓ Generated 50 user profiles")
-
-    # Step 4: Add simulated traffic
-    print("\n[4/4] Adding simulated traffic data...")
-    G = simulate_current_traffic(G)
-
-    # Save updated network
-    updated_path = network_path.replace('.pkl', '_with_traffic.pkl')
-    with open(updated_path, 'wb') as f:
-        pickle.dump(G, f)
-    print(f"  ✓ Saved network with traffic to {updated_path}")
+    def build_pois():
+        if offline_dir is None and os.path.exists(poi_path) and not forced('pois'):
+            print(f"  Reusing existing POIs {poi_path}")
+            return
+        fetch = offline_fetcher(poi_source) if offline_dir is not None else None
+        download_pois(city_name, POI_TAGS, save_dir=poi_dir, fetch=fetch)
+
+    # Step 3: User Profiles (the SQLite store is the source of truth; JSON
+    # files only add users it does not know yet, so history appended to the
+    # store and learned preferences survive re-runs)
+    def build_profiles():
+        with ProfileStore(profile_db) as store:
+            if os.path.isdir(profile_dir) and any(f.endswith('.json') for f in os.listdir(profile_dir)):
+                added = store.import_json_dir(profile_dir)
+                print(f"  Added {added} new profiles to {profile_db}")
+            else:
+                store.save_profiles(generate_diverse_user_profiles(num_users=num_users, save_dir=profile_dir))
+                print(f"  Generated {num_users} profiles ({store.count()} in {profile_db})")
+
+    # Step 4: Simulated traffic, saved only as an overlay of the base
+    # network; live feeds then apply sparse deltas on top (see traffic_overlay.py)
+    def build_traffic():
+        graph = simulate_graph_traffic(load_road_graph(graph_dir), current_datetime=traffic_time)
+        TrafficOverlay(graph).save(graph_dir)
+
+    network_files = [os.path.join(graph_dir, 'header.json'), os.path.join(graph_dir, '*.npy')]
+    pipeline = Pipeline([
+        Stage('network', build_network,
+              inputs=[network_source] if offline_dir is not None else [],
+              outputs=network_files + [network_path],
+              params={'city': city_name, 'network_type': 'drive', 'offline': offline_dir is not None}),
+        Stage('pois', build_pois,
+              inputs=[poi_source] if offline_dir is not None else [],
+              outputs=[poi_path],
+              params={'city': city_name, 'tags': POI_TAGS, 'offline': offline_dir is not None}),
+        Stage('profiles', build_profiles,
+              outputs=[os.path.join(profile_dir, '*.json')], volatile=[profile_db],
+              params={'num_users': num_users}),
+        Stage('traffic', build_traffic, deps=['network'],
+              outputs=[traffic_path], params={'time': traffic_time.isoformat()}),
+    ], state_path=os.path.join(data_dir, 'pipeline_state.json'), max_workers=max_workers)
+
+    print("\nRunning pipeline stages...")
+    pipeline.run(force=force)
+
+    graph = load_road_graph(graph_dir, overlay='traffic')
+    pois = load_pois(poi_path)
+    with ProfileStore(profile_db) as store:
+        profile_count = store.count()
+
+    print(f"\n  Network: {graph.n_nodes:,} nodes, {graph.n_edges:,} edges")
+    print(f"  POIs: {len(pois):,} points across {pois['category'].nunique()} categories")
+    print(f"  Profiles: {profile_count} in {profile_db}")
 
     # Summary
     print("\n" + "=" * 60)
     print("✅ DATASET COMPLETE!")
     print("=" * 60)
     print(f"\nData locations:")
-    print(f"  Road network: {network_path}")
-    print(f"  Network + traffic: {updated_path}")
+    print(f"  Road network: {graph_dir}")
+    print(f"  Network + traffic: {traffic_path}")
     print(f"  POIs: {poi_path}")
-    print(f"  User profiles: {profile_dir}/")
+    print(f"  User profiles: {profile_db}")
     print(f"\nYou can now proceed to route generation and recommendation!")
 
-    return G, pois
+    return graph, pois
 
 
 if __name__ == "__main__":
-    G, pois = build_complete_dataset("Timişoara, Romania")
\ No newline at end of file
+    graph, pois = build_complete_dataset("Timişoara, Romania")
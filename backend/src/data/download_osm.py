@@ -2,10 +2,27 @@ import osmnx as ox
 import networkx as nx
 import pickle
 import os
+from route_recommendation.src.models.road_graph import RoadGraph
 
 CITY_DATA_PATH_OSM = "../../data/raw/osm/"
 
-def download_city_network(city_name, network_type='drive', save_dir=CITY_DATA_PATH_OSM):
+def offline_network(filepath):
+    """
+    Local stand-in for ox.graph_from_place
+
+    Args:
+        filepath: Network saved earlier (.pkl or .graphml, see load_network)
+
+    Returns:
+        Function (city_name, network_type) -> NetworkX MultiDiGraph
+    """
+    def fetch(city_name, network_type):
+        return load_network(filepath)
+
+    return fetch
+
+
+def download_city_network(city_name, network_type='drive', save_dir=CITY_DATA_PATH_OSM, fetch=None):
     """
     Download road network from OpenStreetMap
 
@@ -13,6 +30,8 @@ def download_city_network(city_name, network_type='drive', save_dir=CITY_DATA_PA
         city_name: Name of city (e.g., "Bucharest, Romania")
         network_type: 'drive', 'walk', 'bike', or 'all'
         save_dir: Directory to save the data
+        fetch: Function (city_name, network_type) -> MultiDiGraph (default:
+            ox.graph_from_place; see offline_network for a local stand-in)
 
     Returns:
         NetworkX MultiDiGraph
@@ -24,7 +43,10 @@ def download_city_network(city_name, network_type='drive', save_dir=CITY_DATA_PA
 
     # Download the network
     # This might take 2-10 minutes depending on city size
-    G = ox.graph_from_place(city_name, network_type=network_type)
+    if fetch is None:
+        G = ox.graph_from_place(city_name, network_type=network_type)
+    else:
+        G = fetch(city_name, network_type)
 
     print(f"Downloaded graph with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges")
 
@@ -54,6 +76,11 @@ def download_city_network(city_name, network_type='drive', save_dir=CITY_DATA_PA
     gdf_edges.to_file(gpkg_path, layer='edges', driver='GPKG')
     print(f"Saved GeoPackage to {gpkg_path}")
 
+    # Compact array format (memory-mapped, near-instant load)
+    graph_dir = os.path.join(save_dir, f"{city_name.replace(' ', '_').replace(',', '')}_{network_type}.graph")
+    RoadGraph.from_networkx(G).save(graph_dir)
+    print(f"Saved compact graph to {graph_dir}")
+
     return G
 
 
@@ -73,6 +100,23 @@ def load_network(filepath):
         raise ValueError("File must be .pkl or .graphml")
 
 
+def load_road_graph(graph_dir, overlay=None):
+    """
+    Open the compact graph written by download_city_network
+
+    Arrays are memory-mapped, so this is fast regardless of city size and
+    processes opening the same directory share memory.
+
+    Args:
+        graph_dir: Path to the .graph directory
+        overlay: Optional overlay to apply on top (e.g. 'traffic')
+
+    Returns:
+        RoadGraph
+    """
+    return RoadGraph.load(graph_dir, overlay=overlay)
+
+
 def get_network_statistics(G):
     """Print useful statistics about the network"""
     print("\n=== NETWORK STATISTICS ===")
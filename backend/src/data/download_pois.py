@@ -2,9 +2,46 @@ import osmnx as ox
 import geopandas as gpd
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
+from route_recommendation.src.utils.instrumentation import count, timer
 
 
-def download_pois(place_name, tags, save_dir='../../data/raw/pois'):
+# Categories fetched at the same time (each is one Overpass query)
+POI_WORKERS = 4
+
+
+def offline_fetcher(path):
+    """
+    Local stand-in for ox.features_from_place
+
+    Serves queries from a POI file saved earlier (see download_pois), so the
+    pipeline can run without network access.
+
+    Args:
+        path: GeoParquet or GeoPackage file with POIs and their OSM tag columns
+
+    Returns:
+        Function (place_name, tags) -> GeoDataFrame of matching features
+    """
+    pois = load_pois(path)
+
+    def fetch(place_name, tags):
+        match = pd.Series(False, index=pois.index)
+        for key, value in tags.items():
+            if key not in pois.columns:
+                continue
+            if value is True:
+                match |= pois[key].notna()
+            elif isinstance(value, list):
+                match |= pois[key].isin(value)
+            else:
+                match |= pois[key] == value
+        return pois[match].drop(columns='category', errors='ignore').copy()
+
+    return fetch
+
+
+def download_pois(place_name, tags, save_dir='../../data/raw/pois', fetch=None, max_workers=POI_WORKERS):
     """
     Download Points of Interest from OpenStreetMap
 
@@ -12,23 +49,36 @@ def download_pois(place_name, tags, save_dir='../../data/raw/pois'):
         place_name: Name of place (e.g., "Bucharest, Romania")
         tags: Dictionary of OSM tags to query
         save_dir: Directory to save POI data
+        fetch: Function (place_name, tags) -> GeoDataFrame (default:
+            ox.features_from_place; see offline_fetcher for a local stand-in)
+        max_workers: Categories downloaded concurrently
 
     Returns:
         GeoDataFrame with POIs
     """
     os.makedirs(save_dir, exist_ok=True)
+    fetch = fetch or ox.features_from_place
 
-    all_pois = []
-
-    for category, tag_dict in tags.items():
-        print(f"Downloading {category}...")
+    def download(category, tag_dict):
         try:
-            pois = ox.features_from_place(place_name, tag_dict)
+            with timer('pois.fetch'):
+                pois = fetch(place_name, tag_dict)
+            count('pois.features', len(pois))
             pois['category'] = category
-            all_pois.append(pois)
-            print(f"  Found {len(pois)} {category}")
+            return pois, f"  Found {len(pois)} {category}"
         except Exception as e:
-            print(f"  Error downloading {category}: {e}")
+            return None, f"  Error downloading {category}: {e}"
+
+    # Queries are I/O bound; results are combined in category order
+    print(f"Downloading {len(tags)} POI categories...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(download, tags.keys(), tags.values()))
+
+    all_pois = []
+    for pois, message in results:
+        print(message)
+        if pois is not None:
+            all_pois.append(pois)
 
     if not all_pois:
         print("No POIs downloaded!")
@@ -49,17 +99,32 @@ def download_pois(place_name, tags, save_dir='../../data/raw/pois'):
     combined_pois.to_file(output_path, driver='GPKG')
     print(f"\nSaved {len(combined_pois)} POIs to {output_path}")
 
-    # Also save as CSV for easy viewing
-    csv_path = output_path.replace('.gpkg', '.csv')
-    poi_df = combined_pois.copy()
-    poi_df['lat'] = poi_df.geometry.y
-    poi_df['lon'] = poi_df.geometry.x
-    poi_df.drop(columns=['geometry']).to_csv(csv_path, index=False)
-    print(f"Also saved to {csv_path}")
+    # Columnar copy for fast, column-selective loads (see load_pois)
+    parquet_path = output_path.replace('.gpkg', '.parquet')
+    combined_pois.to_parquet(parquet_path, compression='zstd')
+    print(f"Also saved to {parquet_path}")
 
     return combined_pois
 
 
+def load_pois(path, columns=None):
+    """
+    Load POIs written by download_pois
+
+    Args:
+        path: GeoParquet (.parquet) or GeoPackage (.gpkg) file
+        columns: Columns to load from GeoParquet (geometry is always included)
+
+    Returns:
+        GeoDataFrame with POIs
+    """
+    if path.endswith('.parquet'):
+        if columns is not None and 'geometry' not in columns:
+            columns = list(columns) + ['geometry']
+        return gpd.read_parquet(path, columns=columns)
+    return gpd.read_file(path)
+
+
 if __name__ == "__main__":
     CITY_NAME = "Timişoara, Romania"  # CHANGE THIS
 
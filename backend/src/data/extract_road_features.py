@@ -1,57 +1,189 @@
+import geopandas as gpd
+import numpy as np
 import osmnx as ox
 import pickle
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+from shapely.geometry import LineString
 
+from route_recommendation.src.features.poi_features import POIIndex
+from route_recommendation.src.models.road_graph import parse_lanes
+from route_recommendation.src.utils.instrumentation import count, timed
 
 
-def extract_edge_features(G, save_path='../../data/processed/edge_features.csv'):
+def edge_geometries(G):
+    """
+    LineString of every edge in G.edges(keys=True) order
+
+    Uses the edge 'geometry' attribute of simplified OSMnx graphs and a
+    straight segment between the end nodes otherwise.
+    """
+    geometries = []
+    for u, v, data in G.edges(data=True):
+        geometry = data.get('geometry')
+        if geometry is None:
+            geometry = LineString([(G.nodes[u]['x'], G.nodes[u]['y']), (G.nodes[v]['x'], G.nodes[v]['y'])])
+        geometries.append(geometry)
+    return geometries
+
+
+def extract_edge_poi_features(G, pois_gdf, max_distance=500):
+    """
+    Per-edge POI proximity, computed once offline
+
+    Args:
+        G: OSMnx MultiDiGraph
+        pois_gdf: GeoDataFrame with POIs, or a prebuilt POIIndex
+        max_distance: Radius for the counts (meters)
+
+    Returns:
+        DataFrame aligned with G.edges(keys=True) with
+        poi_<category>_min_distance and poi_<category>_count columns
+    """
+    index = pois_gdf if isinstance(pois_gdf, POIIndex) else POIIndex(pois_gdf)
+    metrics = index.query_many(edge_geometries(G), max_distance=max_distance)
+
+    features = {}
+    for category in index.categories:
+        features[f'poi_{category}_min_distance'] = metrics[category]['min_distance'].astype('float32')
+        features[f'poi_{category}_count'] = metrics[category]['count_within_range'].astype('int32')
+    return pd.DataFrame(features)
+
+
+def _label(value, missing):
+    """Single string for an OSM tag value; multi-valued tags become 'a|b'"""
+    if isinstance(value, (list, tuple)):
+        return '|'.join(str(v) for v in value)
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return missing
+    return str(value)
+
+
+def _osmid_list(value):
+    """Way ids of an edge as a list (simplified edges may merge several ways)"""
+    if isinstance(value, (list, tuple)):
+        return [int(v) for v in value]
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return [int(value)]
+
+
+def _column(edges, name, default):
+    if name in edges:
+        return edges[name]
+    return pd.Series(default, index=edges.index, dtype=object)
+
+
+@timed('edge_features.table')
+def edge_feature_table(G):
+    """
+    Typed edge table in G.edges(keys=True) order
+
+    Built column-wise from ox.graph_to_gdfs: float32 measures, boolean
+    oneway, list-typed osmid and categorical (dictionary-encoded) name,
+    highway and maxspeed labels.
+    """
+    edges = ox.graph_to_gdfs(G, nodes=False, fill_edge_geometry=False)
+    index = edges.index
+    count('edge_features.edges', len(edges))
+
+    return pd.DataFrame({
+        'u': index.get_level_values(0).to_numpy(np.int64),
+        'v': index.get_level_values(1).to_numpy(np.int64),
+        'key': index.get_level_values(2).to_numpy(np.int32),
+        'osmid': _column(edges, 'osmid', None).map(_osmid_list).to_numpy(),
+        'name': pd.Categorical(_column(edges, 'name', None).map(lambda v: _label(v, 'unnamed'))),
+        'highway': pd.Categorical(_column(edges, 'highway', None).map(lambda v: _label(v, 'unknown'))),
+        'length': _column(edges, 'length', 0).fillna(0).to_numpy(np.float32),
+        'speed_kph': _column(edges, 'speed_kph', 50).fillna(50).to_numpy(np.float32),
+        'travel_time': _column(edges, 'travel_time', 0).fillna(0).to_numpy(np.float32),
+        'lanes': _column(edges, 'lanes', None).map(parse_lanes).to_numpy(np.float32),
+        'maxspeed': pd.Categorical(_column(edges, 'maxspeed', None).map(lambda v: _label(v, None))),
+        'oneway': _column(edges, 'oneway', False).fillna(False).to_numpy(bool),
+    })
+
+
+@timed('edge_features.extract')
+def extract_edge_features(G, save_path='../../data/processed/edge_features.parquet', pois_gdf=None,
+                          max_distance=500, summary=False):
     """
     Extract all edge attributes into a DataFrame for easy access
+
+    Args:
+        G: OSMnx MultiDiGraph
+        save_path: Where to write the table; .parquet (columnar, typed) or
+            .csv (lists and labels as text)
+        pois_gdf: Optional POIs (GeoDataFrame or POIIndex); adds the
+            per-edge columns of extract_edge_poi_features
+        max_distance: POI count radius (meters)
+        summary: Print describe() statistics of the table
+
+    Returns:
+        Edge feature DataFrame
     """
     print("Extracting edge features...")
+    df = edge_feature_table(G)
 
-    edges_data = []
-    for u, v, key, data in G.edges(keys=True, data=True):
-        edge_info = {
-            'u': u,
-            'v': v,
-            'key': key,
-            'osmid': data.get('osmid', None),
-            'name': data.get('name', 'unnamed'),
-            'highway': data.get('highway', 'unknown'),
-            'length': data.get('length', 0),
-            'speed_kph': data.get('speed_kph', 50),
-            'travel_time': data.get('travel_time', 0),
-            'lanes': data.get('lanes', None),
-            'maxspeed': data.get('maxspeed', None),
-            'oneway': data.get('oneway', False),
-        }
-        edges_data.append(edge_info)
-
-    df = pd.DataFrame(edges_data)
+    if pois_gdf is not None:
+        print("Computing per-edge POI features...")
+        df = pd.concat([df, extract_edge_poi_features(G, pois_gdf, max_distance)], axis=1)
 
     # Create output directory
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
 
-    # Save to CSV
-    df.to_csv(save_path, index=False)
+    if save_path.endswith('.csv'):
+        csv = df.copy()
+        csv['osmid'] = csv['osmid'].map(lambda ids: ids[0] if len(ids) == 1 else ids)
+        csv.to_csv(save_path, index=False)
+    else:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, save_path, compression='zstd')
     print(f"Saved {len(df)} edges to {save_path}")
 
-    # Print summary statistics
-    print("\n=== EDGE FEATURES SUMMARY ===")
-    print(df.describe())
+    if summary:
+        print("\n=== EDGE FEATURES SUMMARY ===")
+        print(df.describe())
 
     return df
 
 
+def load_edge_features(path='../../data/processed/edge_features.parquet', columns=None):
+    """
+    Load the edge feature table
+
+    Parquet files are memory-mapped and only the requested columns are
+    read; numeric columns come out of Arrow without copies.
+
+    Args:
+        path: edge_features.parquet (or a legacy edge_features.csv)
+        columns: Column names to load (default: all)
+
+    Returns:
+        DataFrame
+    """
+    if path.endswith('.csv'):
+        return pd.read_csv(path, usecols=columns)
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
 if __name__ == "__main__":
     # Load network
     G_path = '../../data/raw/osm/Timişoara_Romania_drive.pkl'
     with open(G_path, 'rb') as f:
         G = pickle.load(f)
 
-    # Extract features
-    df = extract_edge_features(G)
+    # Extract features, with per-edge POI proximity if POIs were downloaded
+    pois_path = '../../data/raw/pois/Timişoara_Romania_pois.parquet'
+    pois = gpd.read_parquet(pois_path) if os.path.exists(pois_path) else None
+    df = extract_edge_features(G, pois_gdf=pois, summary=True)
     print(df.head())
+
+    # Reload only what routing needs
+    import time
+    start = time.perf_counter()
+    subset = load_edge_features(columns=['u', 'v', 'highway', 'length', 'travel_time'])
+    print(f"Reloaded {subset.shape[1]} columns in {(time.perf_counter() - start) * 1000:.1f} ms")
     print("\n✅ Edge features extracted successfully!")
\ No newline at end of file
@@ -0,0 +1,297 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from route_recommendation.src.utils.instrumentation import count, profiled
+
+
+DEFAULT_STATE_PATH = '../../data/pipeline_state.json'
+
+# Stages that may run at the same time
+DEFAULT_WORKERS = 4
+
+HASH_BLOCK = 1 << 20
+
+
+class Stage:
+    """
+    One step of a Pipeline
+
+    A stage is identified by a content key: the hash of its parameters, its
+    input files and the outputs of the stages it depends on. It is skipped
+    when the checkpoint holds the same key and its outputs are unchanged.
+    """
+
+    def __init__(self, name, run, deps=(), inputs=(), outputs=(), volatile=(), params=None):
+        """
+        Args:
+            name: Unique stage name
+            run: Function without arguments doing the work
+            deps: Names of stages that must finish first
+            inputs: Files or directories read by the stage (glob patterns allowed)
+            outputs: Files or directories written by the stage (glob patterns
+                allowed); their hashes feed the keys of dependent stages
+            volatile: Outputs that must exist but whose content is not
+                tracked (e.g. a database other code appends to)
+            params: JSON-serializable parameters that affect the result
+        """
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.volatile = list(volatile)
+        self.params = params or {}
+
+
+def _expand(patterns):
+    """Sorted paths matching a list of paths/glob patterns"""
+    paths = set()
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            paths.update(glob.glob(pattern))
+        elif os.path.exists(pattern):
+            paths.add(pattern)
+    return sorted(paths)
+
+
+class Pipeline:
+    """
+    Runs a DAG of stages concurrently with content-hash caching
+
+    Independent stages run in a thread pool as soon as their dependencies
+    finish. After every finished stage its key and output hashes are
+    checkpointed to a JSON state file, so a failed or interrupted run
+    resumes with the stages that did not complete.
+    """
+
+    def __init__(self, stages, state_path=DEFAULT_STATE_PATH, max_workers=DEFAULT_WORKERS):
+        """
+        Args:
+            stages: List of Stage
+            state_path: JSON checkpoint file
+            max_workers: Stages run at the same time
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique")
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages {missing}")
+        self._order = self._topological_order()
+
+        self.state_path = state_path
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self.state = self._load_state()
+
+    def _topological_order(self):
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through stage '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    # ------------------------------------------------------------------
+    # Checkpoint
+    # ------------------------------------------------------------------
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            return {'stages': state.get('stages', {}), 'files': state.get('files', {})}
+        return {'stages': {}, 'files': {}}
+
+    def _save_state(self):
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    # ------------------------------------------------------------------
+    # Hashing
+    # ------------------------------------------------------------------
+
+    def file_hash(self, path):
+        """
+        SHA-256 of a file, reusing the checkpointed digest while its size and
+        modification time are unchanged
+        """
+        stat = os.stat(path)
+        with self._lock:
+            cached = self.state['files'].get(path)
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b''):
+                digest.update(block)
+        digest = digest.hexdigest()
+        with self._lock:
+            self.state['files'][path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def content_hash(self, patterns):
+        """Hash over every file matched by paths/glob patterns (directories recursively)"""
+        files = []
+        for path in _expand(patterns):
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    files.extend(os.path.join(root, name) for name in names)
+            else:
+                files.append(path)
+
+        digest = hashlib.sha256()
+        for path in sorted(files):
+            digest.update(path.encode())
+            digest.update(self.file_hash(path).encode())
+        return digest.hexdigest()
+
+    def stage_key(self, stage):
+        """Content key of a stage (its dependencies must be up to date)"""
+        with self._lock:
+            dep_outputs = {dep: self.state['stages'][dep]['outputs'] for dep in stage.deps}
+        payload = json.dumps({
+            'name': stage.name,
+            'params': stage.params,
+            'inputs': self.content_hash(stage.inputs),
+            'deps': dep_outputs,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def is_current(self, stage, key):
+        """True if the checkpoint says the stage ran with this key and its outputs are untouched"""
+        with self._lock:
+            record = self.state['stages'].get(stage.name)
+        if record is None or record.get('key') != key:
+            return False
+        patterns = stage.outputs + stage.volatile
+        if any(not _expand([pattern]) for pattern in patterns):
+            return False
+        return record.get('outputs') == self.content_hash(stage.outputs)
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    def _execute(self, name, force):
+        stage = self.stages[name]
+        key = self.stage_key(stage)
+        if name not in force and self.is_current(stage, key):
+            count('pipeline.stages_cached')
+            return 'cached', 0.0
+
+        start = time.perf_counter()
+        with profiled(f'pipeline.{name}'):
+            stage.run()
+        elapsed = time.perf_counter() - start
+        count('pipeline.stages_ran')
+
+        outputs = self.content_hash(stage.outputs)
+        with self._lock:
+            self.state['stages'][name] = {
+                'key': key,
+                'outputs': outputs,
+                'seconds': round(elapsed, 3),
+                'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+            self._save_state()
+        return 'ran', elapsed
+
+    def run(self, force=(), verbose=True):
+        """
+        Run every stage that is not up to date
+
+        Args:
+            force: Names of stages to run even if cached ('all' for every stage)
+            verbose: Print one line per stage
+
+        Returns:
+            Dictionary stage name -> 'ran' or 'cached'
+
+        Raises:
+            RuntimeError: If a stage fails (finished stages stay checkpointed,
+                so the next run resumes from there)
+        """
+        force = set(self.stages) if force == 'all' else set(force)
+        status = {}
+        failure = None
+        pending = list(self._order)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if failure is None:
+                    for name in [n for n in pending if all(d in status for d in self.stages[n].deps)]:
+                        pending.remove(name)
+                        # A forced or rerun dependency does not force its dependents:
+                        # their keys change only if the dependency's outputs did
+                        running[executor.submit(self._execute, name, force)] = name
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        status[name], elapsed = future.result()
+                    except Exception as e:
+                        if verbose:
+                            print(f"  ✗ {name} failed: {e}")
+                        if failure is None:
+                            failure = (name, e)
+                        continue
+                    if verbose:
+                        detail = 'cached' if status[name] == 'cached' else f'{elapsed:.1f}s'
+                        print(f"  ✓ {name} ({detail})")
+
+        if failure is not None:
+            name, error = failure
+            raise RuntimeError(f"Stage '{name}' failed; rerun to resume") from error
+        return status
+
+
+# Example usage
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def write(name, text):
+            def run():
+                time.sleep(0.5)
+                with open(os.path.join(tmp, name), 'w') as f:
+                    f.write(text)
+            return run
+
+        stages = [
+            Stage('a', write('a.txt', 'a'), outputs=[os.path.join(tmp, 'a.txt')]),
+            Stage('b', write('b.txt', 'b'), outputs=[os.path.join(tmp, 'b.txt')]),
+            Stage('c', write('c.txt', 'c'), deps=['a', 'b'], outputs=[os.path.join(tmp, 'c.txt')]),
+        ]
+        state_path = os.path.join(tmp, 'state.json')
+
+        for attempt in ['first', 'second']:
+            start = time.perf_counter()
+            status = Pipeline(stages, state_path).run(verbose=False)
+            print(f"{attempt} run: {status} in {time.perf_counter() - start:.2f}s")
@@ -2,10 +2,27 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, time
 
+from route_recommendation.src.utils.instrumentation import count, timed
 
-def get_traffic_multiplier(road_type, hour_of_day, day_of_week):
+
+# Road types grouped the way the traffic model treats them. Edges with
+# several highway tags (lists) or any other type fall into 'other'.
+MAJOR_ROADS = ['motorway', 'trunk', 'primary']
+MEDIUM_ROADS = ['secondary', 'tertiary']
+ROAD_CLASSES = ['major', 'medium', 'residential', 'other']
+
+_ROAD_CLASS_CODES = {road_type: 0 for road_type in MAJOR_ROADS}
+_ROAD_CLASS_CODES.update({road_type: 1 for road_type in MEDIUM_ROADS})
+_ROAD_CLASS_CODES['residential'] = 2
+OTHER_ROAD_CLASS = 3
+
+# Representative road type for each class, used to fill the lookup table
+_CLASS_EXAMPLES = ['primary', 'secondary', 'residential', 'unclassified']
+
+
+def get_base_multiplier(road_type, hour_of_day, day_of_week):
     """
-    Simulate traffic congestion multiplier based on time and road type
+    Deterministic part of the traffic model (no random noise)
 
     Args:
         road_type: Type of road (motorway, primary, residential, etc.)
@@ -24,47 +41,142 @@ def get_traffic_multiplier(road_type, hour_of_day, day_of_week):
     if not is_weekend:
         # Morning rush (7-9 AM)
         if 7 <= hour_of_day <= 9:
-            if road_type in ['motorway', 'trunk', 'primary']:
+            if road_type in MAJOR_ROADS:
                 base_multiplier = 1.8  # Heavy congestion
-            elif road_type in ['secondary', 'tertiary']:
+            elif road_type in MEDIUM_ROADS:
                 base_multiplier = 1.4
 
         # Evening rush (5-7 PM)
         elif 17 <= hour_of_day <= 19:
-            if road_type in ['motorway', 'trunk', 'primary']:
+            if road_type in MAJOR_ROADS:
                 base_multiplier = 2.0  # Heaviest congestion
-            elif road_type in ['secondary', 'tertiary']:
+            elif road_type in MEDIUM_ROADS:
                 base_multiplier = 1.5
 
         # Midday moderate traffic
         elif 12 <= hour_of_day <= 16:
-            if road_type in ['motorway', 'trunk', 'primary']:
+            if road_type in MAJOR_ROADS:
                 base_multiplier = 1.3
 
     # Weekend moderate traffic (different pattern)
     else:
         # Weekend afternoon (shopping, leisure)
         if 14 <= hour_of_day <= 18:
-            if road_type in ['secondary', 'tertiary', 'residential']:
+            if road_type in MEDIUM_ROADS + ['residential']:
                 base_multiplier = 1.3
 
     # Late night (minimal traffic)
     if hour_of_day >= 22 or hour_of_day <= 5:
         base_multiplier = 0.9  # Actually faster than usual
 
+    return base_multiplier
+
+
+def get_traffic_multiplier(road_type, hour_of_day, day_of_week):
+    """
+    Simulate traffic congestion multiplier based on time and road type
+
+    Args:
+        road_type: Type of road (motorway, primary, residential, etc.)
+        hour_of_day: Hour (0-23)
+        day_of_week: Day (0=Monday, 6=Sunday)
+
+    Returns:
+        Multiplier for travel time (1.0 = no traffic, 2.0 = twice as long)
+    """
+    base_multiplier = get_base_multiplier(road_type, hour_of_day, day_of_week)
+
     # Add some randomness (±10%)
     random_factor = np.random.uniform(0.9, 1.1)
 
     return base_multiplier * random_factor
 
 
-def simulate_current_traffic(G, current_datetime=None):
+def build_multiplier_table():
+    """
+    Lookup table of base multipliers
+
+    Returns:
+        Array of shape (7 days, 24 hours, len(ROAD_CLASSES))
+    """
+    table = np.empty((7, 24, len(ROAD_CLASSES)))
+    for day in range(7):
+        for hour in range(24):
+            for code, road_type in enumerate(_CLASS_EXAMPLES):
+                table[day, hour, code] = get_base_multiplier(road_type, hour, day)
+    return table
+
+
+MULTIPLIER_TABLE = build_multiplier_table()
+
+
+def encode_road_types(road_types):
+    """
+    Map highway values to traffic road-class codes
+
+    Args:
+        road_types: Iterable of highway values (strings or lists of strings)
+
+    Returns:
+        int8 array of indices into ROAD_CLASSES
+    """
+    return np.array(
+        [_ROAD_CLASS_CODES.get(t, OTHER_ROAD_CLASS) if isinstance(t, str) else OTHER_ROAD_CLASS
+         for t in road_types],
+        dtype=np.int8,
+    )
+
+
+def traffic_multiplier_matrix(road_codes, timestamps, rng=None, dtype=np.float32):
+    """
+    Traffic multipliers for many edges and many timestamps at once
+
+    Args:
+        road_codes: Road-class code per edge (see encode_road_types)
+        timestamps: datetime or sequence of datetimes
+        rng: numpy Generator or seed for the ±10% noise (default: fresh entropy)
+        dtype: Output dtype
+
+    Returns:
+        Array of shape (len(timestamps), len(road_codes))
+    """
+    if isinstance(timestamps, datetime):
+        timestamps = [timestamps]
+    timestamps = pd.DatetimeIndex(timestamps)
+    rng = np.random.default_rng(rng)
+
+    base = MULTIPLIER_TABLE[timestamps.dayofweek, timestamps.hour]
+    multipliers = base.astype(dtype)[:, np.asarray(road_codes)]
+
+    # Single batched draw for the ±10% noise
+    noise = rng.random(multipliers.shape, dtype=dtype)
+    noise *= 0.2
+    noise += 0.9
+    multipliers *= noise
+
+    return multipliers
+
+
+def weekly_traffic_multipliers(road_codes, rng=None, dtype=np.float32):
+    """
+    Precompute one multiplier per edge for every hour of the week
+
+    Returns:
+        Array of shape (168, len(road_codes)); row = day_of_week * 24 + hour
+    """
+    week = pd.date_range('2024-01-01', periods=168, freq='h')  # starts on a Monday
+    return traffic_multiplier_matrix(road_codes, week, rng=rng, dtype=dtype)
+
+
+@timed('traffic.simulate_current_traffic')
+def simulate_current_traffic(G, current_datetime=None, rng=None):
     """
     Add simulated traffic data to graph edges
 
     Args:
         G: NetworkX graph
         current_datetime: datetime object (default: now)
+        rng: numpy Generator or seed for reproducible noise (optional)
 
     Returns:
         Graph with updated 'current_travel_time' attribute
@@ -72,23 +184,48 @@ def simulate_current_traffic(G, current_datetime=None):
     if current_datetime is None:
         current_datetime = datetime.now()
 
-    hour = current_datetime.hour
-    day_of_week = current_datetime.weekday()
-
-    for u, v, key, data in G.edges(keys=True, data=True):
-        road_type = data.get('highway', 'residential')
-        base_time = data.get('travel_time', 60)  # seconds
+    edge_data = [data for _, _, data in G.edges(data=True)]
+    count('traffic.edges', len(edge_data))
+    road_codes = encode_road_types(data.get('highway', 'residential') for data in edge_data)
+    base_times = np.array([data.get('travel_time', 60) for data in edge_data], dtype=float)  # seconds
 
-        # Get traffic multiplier
-        multiplier = get_traffic_multiplier(road_type, hour, day_of_week)
+    multipliers = traffic_multiplier_matrix(road_codes, current_datetime, rng=rng, dtype=np.float64)[0]
+    current_times = base_times * multipliers
 
-        # Update travel time
-        G[u][v][key]['current_travel_time'] = base_time * multiplier
-        G[u][v][key]['traffic_multiplier'] = multiplier
+    for data, multiplier, current_time in zip(edge_data, multipliers.tolist(), current_times.tolist()):
+        data['current_travel_time'] = current_time
+        data['traffic_multiplier'] = multiplier
 
     return G
 
 
+@timed('traffic.simulate_graph_traffic')
+def simulate_graph_traffic(graph, current_datetime=None, rng=None):
+    """
+    Array version of simulate_current_traffic for a compact RoadGraph
+
+    Args:
+        graph: RoadGraph (see models/road_graph.py)
+        current_datetime: datetime object (default: now)
+        rng: numpy Generator or seed for reproducible noise (optional)
+
+    Returns:
+        The same graph with 'current_travel_time' and 'traffic_multiplier'
+        columns overwritten
+    """
+    if current_datetime is None:
+        current_datetime = datetime.now()
+
+    road_codes = encode_road_types(graph.highway_categories)[graph.highway_code]
+    multipliers = traffic_multiplier_matrix(road_codes, current_datetime, rng=rng)[0]
+    count('traffic.edges', graph.n_edges)
+
+    graph.columns['traffic_multiplier'] = multipliers
+    graph.columns['current_travel_time'] = graph.columns['travel_time'] * multipliers
+
+    return graph
+
+
 # Example usage
 if __name__ == "__main__":
     import pickle
@@ -114,4 +251,11 @@ if __name__ == "__main__":
         avg_multiplier = np.mean([data['traffic_multiplier'] for _, _, _, data in sample_edges])
 
         print(f"\n{dt.strftime('%A %I:%M %p')}:")
-        print(f"  Average traffic multiplier: {avg_multiplier:.2f}x")
\ No newline at end of file
+        print(f"  Average traffic multiplier: {avg_multiplier:.2f}x")
+
+    # Precompute a whole week for every edge in one shot
+    import time as timer
+    road_codes = encode_road_types(data.get('highway', 'residential') for _, _, data in G.edges(data=True))
+    start = timer.perf_counter()
+    week = weekly_traffic_multipliers(road_codes, rng=42)
+    print(f"\nWeekly multipliers {week.shape} computed in {timer.perf_counter() - start:.3f}s")
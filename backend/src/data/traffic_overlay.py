@@ -0,0 +1,239 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from route_recommendation.src.models.road_graph import load_overlay, save_overlay
+
+
+# Multipliers are stored in blocks of this many edges; an update copies
+# only the blocks it touches, every other block is shared between versions
+BLOCK_SIZE = 4096
+
+# Number of versions kept for snapshot() and changed_since()
+MAX_SNAPSHOTS = 16
+
+
+class TrafficSnapshot:
+    """
+    Immutable traffic state of one overlay version
+
+    Holds read-only multiplier blocks that later versions share wherever
+    they did not change, so keeping a snapshot alive is cheap.
+    """
+
+    def __init__(self, version, blocks, base_time, block_size, metadata=None):
+        self.version = version
+        self.metadata = metadata or {}
+        self._blocks = blocks
+        self._base_time = base_time
+        self._block_size = block_size
+        self._multipliers = None
+
+    def multipliers(self, edges=None):
+        """Traffic multiplier of every edge (or of the given edges)"""
+        if edges is None:
+            if self._multipliers is None:
+                self._multipliers = np.concatenate(self._blocks)
+                self._multipliers.setflags(write=False)
+            return self._multipliers
+        edges = np.asarray(edges, dtype=np.int64)
+        if self._multipliers is not None:
+            return self._multipliers[edges]
+        return np.array([self._blocks[e // self._block_size][e % self._block_size] for e in edges.tolist()],
+                        dtype=np.float32)
+
+    def current_travel_time(self, edges=None):
+        """Free-flow travel time times the multiplier"""
+        if edges is None:
+            return self._base_time * self.multipliers()
+        return self._base_time[np.asarray(edges, dtype=np.int64)] * self.multipliers(edges)
+
+    def columns(self):
+        """Graph columns of this snapshot, as stored in a 'traffic' overlay"""
+        return {
+            'current_travel_time': self.current_travel_time(),
+            'traffic_multiplier': self.multipliers(),
+        }
+
+
+class TrafficOverlay:
+    """
+    Versioned, incrementally updated traffic state over a RoadGraph
+
+    Traffic feeds send sparse (edge, multiplier) deltas. Each delta creates
+    a new version with copy-on-write blocks, and subscribers (routing
+    engines, route caches) are called with the new snapshot and the edges
+    whose multiplier actually changed, so they can refresh only those.
+    Subscribers are notified in version order even when apply() is called
+    from several threads; they must not call apply() themselves.
+    """
+
+    def __init__(self, graph, multipliers=None, version=0, block_size=BLOCK_SIZE,
+                 max_snapshots=MAX_SNAPSHOTS):
+        """
+        Args:
+            graph: RoadGraph (its travel_time column is the free-flow time)
+            multipliers: Initial multiplier per edge (default: the graph's
+                traffic_multiplier column)
+            version: Version number of the initial state
+            block_size: Edges per copy-on-write block
+            max_snapshots: Versions kept for snapshot() and changed_since()
+        """
+        if multipliers is None:
+            multipliers = graph.columns['traffic_multiplier']
+        multipliers = np.asarray(multipliers, dtype=np.float32)
+        if len(multipliers) != graph.n_edges:
+            raise ValueError(f"Got {len(multipliers)} multipliers for {graph.n_edges} edges")
+
+        self.graph = graph
+        self.block_size = block_size
+        self.max_snapshots = max_snapshots
+        self._base_time = np.asarray(graph.columns['travel_time'], dtype=np.float32)
+
+        blocks = []
+        for start in range(0, graph.n_edges, block_size):
+            block = multipliers[start:start + block_size].copy()
+            block.setflags(write=False)
+            blocks.append(block)
+
+        # _lock guards the version history; _notify_lock is held for a whole
+        # apply() so subscribers see deltas one at a time, in version order
+        self._lock = threading.Lock()
+        self._notify_lock = threading.Lock()
+        self._version = version
+        self._subscribers = []
+        self._snapshots = OrderedDict()
+        self._changes = OrderedDict()  # version -> edges changed by that version
+        self._snapshots[version] = TrafficSnapshot(version, tuple(blocks), self._base_time, block_size)
+
+    @property
+    def version(self):
+        """Latest version number (increases by one per applied delta)"""
+        with self._lock:
+            return self._version
+
+    def snapshot(self, version=None):
+        """
+        Traffic state of a version (default: the latest)
+
+        Raises:
+            KeyError: If the version is older than the retained history
+        """
+        with self._lock:
+            if version is None:
+                version = self._version
+            return self._snapshots[version]
+
+    def subscribe(self, callback):
+        """Call callback(snapshot, changed_edges) after every applied delta"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def apply(self, edges, multipliers, metadata=None):
+        """
+        Apply a sparse delta of multiplier updates
+
+        Args:
+            edges: Edge indices
+            multipliers: New multiplier per edge (the last one wins for
+                repeated edges)
+            metadata: Optional dict stored with the new snapshot (e.g. the
+                feed timestamp)
+
+        Returns:
+            The new TrafficSnapshot
+        """
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1)
+        multipliers = np.broadcast_to(np.asarray(multipliers, dtype=np.float32), edges.shape)
+        if len(edges) and (edges.min() < 0 or edges.max() >= self.graph.n_edges):
+            raise IndexError("Edge index out of range")
+        if np.any(~(multipliers > 0)):
+            raise ValueError("Traffic multipliers must be positive")
+
+        # Last update per edge wins
+        reversed_unique, first = np.unique(edges[::-1], return_index=True)
+        edges, multipliers = reversed_unique, multipliers[::-1][first]
+
+        # Writers are serialized by _notify_lock, so the new version can be
+        # built without blocking readers; _lock is only taken to publish it
+        with self._notify_lock:
+            blocks = list(self._snapshots[self._version]._blocks)
+            changed = []
+            block_ids = edges // self.block_size
+            for block_id in np.unique(block_ids).tolist():
+                in_block = block_ids == block_id
+                offsets = edges[in_block] % self.block_size
+                values = multipliers[in_block]
+                differs = blocks[block_id][offsets] != values
+                if not differs.any():
+                    continue
+                block = blocks[block_id].copy()
+                block[offsets[differs]] = values[differs]
+                block.setflags(write=False)
+                blocks[block_id] = block
+                changed.append(edges[in_block][differs])
+
+            changed = np.concatenate(changed) if changed else np.zeros(0, dtype=np.int64)
+            version = self._version + 1
+            snapshot = TrafficSnapshot(version, tuple(blocks), self._base_time, self.block_size, metadata)
+            with self._lock:
+                self._snapshots[version] = snapshot
+                self._changes[version] = changed
+                self._version = version
+                while len(self._snapshots) > self.max_snapshots:
+                    oldest, _ = self._snapshots.popitem(last=False)
+                    self._changes.pop(oldest, None)
+                subscribers = list(self._subscribers)
+
+            for callback in subscribers:
+                callback(snapshot, changed)
+        return snapshot
+
+    def changed_since(self, version):
+        """
+        Edges whose multiplier changed after a version
+
+        Raises:
+            KeyError: If the version is older than the retained history
+                (callers should then refresh everything)
+        """
+        with self._lock:
+            if version not in self._snapshots:
+                raise KeyError(f"Version {version} is no longer retained")
+            changes = [edges for v, edges in self._changes.items() if v > version]
+        if not changes:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(changes))
+
+    def save(self, graph_dir, name='traffic'):
+        """Persist the latest version as a graph overlay (see RoadGraph.load)"""
+        snapshot = self.snapshot()
+        save_overlay(graph_dir, name, snapshot.columns(),
+                     metadata=dict(snapshot.metadata, version=snapshot.version))
+
+    @classmethod
+    def load(cls, graph, graph_dir, name='traffic', **kwargs):
+        """Resume from an overlay written by save() or build_complete_dataset"""
+        columns, metadata = load_overlay(graph_dir, name)
+        return cls(graph, columns['traffic_multiplier'], version=metadata.get('version', 0), **kwargs)
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+    from route_recommendation.src.models.road_graph import RoadGraph
+
+    graph_dir = '../../data/raw/osm/Timişoara_Romania_drive.graph'
+    graph = RoadGraph.load(graph_dir, overlay='traffic')
+    overlay = TrafficOverlay.load(graph, graph_dir)
+    overlay.subscribe(lambda snapshot, changed: print(f"  v{snapshot.version}: {len(changed)} edges changed"))
+
+    # A feed tick touching 1% of the edges
+    rng = np.random.default_rng(0)
+    edges = rng.choice(graph.n_edges, size=graph.n_edges // 100, replace=False)
+    start = time.perf_counter()
+    overlay.apply(edges, rng.uniform(0.9, 2.0, size=len(edges)))
+    print(f"Applied delta in {(time.perf_counter() - start) * 1000:.2f} ms")
+    print(f"Edges changed since v0: {len(overlay.changed_since(0))}")
@@ -1,8 +1,174 @@
 import geopandas as gpd
 import pandas as pd
 import numpy as np
+import shapely
 from shapely.geometry import Point, LineString
-from scipy.spatial import cKDTree
+from shapely.strtree import STRtree
+from pyproj import Transformer
+
+from route_recommendation.src.features.route_features import to_ragged
+from route_recommendation.src.utils.instrumentation import count, timed
+
+
+PROJECTED_CRS = 'EPSG:32635'  # UTM zone 35N for Romania (meters)
+
+PROXIMITY_METRICS = ['min_distance', 'avg_distance', 'count_within_range', 'proximity_score']
+
+
+def _empty_metrics():
+    return {
+        'min_distance': np.inf,
+        'avg_distance': np.inf,
+        'count_within_range': 0,
+        'proximity_score': 0
+    }
+
+
+def _as_linestring(route_geometry):
+    """Accept a LineString or a list of (lat, lon) tuples"""
+    if isinstance(route_geometry, (list, tuple)):
+        return LineString([(lon, lat) for lat, lon in route_geometry])
+    return route_geometry
+
+
+class POIIndex:
+    """
+    Reusable spatial index over a POI GeoDataFrame
+
+    POIs are reprojected to a metric CRS once and indexed with one STRtree
+    per category plus one over all POIs, so route queries only have to
+    project the route itself.
+    """
+
+    def __init__(self, pois_gdf, crs=PROJECTED_CRS):
+        """
+        Args:
+            pois_gdf: GeoDataFrame with POIs (point geometries, 'category' column)
+            crs: Metric CRS used for all distance calculations
+        """
+        self.crs = crs
+        self.source_crs = pois_gdf.crs or 'EPSG:4326'
+        self.categories = list(pd.unique(pois_gdf['category']))
+        self._transformer = Transformer.from_crs(self.source_crs, crs, always_xy=True)
+
+        projected = pois_gdf.to_crs(crs)
+        self._points = np.asarray(projected.geometry.values, dtype=object)
+        self._codes = pd.Categorical(pois_gdf['category'], categories=self.categories).codes
+        self._tree = STRtree(self._points)
+
+        self._category_points = {}
+        self._category_trees = {}
+        for code, category in enumerate(self.categories):
+            points = self._points[self._codes == code]
+            self._category_points[category] = points
+            self._category_trees[category] = STRtree(points)
+
+    def __len__(self):
+        return len(self._points)
+
+    def project(self, route_geometries):
+        """
+        Project WGS84 route geometries into the index CRS
+
+        Args:
+            route_geometries: Iterable of LineStrings or lists of (lat, lon) tuples
+
+        Returns:
+            numpy array of projected shapely geometries
+        """
+        geoms = np.empty(len(route_geometries), dtype=object)
+        geoms[:] = [_as_linestring(g) for g in route_geometries]
+
+        def _transform(coords):
+            x, y = self._transformer.transform(coords[:, 0], coords[:, 1])
+            return np.column_stack([x, y])
+
+        return shapely.transform(geoms, _transform)
+
+    def query(self, route_geometry, category=None, max_distance=500):
+        """
+        Proximity metrics of a single route to one category (or all POIs)
+
+        Args:
+            route_geometry: LineString or list of (lat, lon) tuples
+            category: Category to query (None = all POIs)
+            max_distance: Maximum distance to consider (meters)
+
+        Returns:
+            Dictionary with proximity metrics
+        """
+        if category is None:
+            points = self._points
+        else:
+            points = self._category_points.get(category, self._points[:0])
+
+        if len(points) == 0:
+            return _empty_metrics()
+
+        route = self.project([route_geometry])[0]
+        distances = shapely.distance(points, route)
+
+        min_dist = float(distances.min())
+        return {
+            'min_distance': min_dist,
+            'avg_distance': float(distances.mean()),
+            'count_within_range': int((distances <= max_distance).sum()),
+            'proximity_score': max(0.0, 1 - (min_dist / max_distance))
+        }
+
+    @timed('poi.query_many')
+    def query_many(self, route_geometries, max_distance=500):
+        """
+        Proximity metrics for many routes against every category in one pass
+
+        A single radius query over all POIs yields the counts and the
+        in-range minimum distances; per-category nearest-neighbour lookups
+        are only needed for (route, category) pairs with nothing in range.
+
+        Args:
+            route_geometries: Iterable of LineStrings or lists of (lat, lon) tuples
+            max_distance: Maximum distance to consider (meters)
+
+        Returns:
+            Dictionary {category: {'min_distance', 'count_within_range',
+            'proximity_score'}} of arrays aligned with route_geometries
+        """
+        routes = self.project(list(route_geometries))
+        n_routes, n_categories = len(routes), len(self.categories)
+
+        if n_routes > len(self._points):
+            # Many short geometries (e.g. every edge of the graph): index them instead
+            poi_idx, route_idx = STRtree(routes).query(self._points, predicate='dwithin',
+                                                       distance=max_distance)
+        else:
+            route_idx, poi_idx = self._tree.query(routes, predicate='dwithin', distance=max_distance)
+        count('poi.routes', n_routes)
+        count('poi.pairs_in_range', len(route_idx))
+        distances = shapely.distance(routes[route_idx], self._points[poi_idx])
+        cell = route_idx * n_categories + self._codes[poi_idx]
+
+        counts = np.bincount(cell, minlength=n_routes * n_categories).reshape(n_routes, n_categories)
+        min_dist = np.full(n_routes * n_categories, np.inf)
+        np.minimum.at(min_dist, cell, distances)
+        min_dist = min_dist.reshape(n_routes, n_categories)
+
+        results = {}
+        for code, category in enumerate(self.categories):
+            cat_min = min_dist[:, code]
+            missing = np.flatnonzero(np.isinf(cat_min))
+            if len(missing) and len(self._category_points[category]):
+                (hit, _), nearest = self._category_trees[category].query_nearest(
+                    routes[missing], return_distance=True, all_matches=False
+                )
+                cat_min[missing[hit]] = nearest
+
+            results[category] = {
+                'min_distance': cat_min,
+                'count_within_range': counts[:, code],
+                'proximity_score': np.maximum(0.0, 1 - cat_min / max_distance)
+            }
+
+        return results
 
 
 def calculate_poi_proximity(route_geometry, pois_gdf, category=None, max_distance=500):
@@ -11,86 +177,87 @@ def calculate_poi_proximity(route_geometry, pois_gdf, category=None, max_distanc
 
     Args:
         route_geometry: LineString or list of (lat, lon) tuples
-        pois_gdf: GeoDataFrame with POIs
+        pois_gdf: GeoDataFrame with POIs, or a prebuilt POIIndex
+            (build the index once when calling this repeatedly)
         category: Filter POIs by category (optional)
         max_distance: Maximum distance to consider (meters)
 
     Returns:
         Dictionary with proximity metrics
     """
-    # Filter by category if specified
-    if category:
-        pois = pois_gdf[pois_gdf['category'] == category].copy()
-    else:
-        pois = pois_gdf.copy()
+    index = pois_gdf if isinstance(pois_gdf, POIIndex) else POIIndex(pois_gdf)
+    return index.query(route_geometry, category=category, max_distance=max_distance)
 
-    if len(pois) == 0:
-        return {
-            'min_distance': np.inf,
-            'avg_distance': np.inf,
-            'count_within_range': 0,
-            'proximity_score': 0
-        }
 
-    # Convert route to LineString if needed
-    if isinstance(route_geometry, list):
-        route_line = LineString([(lon, lat) for lat, lon in route_geometry])
-    else:
-        route_line = route_geometry
-
-    # Convert to projected CRS (UTM zone 35N for Romania)
-    # First, create a GeoSeries for the route
-    route_gs = gpd.GeoSeries([route_line], crs='EPSG:4326')
+@timed('poi.add_poi_features_to_routes')
+def add_poi_features_to_routes(routes_df, pois_gdf, max_distance=500):
+    """
+    Add POI-based features to a DataFrame of routes
 
-    # Reproject both to UTM (meters)
-    pois_projected = pois.to_crs('EPSG:32635')  # UTM zone 35N
-    route_projected = route_gs.to_crs('EPSG:32635')
+    Args:
+        routes_df: DataFrame with 'geometry' column (LineString)
+        pois_gdf: GeoDataFrame with POIs, or a prebuilt POIIndex
+        max_distance: Maximum distance to consider (meters)
 
-    # Calculate distances (now in meters)
-    distances = pois_projected.geometry.distance(route_projected.iloc[0])
+    Returns:
+        DataFrame with added POI features
+    """
+    index = pois_gdf if isinstance(pois_gdf, POIIndex) else POIIndex(pois_gdf)
 
-    # Calculate metrics
-    min_dist = distances.min()
-    avg_dist = distances.mean()
-    count_within = (distances <= max_distance).sum()
+    print(f"Scoring {len(routes_df)} routes against {len(index.categories)} POI categories...")
+    metrics = index.query_many(routes_df['geometry'], max_distance=max_distance)
 
-    # Proximity score (higher is better)
-    # 1.0 if POI is right on route, 0.0 if beyond max_distance
-    proximity_score = max(0, 1 - (min_dist / max_distance))
+    for category in index.categories:
+        feature_name = f'poi_{category}'
+        routes_df[f'{feature_name}_proximity'] = metrics[category]['proximity_score']
+        routes_df[f'{feature_name}_count'] = metrics[category]['count_within_range']
 
-    return {
-        'min_distance': min_dist,
-        'avg_distance': avg_dist,
-        'count_within_range': count_within,
-        'proximity_score': proximity_score
-    }
+    return routes_df
 
 
-def add_poi_features_to_routes(routes_df, pois_gdf):
+def route_poi_features(edge_table, route_edges, max_distance=500):
     """
-    Add POI-based features to a DataFrame of routes
+    Route-level POI features from the precomputed per-edge POI columns
+
+    Reduces the poi_<category>_min_distance / poi_<category>_count columns
+    of the edge feature table (see extract_road_features.extract_edge_poi_features)
+    over each route's edge indices - no geometry work at request time.
 
     Args:
-        routes_df: DataFrame with 'geometry' column (LineString)
-        pois_gdf: GeoDataFrame with POIs
+        edge_table: Edge feature DataFrame with per-edge POI columns
+        route_edges: List of edge index lists (rows of edge_table, e.g. the
+            'edges' of a routing result)
+        max_distance: Radius used for proximity_score (meters)
 
     Returns:
-        DataFrame with added POI features
+        DataFrame with one row per route: poi_<category>_min_distance,
+        poi_<category>_proximity and poi_<category>_edge_hits. Edge hits
+        sum the per-edge counts, so a POI near several edges counts once
+        per edge; it is not the distinct poi_<category>_count of
+        add_poi_features_to_routes.
     """
-    categories = pois_gdf['category'].unique()
+    categories = [c[len('poi_'):-len('_min_distance')] for c in edge_table.columns
+                  if c.startswith('poi_') and c.endswith('_min_distance')]
 
-    for category in categories:
-        print(f"Processing {category}...")
+    flat, offsets = to_ragged(route_edges)
+    starts = offsets[:-1]
+    has_edges = np.diff(offsets) > 0
 
-        feature_name = f'poi_{category}'
-        routes_df[f'{feature_name}_proximity'] = routes_df['geometry'].apply(
-            lambda geom: calculate_poi_proximity(geom, pois_gdf, category)['proximity_score']
-        )
-        routes_df[f'{feature_name}_count'] = routes_df['geometry'].apply(
-            lambda geom: calculate_poi_proximity(geom, pois_gdf, category)['count_within_range']
-        )
+    features = {}
+    for category in categories:
+        min_dist = np.full(len(route_edges), np.inf)
+        counts = np.zeros(len(route_edges), dtype=np.int64)
+        if len(flat):
+            edge_min = edge_table[f'poi_{category}_min_distance'].to_numpy(np.float64)[flat]
+            edge_count = edge_table[f'poi_{category}_count'].to_numpy(np.int64)[flat]
+            # reduceat needs in-bounds starts; empty routes keep their defaults
+            min_dist[has_edges] = np.minimum.reduceat(edge_min, starts[has_edges])
+            counts[has_edges] = np.add.reduceat(edge_count, starts[has_edges])
+        features[f'poi_{category}_min_distance'] = min_dist
+        features[f'poi_{category}_proximity'] = np.maximum(0.0, 1 - min_dist / max_distance)
+        features[f'poi_{category}_edge_hits'] = counts
 
-    return routes_df
+    return pd.DataFrame(features)
 
 
 # Example usage
@@ -106,6 +273,9 @@ if __name__ == "__main__":
         (21.2400, 45.7580),  # Towards Fabric district
     ])
 
+    # Build the index once, then query as often as needed
+    index = POIIndex(pois)
+
     # Calculate proximity to parks
-    park_proximity = calculate_poi_proximity(sample_route, pois, category='parks')
+    park_proximity = calculate_poi_proximity(sample_route, index, category='parks')
     print("Park proximity metrics:", park_proximity)
\ No newline at end of file
@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+
+from route_recommendation.src.routing.costs import edge_safety, highway_mask
+from route_recommendation.src.utils.instrumentation import count, timed
+
+
+# Heading change (degrees) counted as a turn, a sharp turn and a U-turn
+TURN_ANGLE = 30.0
+SHARP_TURN_ANGLE = 100.0
+U_TURN_ANGLE = 160.0
+
+# Nodes with at least this many streets are intersections (OSMnx street_count)
+INTERSECTION_STREETS = 3
+
+# Road classes of the highway mix; links count as their road, anything else is 'other'
+ROAD_CLASSES = ['motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'residential', 'other']
+_CLASS_ALIASES = {'living_street': 'residential', 'unclassified': 'residential'}
+
+
+def road_class(highway):
+    """Road class of a highway label for the mix (the first part of 'a|b' labels)"""
+    label = highway.split('|')[0]
+    label = label[:-len('_link')] if label.endswith('_link') else label
+    label = _CLASS_ALIASES.get(label, label)
+    return label if label in ROAD_CLASSES else 'other'
+
+
+def to_ragged(route_edges):
+    """
+    Pack routes into one values array plus offsets
+
+    Args:
+        route_edges: Sequence of edge index lists (e.g. the 'edges' column
+            of generate_alternatives)
+
+    Returns:
+        (values, offsets): int64 arrays; route i is values[offsets[i]:offsets[i + 1]]
+    """
+    lengths = np.fromiter((len(edges) for edges in route_edges), dtype=np.int64, count=len(route_edges))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    values = (np.concatenate([np.asarray(e, dtype=np.int64) for e in route_edges])
+              if offsets[-1] else np.zeros(0, dtype=np.int64))
+    return values, offsets
+
+
+def edge_bearings(graph, edges=None):
+    """
+    Compass bearing of edges from their start to their end node
+
+    Same formula as ox.bearing.calculate_bearing; NaN for edges whose end
+    nodes coincide.
+
+    Args:
+        graph: RoadGraph
+        edges: Edge indices (default: all edges)
+
+    Returns:
+        float64 array of bearings in degrees [0, 360)
+    """
+    u = graph.edge_u if edges is None else graph.edge_u[edges]
+    v = graph.edge_v if edges is None else graph.edge_v[edges]
+    lat1, lat2 = np.radians(graph.node_y[u]), np.radians(graph.node_y[v])
+    delta_lon = np.radians(graph.node_x[v] - graph.node_x[u])
+    y = np.sin(delta_lon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(delta_lon)
+    bearings = np.degrees(np.arctan2(y, x)) % 360
+    return np.where((x == 0) & (y == 0), np.nan, bearings)
+
+
+class RouteFeatureExtractor:
+    """
+    Route-level features from edge index sequences, for many routes at once
+
+    Routes come as a ragged array (all edge indices in one array plus
+    offsets), and every feature is a NumPy reduction over it - bincount
+    for sums, reduceat for maxima - so the cost is a few passes over the
+    edges regardless of how many routes there are. Per-edge inputs that do
+    not change with traffic (safety, road class, intersections) are
+    prepared once per graph.
+    """
+
+    def __init__(self, graph):
+        """
+        Args:
+            graph: RoadGraph
+        """
+        self.graph = graph
+        self.safety = edge_safety(graph)
+        class_codes = np.array([ROAD_CLASSES.index(road_class(h)) for h in graph.highway_categories],
+                               dtype=np.int8)
+        self.road_class = class_codes[graph.highway_code]
+        self.is_highway = highway_mask(graph)
+        self.junction = graph.street_count >= INTERSECTION_STREETS
+
+    def _heading_changes(self, values, route_of):
+        """Heading change (degrees) at the node after each edge; 0 where the route ends"""
+        inside = route_of[:-1] == route_of[1:]
+        bearings = edge_bearings(self.graph, values)
+        change = np.abs((bearings[1:] - bearings[:-1] + 180) % 360 - 180)
+        return np.where(inside, np.nan_to_num(change), 0.0), inside
+
+    def turns(self, values, offsets):
+        """
+        Turns (heading changes of at least TURN_ANGLE) of every route in a ragged array
+
+        Returns:
+            int64 array with one count per route, the 'turns' column of extract()
+        """
+        values = np.asarray(values, dtype=np.int64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        route_of = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        change, _ = self._heading_changes(values, route_of)
+        return np.bincount(route_of[:-1][change >= TURN_ANGLE], minlength=len(offsets) - 1).astype(np.int64)
+
+    @timed('route_features.extract')
+    def extract(self, values, offsets, use_traffic=True):
+        """
+        Features of every route in a ragged array
+
+        Args:
+            values: Edge indices of all routes, concatenated
+            offsets: Route i is values[offsets[i]:offsets[i + 1]]
+            use_traffic: Report current_travel_time as 'time' (else travel_time)
+
+        Returns:
+            DataFrame with one row per route: n_edges, length (m),
+            travel_time (s, free flow), time (s, traffic-adjusted unless
+            use_traffic=False), turns, sharp_turns, u_turns,
+            turn_angle_total and max_turn_angle (degrees), intersections,
+            safety (length-weighted mean of routing.costs.edge_safety),
+            uses_highway and one <class>_share column per ROAD_CLASSES
+            entry (share of the route length)
+        """
+        graph = self.graph
+        values = np.asarray(values, dtype=np.int64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        n_routes = len(offsets) - 1
+        n_edges = np.diff(offsets)
+        route_of = np.repeat(np.arange(n_routes), n_edges)
+        count('route_features.routes', n_routes)
+        count('route_features.edges', len(values))
+
+        def total(weights=None, mask=None):
+            routes = route_of if mask is None else route_of[:-1][mask]
+            return np.bincount(routes, weights=weights, minlength=n_routes)
+
+        length = graph.columns['length'][values].astype(np.float64)
+        route_length = total(length)
+        time_column = 'current_travel_time' if use_traffic else 'travel_time'
+        features = {
+            'n_edges': n_edges,
+            'length': route_length,
+            'travel_time': total(graph.columns['travel_time'][values].astype(np.float64)),
+            'time': total(graph.columns[time_column][values].astype(np.float64)),
+        }
+
+        # Consecutive edge pairs inside a route: the heading change at the node between them
+        change, inside = self._heading_changes(values, route_of)
+        features['turns'] = total(mask=change >= TURN_ANGLE).astype(np.int64)
+        features['sharp_turns'] = total(mask=change >= SHARP_TURN_ANGLE).astype(np.int64)
+        features['u_turns'] = total(mask=change >= U_TURN_ANGLE).astype(np.int64)
+        features['turn_angle_total'] = total(change, mask=np.ones(len(change), dtype=bool))
+
+        # reduceat needs in-bounds starts: pad so every non-empty route has one
+        max_turn = np.zeros(n_routes)
+        has_edges = n_edges > 0
+        if has_edges.any():
+            max_turn[has_edges] = np.maximum.reduceat(np.append(change, 0.0), offsets[:-1][has_edges])
+        features['max_turn_angle'] = max_turn
+
+        passed_junction = inside & self.junction[graph.edge_v[values[:-1]]]
+        features['intersections'] = total(mask=passed_junction).astype(np.int64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            features['safety'] = np.where(route_length > 0, total(length * self.safety[values]) / route_length,
+                                          np.nan)
+            mix = np.bincount(route_of * len(ROAD_CLASSES) + self.road_class[values], weights=length,
+                              minlength=n_routes * len(ROAD_CLASSES)).reshape(n_routes, len(ROAD_CLASSES))
+            shares = np.where(route_length[:, None] > 0, mix / route_length[:, None], 0.0)
+        features['uses_highway'] = total(self.is_highway[values].astype(np.float64)) > 0
+        for code, name in enumerate(ROAD_CLASSES):
+            features[f'{name}_share'] = shares[:, code]
+
+        return pd.DataFrame(features)
+
+    def extract_routes(self, route_edges, use_traffic=True):
+        """extract() for a sequence of edge index lists (see to_ragged)"""
+        return self.extract(*to_ragged(route_edges), use_traffic=use_traffic)
+
+
+def route_features(graph, route_edges, use_traffic=True):
+    """
+    One-off route features (build a RouteFeatureExtractor to reuse the per-graph arrays)
+
+    Args:
+        graph: RoadGraph
+        route_edges: Sequence of edge index lists
+        use_traffic: See RouteFeatureExtractor.extract
+
+    Returns:
+        DataFrame with one row per route
+    """
+    return RouteFeatureExtractor(graph).extract_routes(route_edges, use_traffic)
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+    from route_recommendation.src.models.road_graph import RoadGraph
+    from route_recommendation.src.routing.alternatives import generate_alternatives
+    from route_recommendation.src.routing.engine import RoutingEngine
+
+    graph = RoadGraph.load('../../data/raw/osm/Timişoara_Romania_drive.graph', overlay='traffic')
+    engine = RoutingEngine(graph)
+    extractor = RouteFeatureExtractor(graph)
+
+    rng = np.random.default_rng(0)
+    candidates = []
+    for origin, destination in rng.integers(0, graph.n_nodes, size=(200, 2)).tolist():
+        candidates.extend(generate_alternatives(engine, origin, destination, k=5)['edges'])
+
+    values, offsets = to_ragged(candidates)
+    start = time.perf_counter()
+    features = extractor.extract(values, offsets)
+    elapsed = time.perf_counter() - start
+    print(f"{len(candidates)} routes ({len(values):,} edges) in {elapsed * 1000:.1f} ms")
+    print(features.describe().T[['mean', 'min', 'max']])
@@ -0,0 +1,237 @@
+import numpy as np
+
+from route_recommendation.src.models.scoring import route_feature_matrix
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS
+from route_recommendation.src.utils.instrumentation import count, timed
+
+
+# Step size of one online update (per history record)
+LEARNING_RATE = 0.05
+
+# Scale of the pairwise logits: weighted relative differences lie in
+# [-1, 1], dividing by this makes a clear-cut choice saturate the sigmoid
+TEMPERATURE = 0.1
+
+# Batch fits are pulled towards the starting weights with this strength, so
+# users with only a few recorded choices keep most of their profile
+PRIOR_STRENGTH = 0.01
+
+
+def project_to_simplex(weights):
+    """
+    Euclidean projection onto {w >= 0, sum(w) = 1}
+
+    Args:
+        weights: Array of shape (5,) or (n, 5)
+
+    Returns:
+        Projected array of the same shape
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    rows = np.atleast_2d(weights)
+    ordered = -np.sort(-rows, axis=1)
+    cumulative = np.cumsum(ordered, axis=1) - 1
+    steps = np.arange(1, rows.shape[1] + 1)
+    support = np.count_nonzero(ordered - cumulative / steps > 0, axis=1)
+    threshold = cumulative[np.arange(len(rows)), support - 1] / support
+    projected = np.maximum(rows - threshold[:, None], 0)
+    return projected.reshape(weights.shape)
+
+
+def pairwise_differences(chosen, alternatives):
+    """
+    Relative criteria differences (alternative - chosen) of a choice
+
+    Positive entries are criteria on which the chosen route was better.
+    Dividing by the pair's sum makes the differences unitless and keeps
+    long and short trips on the same scale.
+
+    Args:
+        chosen: Criteria of the chosen route, shape (5,), lower is better
+            (see scoring.route_feature_matrix)
+        alternatives: Criteria of the rejected routes, shape (n, 5)
+
+    Returns:
+        Array of shape (n, 5) in [-1, 1]
+    """
+    chosen = np.asarray(chosen, dtype=np.float64)
+    alternatives = np.asarray(alternatives, dtype=np.float64).reshape(-1, len(PREFERENCE_KEYS))
+    total = alternatives + chosen
+    return np.divide(alternatives - chosen, total, out=np.zeros_like(total), where=total > 0)
+
+
+def _gradient(weights, differences, temperature):
+    """Log-likelihood gradient of the pairwise logistic model, per pair"""
+    logits = (differences @ weights if weights.ndim == 1
+              else np.einsum('ij,ij->i', differences, weights)) / temperature
+    return (1 / (1 + np.exp(np.clip(logits, -50, 50))))[:, None] * differences / temperature
+
+
+def update_from_choice(profile, chosen, alternatives, learning_rate=LEARNING_RATE, temperature=TEMPERATURE):
+    """
+    One online step from a single route choice
+
+    Pairwise logistic model: the chosen route beats an alternative with
+    probability sigmoid(w . d / temperature), d being the relative
+    differences. The weights take one gradient step on the record's pairs
+    and are projected back onto the simplex, so the update costs
+    O(alternatives x 5). An attached ProfileStore is updated too.
+
+    Args:
+        profile: UserProfile (updated in place)
+        chosen: Criteria of the chosen route, shape (5,)
+        alternatives: Criteria of the rejected routes, shape (n, 5)
+        learning_rate: Step size
+        temperature: Logit scale
+
+    Returns:
+        The new float32 preference vector
+    """
+    differences = pairwise_differences(chosen, alternatives)
+    if not len(differences):
+        return profile.preference_array
+
+    weights = project_to_simplex(profile.preference_array)
+    step = _gradient(weights, differences, temperature).mean(axis=0)
+    profile.preference_array[:] = project_to_simplex(weights + learning_rate * step)
+    count('preferences.online_updates')
+    if profile.store is not None:
+        profile.store.save_profile(profile)
+    return profile.preference_array
+
+
+def record_features(records, engine=None, use_traffic=True):
+    """
+    Criteria of the routes referenced by history records
+
+    A route dict either carries its criteria under 'features' (PREFERENCE_KEYS
+    order) or its edge indices under 'edges', which need an engine.
+
+    Args:
+        records: History record dicts (UserProfile.history)
+        engine: RoutingEngine for routes given as edges
+        use_traffic: Use current_travel_time for routes given as edges
+
+    Returns:
+        List of (chosen criteria (5,), alternative criteria (n, 5)) per
+        record; records without alternatives or usable routes are skipped
+    """
+    usable = [r for r in records
+              if r.get('chosen_route') and r.get('alternatives')
+              and all('features' in route or ('edges' in route and engine is not None)
+                      for route in [r['chosen_route'], *r['alternatives']])]
+
+    # Every route given as edges goes through one batched feature computation
+    routes = [route for r in usable for route in [r['chosen_route'], *r['alternatives']]]
+    edge_routes = [route['edges'] for route in routes if 'features' not in route]
+    computed = iter(route_feature_matrix(engine, edge_routes, use_traffic)['features'] if edge_routes else [])
+    features = np.array([route['features'] if 'features' in route else next(computed) for route in routes],
+                        dtype=np.float64).reshape(-1, len(PREFERENCE_KEYS))
+
+    pairs = []
+    start = 0
+    for r in usable:
+        n_routes = 1 + len(r['alternatives'])
+        pairs.append((features[start], features[start + 1:start + n_routes]))
+        start += n_routes
+    return pairs
+
+
+def learn_from_record(profile, record, engine=None, learning_rate=LEARNING_RATE):
+    """Online update from one history record (no-op if it lacks usable routes)"""
+    for chosen, alternatives in record_features([record], engine):
+        update_from_choice(profile, chosen, alternatives, learning_rate)
+    return profile.preference_array
+
+
+@timed('preferences.fit')
+def fit_preferences(profiles, engine=None, epochs=200, learning_rate=0.5, temperature=TEMPERATURE,
+                    prior=PRIOR_STRENGTH, update=True):
+    """
+    Fit every user's weights to their whole history at once
+
+    Projected gradient ascent on the same pairwise logistic model as
+    update_from_choice, vectorized over all (user, alternative) pairs:
+    each epoch is a few array operations regardless of the number of users.
+
+    Args:
+        profiles: List of UserProfile
+        engine: RoutingEngine for routes stored as edges (see record_features)
+        epochs: Full-batch gradient steps
+        learning_rate: Step size
+        temperature: Logit scale
+        prior: Strength of the pull towards each user's current weights
+        update: Write the fitted weights back into the profiles (and their
+            ProfileStore, if attached)
+
+    Returns:
+        float32 array of shape (n_users, 5) in PREFERENCE_KEYS order
+    """
+    differences, owners = [], []
+    for i, profile in enumerate(profiles):
+        for chosen, alternatives in record_features(profile.history, engine):
+            pair_differences = pairwise_differences(chosen, alternatives)
+            differences.append(pair_differences)
+            owners.append(np.full(len(pair_differences), i))
+
+    initial = project_to_simplex(np.array([p.preference_array for p in profiles], dtype=np.float64)
+                                 .reshape(-1, len(PREFERENCE_KEYS)))
+    weights = initial.copy()
+    if differences:
+        differences = np.concatenate(differences)
+        count('preferences.pairs', len(differences))
+        owners = np.concatenate(owners)
+        pair_counts = np.bincount(owners, minlength=len(profiles))[:, None]
+        has_pairs = pair_counts[:, 0] > 0
+
+        for _ in range(epochs):
+            pair_gradient = _gradient(weights[owners], differences, temperature)
+            gradient = np.column_stack([np.bincount(owners, weights=column, minlength=len(profiles))
+                                        for column in pair_gradient.T])
+            gradient = gradient / np.maximum(pair_counts, 1) - prior * (weights - initial)
+            weights[has_pairs] = project_to_simplex(weights[has_pairs] + learning_rate * gradient[has_pairs])
+
+    weights = weights.astype(np.float32)
+    if update:
+        stores = {}
+        for profile, row in zip(profiles, weights):
+            profile.preference_array[:] = row
+            if profile.store is not None:
+                stores.setdefault(id(profile.store), (profile.store, []))[1].append(profile)
+        for store, changed in stores.values():
+            store.save_profiles(changed)
+    return weights
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+    from route_recommendation.src.models.user_profile import UserProfile
+
+    rng = np.random.default_rng(0)
+    true_weights = rng.dirichlet(np.ones(len(PREFERENCE_KEYS)), size=50)
+
+    # Simulated users picking the cheapest of 5 random routes under their true weights
+    profiles = []
+    for weights in true_weights:
+        user = UserProfile()
+        for _ in range(40):
+            routes = rng.uniform(100, 1000, size=(5, len(PREFERENCE_KEYS)))
+            best = int(np.argmin(routes @ weights))
+            user.add_route_to_history(0, 1, {'features': routes[best].tolist()},
+                                      [{'features': r.tolist()} for i, r in enumerate(routes) if i != best], {})
+        profiles.append(user)
+
+    before = np.abs(np.array([p.preference_array for p in profiles]) - true_weights).sum(axis=1).mean()
+    start = time.perf_counter()
+    fit_preferences(profiles)
+    elapsed = time.perf_counter() - start
+    after = np.abs(np.array([p.preference_array for p in profiles]) - true_weights).sum(axis=1).mean()
+    print(f"Batch fit of {len(profiles)} users in {elapsed * 1000:.1f} ms, "
+          f"mean L1 error {before:.3f} -> {after:.3f}")
+
+    user = profiles[0]
+    record = user.history[-1]
+    start = time.perf_counter()
+    learn_from_record(user, record)
+    print(f"Online update in {(time.perf_counter() - start) * 1e6:.0f} µs: {user.preferences}")
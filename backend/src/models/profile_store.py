@@ -0,0 +1,242 @@
+import json
+import os
+import sqlite3
+import numpy as np
+
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS, RouteTable, UserProfile, json_default
+
+
+DEFAULT_DB_PATH = '../../data/processed/user_profiles.sqlite'
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    created_at TEXT,
+    archetype TEXT,
+    {', '.join(f'{key} REAL NOT NULL' for key in PREFERENCE_KEYS)},
+    constraints TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL REFERENCES users(user_id),
+    timestamp TEXT NOT NULL,
+    origin TEXT,
+    destination TEXT,
+    chosen_route TEXT,
+    alternatives TEXT,
+    context TEXT
+);
+CREATE INDEX IF NOT EXISTS history_user ON history(user_id, id);
+"""
+
+_HISTORY_FIELDS = ['timestamp', 'origin', 'destination', 'chosen_route', 'alternatives', 'context']
+
+
+class ProfileStore:
+    """
+    SQLite-backed store for user profiles and route history
+
+    Preferences and constraints live in one row per user; history is an
+    append-only table, so recording a route choice is a single INSERT
+    instead of rewriting the user's whole JSON file.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        """
+        Args:
+            path: SQLite database file (':memory:' for a throwaway store)
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        # Shared by the histories of the profiles loaded from this store
+        self.route_table = RouteTable()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Profiles
+    # ------------------------------------------------------------------
+
+    def _user_row(self, profile):
+        return (
+            profile.user_id,
+            profile.created_at,
+            profile.archetype,
+            *profile.preference_array.tolist(),
+            json.dumps(profile.constraints),
+        )
+
+    def save_profiles(self, profiles):
+        """
+        Insert or update profiles (preferences, constraints) in one transaction
+
+        History is not rewritten; the profiles are attached to the store so
+        later add_route_to_history calls append here.
+        """
+        profiles = list(profiles)
+        placeholders = ', '.join('?' * (4 + len(PREFERENCE_KEYS)))
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO users VALUES ({placeholders})",
+                [self._user_row(profile) for profile in profiles],
+            )
+        for profile in profiles:
+            profile.store = self
+
+    def save_profile(self, profile):
+        self.save_profiles([profile])
+
+    def load_profile(self, user_id, with_history=True):
+        """
+        Load one profile (attached to the store)
+
+        Raises:
+            KeyError: If the user does not exist
+        """
+        row = self._conn.execute(
+            f"SELECT created_at, archetype, {', '.join(PREFERENCE_KEYS)}, constraints "
+            "FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(user_id)
+
+        created_at, archetype, *weights, constraints = row
+        profile = UserProfile(user_id=user_id, preferences=dict(zip(PREFERENCE_KEYS, weights)),
+                              constraints=json.loads(constraints), route_table=self.route_table)
+        profile.created_at = created_at
+        profile.archetype = archetype
+        if with_history:
+            profile.history = self.history(user_id)
+        profile.store = self
+        return profile
+
+    def user_ids(self):
+        return [row[0] for row in self._conn.execute("SELECT user_id FROM users ORDER BY rowid")]
+
+    def count(self):
+        """Number of stored profiles"""
+        return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def preference_matrix(self):
+        """
+        All preference vectors at once
+
+        Returns:
+            (list of user ids, float32 array of shape (n_users, 5) in
+            PREFERENCE_KEYS order)
+        """
+        rows = self._conn.execute(
+            f"SELECT user_id, {', '.join(PREFERENCE_KEYS)} FROM users ORDER BY rowid"
+        ).fetchall()
+        user_ids = [row[0] for row in rows]
+        matrix = np.array([row[1:] for row in rows], dtype=np.float32).reshape(len(rows), len(PREFERENCE_KEYS))
+        return user_ids, matrix
+
+    # ------------------------------------------------------------------
+    # History
+    # ------------------------------------------------------------------
+
+    def append_history(self, user_id, record):
+        """Append one history record (a dict as built by add_route_to_history)"""
+        values = [record['timestamp']] + [json.dumps(record.get(field), default=json_default)
+                                          for field in _HISTORY_FIELDS[1:]]
+        with self._conn:
+            self._conn.execute(
+                f"INSERT INTO history (user_id, {', '.join(_HISTORY_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [user_id] + values,
+            )
+
+    def history(self, user_id, limit=None):
+        """
+        History records of a user, oldest first
+
+        Args:
+            user_id: User id
+            limit: Only the most recent `limit` records
+        """
+        query = f"SELECT {', '.join(_HISTORY_FIELDS)} FROM history WHERE user_id = ? ORDER BY id DESC"
+        params = [user_id]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self._conn.execute(query, params).fetchall()
+        return [
+            {'timestamp': row[0], **{field: json.loads(value) for field, value in zip(_HISTORY_FIELDS[1:], row[1:])}}
+            for row in reversed(rows)
+        ]
+
+    def history_count(self, user_id=None):
+        if user_id is None:
+            return self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM history WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Import
+    # ------------------------------------------------------------------
+
+    def import_json_dir(self, directory, replace=False):
+        """
+        Import profiles saved as one JSON file per user (UserProfile.save)
+
+        By default only users not yet in the store are added, with their
+        JSON history; stored users keep their preferences and history.
+
+        Args:
+            directory: Directory of <user>.json files
+            replace: Overwrite stored users with the JSON version, deleting
+                their stored history first
+
+        Returns:
+            Number of imported profiles
+        """
+        profiles = [UserProfile.load(os.path.join(directory, name))
+                    for name in sorted(os.listdir(directory)) if name.endswith('.json')]
+        if not replace:
+            known = set(self.user_ids())
+            profiles = [profile for profile in profiles if profile.user_id not in known]
+
+        with self._conn:
+            if replace:
+                self._conn.executemany("DELETE FROM history WHERE user_id = ?", [(p.user_id,) for p in profiles])
+        self.save_profiles(profiles)
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO history (user_id, {', '.join(_HISTORY_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [[p.user_id, record['timestamp']] + [json.dumps(record.get(f)) for f in _HISTORY_FIELDS[1:]]
+                 for p in profiles for record in p.history],
+            )
+        return len(profiles)
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+
+    # Throwaway copy: the appends below must not end up in the real store
+    store = ProfileStore(':memory:')
+    imported = store.import_json_dir('../../data/processed/user_profiles')
+    print(f"Imported {imported} profiles")
+
+    start = time.perf_counter()
+    user_ids, matrix = store.preference_matrix()
+    print(f"Loaded preference matrix {matrix.shape} in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    user = store.load_profile(user_ids[0])
+    start = time.perf_counter()
+    for i in range(1000):
+        user.add_route_to_history(origin=0, destination=i, chosen_route={'route_id': 0},
+                                  alternatives=[], context={'hour': 8})
+    print(f"1000 history appends in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({store.history_count(user.user_id)} stored)")
@@ -0,0 +1,510 @@
+import ast
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+
+# Float columns carried for every edge (all stored as float32)
+EDGE_COLUMNS = ['length', 'speed_kph', 'travel_time', 'current_travel_time', 'traffic_multiplier', 'lanes']
+
+# On-disk format: a directory of .npy arrays plus a small JSON header.
+# Bump the version whenever the set or meaning of the arrays changes.
+GRAPH_FORMAT_VERSION = 1
+HEADER_FILE = 'header.json'
+OVERLAY_DIR = 'overlays'
+STRUCTURE_ARRAYS = ['node_ids', 'node_x', 'node_y', 'street_count', 'indptr', 'edge_u', 'edge_v',
+                    'edge_key', 'edge_osmid', 'highway_code', 'oneway']
+
+# Edge table columns read by RoadGraph.from_edge_features
+EDGE_TABLE_COLUMNS = ['u', 'v', 'key', 'osmid', 'highway', 'oneway', 'length', 'speed_kph', 'travel_time',
+                      'current_travel_time', 'traffic_multiplier', 'lanes']
+
+
+def _highway_label(value):
+    """Normalize an OSM highway value; multi-type edges become 'a|b'"""
+    if isinstance(value, str) and value.startswith('['):
+        value = ast.literal_eval(value)  # stringified list from edge_features.csv
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return '|'.join(str(v) for v in value)
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return 'unknown'
+    return str(value)
+
+
+def parse_lanes(value):
+    """Lane count as float; the widest value for multi-valued tags, NaN if unknown"""
+    if isinstance(value, str) and value.startswith('['):
+        value = ast.literal_eval(value)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        parsed = [parse_lanes(v) for v in value]
+        parsed = [v for v in parsed if not np.isnan(v)]
+        return max(parsed) if parsed else np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _first_osmid(value):
+    """First OSM way id of an edge (simplified edges may merge several ways)"""
+    if isinstance(value, str) and value.startswith('['):
+        value = ast.literal_eval(value)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        value = value[0] if len(value) else None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+class RoadGraph:
+    """
+    Compact, array-backed road network in CSR layout
+
+    Nodes are numbered 0..n_nodes-1 (int32) and edges are sorted by source
+    node, so the out-edges of node i are edges indptr[i]:indptr[i + 1].
+    Built from the NetworkX graph edge order, edge i is the i-th edge of
+    G.edges(keys=True) - the same row order as edge_features.csv.
+    """
+
+    def __init__(self, node_ids, indptr, edge_v, columns, highway_code, highway_categories,
+                 edge_key=None, edge_osmid=None, oneway=None,
+                 node_x=None, node_y=None, street_count=None, edge_u=None, crs='epsg:4326'):
+        n_nodes = len(node_ids)
+        n_edges = len(edge_v)
+
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.edge_v = np.asarray(edge_v, dtype=np.int32)
+        self.edge_u = (np.repeat(np.arange(n_nodes, dtype=np.int32), np.diff(self.indptr))
+                       if edge_u is None else np.asarray(edge_u, dtype=np.int32))
+
+        self.columns = {name: np.asarray(col, dtype=np.float32) for name, col in columns.items()}
+        self.highway_code = np.asarray(highway_code, dtype=np.int16)
+        self.highway_categories = list(highway_categories)
+
+        self.edge_key = np.zeros(n_edges, np.int16) if edge_key is None else np.asarray(edge_key, np.int16)
+        self.edge_osmid = np.full(n_edges, -1, np.int64) if edge_osmid is None else np.asarray(edge_osmid, np.int64)
+        self.oneway = np.zeros(n_edges, bool) if oneway is None else np.asarray(oneway, bool)
+
+        self.node_x = np.full(n_nodes, np.nan) if node_x is None else np.asarray(node_x, np.float64)
+        self.node_y = np.full(n_nodes, np.nan) if node_y is None else np.asarray(node_y, np.float64)
+        self.street_count = np.zeros(n_nodes, np.int16) if street_count is None else np.asarray(street_count, np.int16)
+
+        self.crs = crs
+        self._node_lookup = None
+        self._reverse = None
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _from_edge_arrays(cls, node_ids, u_idx, v_idx, keys, osmids, highways, oneway, columns, **node_attrs):
+        """Sort edges by source (stable) and build the CSR structure"""
+        u_idx = np.asarray(u_idx, dtype=np.int64)
+        order = np.argsort(u_idx, kind='stable')
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(u_idx, minlength=len(node_ids)), out=indptr[1:])
+
+        highway_code, highway_categories = pd.factorize(pd.Series(highways, dtype=object))
+
+        return cls(
+            node_ids=node_ids,
+            indptr=indptr,
+            edge_v=np.asarray(v_idx)[order],
+            columns={name: np.asarray(col)[order] for name, col in columns.items()},
+            highway_code=highway_code[order],
+            highway_categories=highway_categories,
+            edge_key=np.asarray(keys)[order],
+            edge_osmid=np.asarray(osmids)[order],
+            oneway=np.asarray(oneway)[order],
+            **node_attrs,
+        )
+
+    @classmethod
+    def from_networkx(cls, G):
+        """
+        Build from an OSMnx MultiDiGraph
+
+        Args:
+            G: NetworkX MultiDiGraph (as produced by download_city_network)
+
+        Returns:
+            RoadGraph
+        """
+        node_ids = np.fromiter(G.nodes, dtype=np.int64, count=G.number_of_nodes())
+        node_index = {node: i for i, node in enumerate(G.nodes)}
+        node_data = [data for _, data in G.nodes(data=True)]
+
+        edges = list(G.edges(keys=True, data=True))
+        columns = {}
+        for name in ['length', 'speed_kph', 'travel_time']:
+            columns[name] = np.array([d.get(name, np.nan) for _, _, _, d in edges], dtype=np.float32)
+        columns['current_travel_time'] = np.array(
+            [d.get('current_travel_time', d.get('travel_time', np.nan)) for _, _, _, d in edges], dtype=np.float32)
+        columns['traffic_multiplier'] = np.array(
+            [d.get('traffic_multiplier', 1.0) for _, _, _, d in edges], dtype=np.float32)
+        columns['lanes'] = np.array([parse_lanes(d.get('lanes')) for _, _, _, d in edges], dtype=np.float32)
+
+        return cls._from_edge_arrays(
+            node_ids,
+            u_idx=[node_index[u] for u, _, _, _ in edges],
+            v_idx=[node_index[v] for _, v, _, _ in edges],
+            keys=[k for _, _, k, _ in edges],
+            osmids=[_first_osmid(d.get('osmid')) for _, _, _, d in edges],
+            highways=[_highway_label(d.get('highway')) for _, _, _, d in edges],
+            oneway=[bool(d.get('oneway', False)) for _, _, _, d in edges],
+            columns=columns,
+            node_x=[d.get('x', np.nan) for d in node_data],
+            node_y=[d.get('y', np.nan) for d in node_data],
+            street_count=[d.get('street_count', 0) for d in node_data],
+            crs=G.graph.get('crs', 'epsg:4326'),
+        )
+
+    @classmethod
+    def from_edge_features(cls, edges, nodes=None):
+        """
+        Build from the edge feature table
+
+        Args:
+            edges: Path to edge_features.parquet / .csv or a DataFrame with
+                the same columns (Parquet reads only the columns needed)
+            nodes: Optional DataFrame indexed by OSM node id with 'x', 'y'
+                (and 'street_count') columns, e.g. the nodes GeoDataFrame
+
+        Returns:
+            RoadGraph (node coordinates are NaN when nodes is not given)
+        """
+        if isinstance(edges, str) and edges.endswith('.parquet'):
+            available = pq.read_schema(edges).names
+            table = pq.read_table(edges, columns=[c for c in EDGE_TABLE_COLUMNS if c in available],
+                                  memory_map=True)
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+        elif isinstance(edges, str):
+            df = pd.read_csv(edges)
+        else:
+            df = edges
+
+        node_ids = pd.unique(np.concatenate([df['u'].to_numpy(), df['v'].to_numpy()])).astype(np.int64)
+        u_idx = pd.Index(node_ids).get_indexer(df['u'])
+        v_idx = pd.Index(node_ids).get_indexer(df['v'])
+
+        columns = {name: df[name].to_numpy(dtype=np.float32) for name in ['length', 'speed_kph', 'travel_time']}
+        columns['current_travel_time'] = (
+            df['current_travel_time'].to_numpy(np.float32) if 'current_travel_time' in df
+            else columns['travel_time'].copy()
+        )
+        columns['traffic_multiplier'] = (
+            df['traffic_multiplier'].to_numpy(np.float32) if 'traffic_multiplier' in df
+            else np.ones(len(df), np.float32)
+        )
+        if pd.api.types.is_numeric_dtype(df['lanes']):
+            columns['lanes'] = df['lanes'].to_numpy(np.float32)
+        else:
+            columns['lanes'] = np.array([parse_lanes(v) for v in df['lanes']], dtype=np.float32)
+
+        # Typed tables carry highway as a categorical: normalize each label once
+        if isinstance(df['highway'].dtype, pd.CategoricalDtype):
+            labels = np.array([_highway_label(c) for c in df['highway'].cat.categories], dtype=object)
+            highways = labels[df['highway'].cat.codes.to_numpy()]
+        else:
+            highways = [_highway_label(v) for v in df['highway']]
+
+        node_attrs = {}
+        if nodes is not None:
+            nodes = nodes.reindex(node_ids)
+            node_attrs['node_x'] = nodes['x'].to_numpy(float)
+            node_attrs['node_y'] = nodes['y'].to_numpy(float)
+            if 'street_count' in nodes:
+                node_attrs['street_count'] = nodes['street_count'].fillna(0).to_numpy()
+
+        return cls._from_edge_arrays(
+            node_ids,
+            u_idx=u_idx,
+            v_idx=v_idx,
+            keys=df['key'].to_numpy() if 'key' in df else np.zeros(len(df), np.int16),
+            osmids=[_first_osmid(v) for v in df['osmid']],
+            highways=highways,
+            oneway=df['oneway'].astype(bool).to_numpy() if 'oneway' in df else np.zeros(len(df), bool),
+            columns=columns,
+            **node_attrs,
+        )
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def save(self, directory):
+        """
+        Write the graph as a directory of .npy arrays plus header.json
+
+        The header is written last, so a directory without one is an
+        incomplete write and will not load. Arrays are replaced atomically
+        rather than rewritten, so processes that still memory-map the old
+        files keep reading them intact.
+
+        Args:
+            directory: Target directory (conventionally '<city>_<type>.graph')
+        """
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, HEADER_FILE)):
+            os.remove(os.path.join(directory, HEADER_FILE))
+
+        for name in STRUCTURE_ARRAYS:
+            save_array_atomic(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        for name, col in self.columns.items():
+            save_array_atomic(os.path.join(directory, f'{name}.npy'), col)
+
+        header = {
+            'format_version': GRAPH_FORMAT_VERSION,
+            'n_nodes': self.n_nodes,
+            'n_edges': self.n_edges,
+            'crs': self.crs,
+            'columns': list(self.columns),
+            'highway_categories': self.highway_categories,
+        }
+        write_json_atomic(os.path.join(directory, HEADER_FILE), header)
+
+    @classmethod
+    def load(cls, directory, overlay=None, mmap=True):
+        """
+        Open a graph written by save()
+
+        With mmap=True arrays are memory-mapped read-only, so loading takes
+        milliseconds and processes opening the same files share pages.
+
+        Args:
+            directory: Graph directory
+            overlay: Name of an overlay whose columns replace the base ones
+                (e.g. 'traffic'), or None
+            mmap: Memory-map arrays instead of reading them into RAM
+
+        Returns:
+            RoadGraph
+        """
+        with open(os.path.join(directory, HEADER_FILE)) as f:
+            header = json.load(f)
+        if header['format_version'] != GRAPH_FORMAT_VERSION:
+            raise ValueError(f"Unsupported graph format version {header['format_version']} "
+                             f"(expected {GRAPH_FORMAT_VERSION})")
+
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in STRUCTURE_ARRAYS}
+        columns = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                   for name in header['columns']}
+        if overlay is not None:
+            columns.update(load_overlay(directory, overlay, mmap=mmap)[0])
+
+        return cls(
+            node_ids=arrays['node_ids'],
+            indptr=arrays['indptr'],
+            edge_v=arrays['edge_v'],
+            columns=columns,
+            highway_code=arrays['highway_code'],
+            highway_categories=header['highway_categories'],
+            edge_key=arrays['edge_key'],
+            edge_osmid=arrays['edge_osmid'],
+            oneway=arrays['oneway'],
+            node_x=arrays['node_x'],
+            node_y=arrays['node_y'],
+            street_count=arrays['street_count'],
+            edge_u=arrays['edge_u'],
+            crs=header['crs'],
+        )
+
+    # ------------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------------
+
+    @property
+    def n_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_v)
+
+    @property
+    def highway(self):
+        """Highway label per edge (decoded; allocates a new array)"""
+        return np.asarray(self.highway_categories, dtype=object)[self.highway_code]
+
+    @property
+    def nbytes(self):
+        """Total size of all arrays in bytes"""
+        arrays = [self.node_ids, self.indptr, self.edge_u, self.edge_v, self.highway_code,
+                  self.edge_key, self.edge_osmid, self.oneway, self.node_x, self.node_y,
+                  self.street_count, *self.columns.values()]
+        return sum(a.nbytes for a in arrays)
+
+    def node_index(self, osm_ids):
+        """
+        Map OSM node id(s) to internal node indices
+
+        Args:
+            osm_ids: Single id or array of ids
+
+        Returns:
+            int or int32 array (KeyError if an id is unknown)
+        """
+        if self._node_lookup is None:
+            order = np.argsort(self.node_ids)
+            self._node_lookup = (self.node_ids[order], order.astype(np.int32))
+        sorted_ids, order = self._node_lookup
+
+        ids = np.asarray(osm_ids, dtype=np.int64)
+        pos = np.clip(np.searchsorted(sorted_ids, ids), 0, len(sorted_ids) - 1)
+        if np.any(sorted_ids[pos] != ids):
+            raise KeyError(f"Unknown node id(s): {ids[sorted_ids[pos] != ids][:5]}")
+
+        result = order[pos]
+        return int(result) if result.ndim == 0 else result
+
+    def out_edges(self, node):
+        """Edge indices leaving internal node index `node`"""
+        return np.arange(self.indptr[node], self.indptr[node + 1])
+
+    def edge_index(self, u, v, key=0):
+        """Edge index for an (u, v, key) triple of OSM node ids"""
+        ui, vi = self.node_index(u), self.node_index(v)
+        for e in range(self.indptr[ui], self.indptr[ui + 1]):
+            if self.edge_v[e] == vi and self.edge_key[e] == key:
+                return e
+        raise KeyError(f"No edge ({u}, {v}, {key})")
+
+    def reverse(self):
+        """
+        Incoming-edge CSR, built once and cached
+
+        Returns:
+            (indptr, edge_ids): incoming edges of node i are
+            edge_ids[indptr[i]:indptr[i + 1]]
+        """
+        if self._reverse is None:
+            edge_ids = np.argsort(self.edge_v, kind='stable').astype(np.int32)
+            indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.edge_v, minlength=self.n_nodes), out=indptr[1:])
+            self._reverse = (indptr, edge_ids)
+        return self._reverse
+
+    def to_dataframe(self):
+        """Edge table with OSM ids, decoded highway and all float columns"""
+        df = pd.DataFrame({
+            'u': self.node_ids[self.edge_u],
+            'v': self.node_ids[self.edge_v],
+            'key': self.edge_key,
+            'osmid': self.edge_osmid,
+            'highway': pd.Categorical.from_codes(self.highway_code, self.highway_categories),
+            'oneway': self.oneway,
+        })
+        for name, col in self.columns.items():
+            df[name] = col
+        return df
+
+    def __repr__(self):
+        return f"RoadGraph(nodes={self.n_nodes:,}, edges={self.n_edges:,}, {self.nbytes / 1e6:.1f} MB)"
+
+
+def save_array_atomic(path, values):
+    """
+    np.save to a temporary file renamed over path
+
+    Readers that memory-map the old file keep its (unlinked) contents
+    instead of seeing a partly rewritten array or faulting on a truncated one.
+    """
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp_path, path)
+
+
+def write_json_atomic(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def save_overlay(directory, name, columns, metadata=None):
+    """
+    Store edge columns (e.g. traffic) as an overlay next to a saved graph
+
+    Overlays hold only the columns that change, instead of a second copy of
+    the whole graph. Writing an overlay with an existing name replaces it.
+
+    Args:
+        directory: Graph directory written by RoadGraph.save
+        name: Overlay name (e.g. 'traffic')
+        columns: Dictionary {column name: array with one value per edge}
+        metadata: Optional JSON-serializable dict (e.g. the simulated timestamp)
+    """
+    with open(os.path.join(directory, HEADER_FILE)) as f:
+        n_edges = json.load(f)['n_edges']
+
+    overlay_dir = os.path.join(directory, OVERLAY_DIR, name)
+    os.makedirs(overlay_dir, exist_ok=True)
+
+    for column, values in columns.items():
+        values = np.asarray(values, dtype=np.float32)
+        if len(values) != n_edges:
+            raise ValueError(f"Overlay column {column} has {len(values)} values, graph has {n_edges} edges")
+        save_array_atomic(os.path.join(overlay_dir, f'{column}.npy'), values)
+
+    header = {
+        'format_version': GRAPH_FORMAT_VERSION,
+        'columns': list(columns),
+        'metadata': metadata or {},
+    }
+    write_json_atomic(os.path.join(overlay_dir, HEADER_FILE), header)
+
+
+def load_overlay(directory, name, mmap=True):
+    """
+    Read an overlay written by save_overlay
+
+    Returns:
+        (columns dict, metadata dict)
+    """
+    overlay_dir = os.path.join(directory, OVERLAY_DIR, name)
+    with open(os.path.join(overlay_dir, HEADER_FILE)) as f:
+        header = json.load(f)
+
+    mmap_mode = 'r' if mmap else None
+    columns = {column: np.load(os.path.join(overlay_dir, f'{column}.npy'), mmap_mode=mmap_mode)
+               for column in header['columns']}
+    return columns, header['metadata']
+
+
+def list_overlays(directory):
+    """Names of the complete overlays stored with a graph"""
+    overlay_root = os.path.join(directory, OVERLAY_DIR)
+    if not os.path.isdir(overlay_root):
+        return []
+    return sorted(name for name in os.listdir(overlay_root)
+                  if os.path.exists(os.path.join(overlay_root, name, HEADER_FILE)))
+
+
+# Example usage
+if __name__ == "__main__":
+    import pickle
+
+    with open('../../data/raw/osm/Timişoara_Romania_drive.pkl', 'rb') as f:
+        G = pickle.load(f)
+
+    graph = RoadGraph.from_networkx(G)
+    print(graph)
+    print(f"Pickled NetworkX graph: {len(pickle.dumps(G)) / 1e6:.1f} MB")
+
+    from_table = RoadGraph.from_edge_features('../../data/processed/edge_features.parquet')
+    print(f"From edge_features.parquet: {from_table}")
+
+    # Save once, then memory-map on every start
+    import time
+    graph.save('../../data/raw/osm/Timişoara_Romania_drive.graph')
+    start = time.perf_counter()
+    mapped = RoadGraph.load('../../data/raw/osm/Timişoara_Romania_drive.graph')
+    print(f"Memory-mapped load: {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,206 @@
+import numpy as np
+
+from route_recommendation.src.features.route_features import to_ragged
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS
+from route_recommendation.src.routing.costs import DECISION_PENALTY, REFERENCE_SPEED, highway_mask
+from route_recommendation.src.utils.instrumentation import count, timed
+
+
+# Score at most this many (user, route) cells at once
+SCORE_CHUNK = 4_000_000
+
+
+def preference_matrix(profiles):
+    """
+    Stack the preference vectors of many profiles
+
+    Args:
+        profiles: Iterable of UserProfile
+
+    Returns:
+        float32 array of shape (n_users, 5) in PREFERENCE_KEYS order with
+        rows normalized to sum to 1 (all-zero rows become uniform), like
+        routing.costs.preference_vector
+    """
+    weights = np.array([profile.preference_array for profile in profiles], dtype=np.float32)
+    weights = weights.reshape(-1, len(PREFERENCE_KEYS))
+    totals = weights.sum(axis=1, keepdims=True)
+    empty = totals[:, 0] <= 0
+    weights = weights / np.where(empty[:, None], 1, totals)
+    weights[empty] = 1 / len(PREFERENCE_KEYS)
+    return weights
+
+
+def constraint_arrays(constraints):
+    """
+    Per-user constraint limits as arrays
+
+    Args:
+        constraints: List of constraint dicts (UserProfile.constraints)
+
+    Returns:
+        Dictionary with max_time (seconds), max_distance (meters) - inf
+        where unset - and avoid_highways (bool)
+    """
+    def limit(key, scale):
+        return np.array([np.inf if c.get(key) is None else c[key] * scale for c in constraints], dtype=np.float64)
+
+    return {
+        'max_time': limit('max_time', 60.0),
+        'max_distance': limit('max_distance', 1000.0),
+        'avoid_highways': np.array([bool(c.get('avoid_highways', False)) for c in constraints], dtype=bool),
+    }
+
+
+@timed('scoring.route_feature_matrix')
+def route_feature_matrix(engine, route_edges, use_traffic=True):
+    """
+    Criteria of many candidate routes at once
+
+    The five criteria use the units of routing.costs.generalized_edge_cost
+    (seconds), so a user's score of a route equals the route's generalized
+    cost under that user's preferences - except simplicity, which charges
+    DECISION_PENALTY per turn (RouteFeatureExtractor.turns) where the
+    per-edge routing cost can only charge every edge.
+
+    Args:
+        engine: RoutingEngine (its edge criteria are used)
+        route_edges: Sequence of edge index lists, e.g. the 'edges' column
+            returned by generate_alternatives
+        use_traffic: Use current_travel_time instead of travel_time
+
+    Returns:
+        Dictionary with 'features' (float32, shape (n_routes, 5), lower is
+        better, PREFERENCE_KEYS order), 'travel_time' (s), 'length' (m) and
+        'uses_highway' (bool) per route
+    """
+    criteria = engine.criteria
+    edges, offsets = to_ragged(route_edges)
+    counts = np.diff(offsets)
+    route_of_edge = np.repeat(np.arange(len(counts)), counts)
+
+    def total(values):
+        return np.bincount(route_of_edge, weights=values, minlength=len(counts))
+
+    time = criteria['current_travel_time' if use_traffic else 'travel_time'][edges].astype(np.float64)
+    exposure = criteria['length'][edges].astype(np.float64) / REFERENCE_SPEED
+
+    features = np.column_stack([
+        total(time),
+        total(exposure),
+        total((1 - criteria['safety'][edges]) * exposure),
+        total((1 - criteria['scenery'][edges]) * exposure),
+        engine.route_features.turns(edges, offsets) * DECISION_PENALTY,
+    ]).astype(np.float32)
+
+    return {
+        'features': features,
+        'travel_time': total(time),
+        'length': total(criteria['length'][edges].astype(np.float64)),
+        'uses_highway': total(highway_mask(engine.graph)[edges].astype(np.float64)) > 0,
+    }
+
+
+def feasible_mask(routes, constraints):
+    """
+    Routes each user may be offered
+
+    Args:
+        routes: Output of route_feature_matrix
+        constraints: Output of constraint_arrays
+
+    Returns:
+        Boolean array of shape (n_users, n_routes)
+    """
+    return ((routes['travel_time'][None, :] <= constraints['max_time'][:, None])
+            & (routes['length'][None, :] <= constraints['max_distance'][:, None])
+            & ~(constraints['avoid_highways'][:, None] & routes['uses_highway'][None, :]))
+
+
+@timed('scoring.top_k_routes')
+def top_k_routes(preferences, routes, constraints=None, k=5):
+    """
+    Best k routes per user in one matrix product
+
+    Args:
+        preferences: Array of shape (n_users, 5), see preference_matrix
+        routes: Output of route_feature_matrix
+        constraints: Output of constraint_arrays (None = unconstrained)
+        k: Routes per user
+
+    Returns:
+        (indices, scores): arrays of shape (n_users, k), best first. Scores
+        are generalized costs (lower is better); slots without a feasible
+        route hold index -1 and score inf
+    """
+    preferences = np.asarray(preferences, dtype=np.float32)
+    features = routes['features']
+    n_users, n_routes = len(preferences), len(features)
+    count('scoring.cells', n_users * n_routes)
+    k = min(k, n_routes)
+    indices = np.full((n_users, k), -1, dtype=np.int64)
+    scores = np.full((n_users, k), np.inf, dtype=np.float32)
+    if k == 0:
+        return indices, scores
+
+    rows_per_chunk = max(1, SCORE_CHUNK // n_routes)
+    for start in range(0, n_users, rows_per_chunk):
+        rows = slice(start, min(start + rows_per_chunk, n_users))
+        chunk = preferences[rows] @ features.T
+        if constraints is not None:
+            chunk[~feasible_mask(routes, {key: values[rows] for key, values in constraints.items()})] = np.inf
+
+        # Unordered top k per row, then sort only those k
+        best = np.argpartition(chunk, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(chunk, best, axis=1)
+        order = np.argsort(best_scores, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+        indices[rows] = np.where(np.isfinite(best_scores), best, -1)
+        scores[rows] = best_scores
+    return indices, scores
+
+
+def recommend(profiles, routes, k=5):
+    """
+    Top-k routes for every profile, honoring their constraints
+
+    Args:
+        profiles: List of UserProfile
+        routes: Output of route_feature_matrix
+        k: Routes per user
+
+    Returns:
+        (indices, scores) as in top_k_routes, one row per profile
+    """
+    return top_k_routes(preference_matrix(profiles), routes,
+                        constraint_arrays([profile.constraints for profile in profiles]), k)
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+    from route_recommendation.src.models.profile_store import ProfileStore
+    from route_recommendation.src.models.road_graph import RoadGraph
+    from route_recommendation.src.routing.alternatives import generate_alternatives
+    from route_recommendation.src.routing.engine import RoutingEngine
+
+    graph = RoadGraph.load('../../data/raw/osm/Timişoara_Romania_drive.graph', overlay='traffic')
+    engine = RoutingEngine(graph)
+    store = ProfileStore(':memory:')
+    store.import_json_dir('../../data/processed/user_profiles')
+    profiles = [store.load_profile(user_id, with_history=False) for user_id in store.user_ids()]
+
+    # Candidate pool: alternatives between random node pairs
+    rng = np.random.default_rng(0)
+    candidates = []
+    for origin, destination in rng.integers(0, graph.n_nodes, size=(200, 2)).tolist():
+        candidates.extend(generate_alternatives(engine, origin, destination, k=5)['edges'])
+    routes = route_feature_matrix(engine, candidates)
+    print(f"{len(profiles)} profiles x {len(candidates)} candidate routes")
+
+    start = time.perf_counter()
+    indices, scores = recommend(profiles, routes, k=5)
+    print(f"Scored and ranked in {(time.perf_counter() - start) * 1000:.2f} ms")
+    print(f"Top routes for {profiles[0].user_id[:8]}: {indices[0].tolist()}")
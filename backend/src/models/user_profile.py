@@ -1,24 +1,232 @@
 import json
 import uuid
-from datetime import datetime
+from array import array
+from collections.abc import MutableMapping, Sequence
+from datetime import datetime, timedelta, timezone
 import os
+import numpy as np
+
+
+# Fixed order of the preference criteria wherever they are used as a vector
+PREFERENCE_KEYS = ['time', 'distance', 'safety', 'scenery', 'simplicity']
+_PREFERENCE_INDEX = {key: i for i, key in enumerate(PREFERENCE_KEYS)}
+
+DEFAULT_PREFERENCES = {
+    'time': 0.4,  # Travel time
+    'distance': 0.2,  # Route distance
+    'safety': 0.15,  # Safety score
+    'scenery': 0.15,  # Scenic value
+    'simplicity': 0.1  # Fewer turns
+}
+
+_EPOCH = datetime(1970, 1, 1)
+
+# UTC offset stored for naive timestamps
+_NAIVE = -2 ** 31
+
+
+def _to_micros(timestamp):
+    """
+    ISO timestamp -> (int64 microseconds, UTC offset in seconds)
+
+    Aware times are stored as UTC plus their offset, naive ones as they are
+    with offset _NAIVE.
+    """
+    moment = datetime.fromisoformat(timestamp)
+    offset = _NAIVE
+    if moment.tzinfo is not None:
+        offset = int(moment.utcoffset().total_seconds())
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - _EPOCH) // timedelta(microseconds=1), offset
+
+
+def _from_micros(micros, offset=_NAIVE):
+    moment = _EPOCH + timedelta(microseconds=micros)
+    if offset != _NAIVE:
+        moment = moment.replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(seconds=offset)))
+    return moment.isoformat()
+
+
+def json_default(value):
+    """json.dumps default= hook for numpy arrays and scalars in routes and records"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RouteTable:
+    """
+    Interned JSON values shared by the histories that use the table
+
+    History records store small integer ids into this table instead of
+    their own copies of routes, points and contexts, so a commute chosen
+    a hundred times is held once. Values are kept as canonical JSON text
+    and decoded on access, so neither the caller's object nor a returned
+    value can change a stored entry. As with the JSON files, numpy values
+    come back as plain lists and numbers and tuples as lists.
+
+    The table lives as long as the histories referencing it: each profile
+    gets its own unless one is passed in (ProfileStore shares one between
+    the profiles it loads).
+    """
+
+    __slots__ = ('_ids', '_values')
+
+    def __init__(self):
+        self._ids = {}
+        self._values = []
+
+    def intern(self, value):
+        """Id of a JSON-serializable value (numpy values allowed), adding it if new"""
+        key = json.dumps(value, sort_keys=True, default=json_default)
+        value_id = self._ids.get(key)
+        if value_id is None:
+            value_id = self._ids[key] = len(self._values)
+            self._values.append(key)
+        return value_id
+
+    def __getitem__(self, value_id):
+        """A fresh copy of the value"""
+        return json.loads(self._values[value_id])
+
+    def __len__(self):
+        return len(self._values)
+
+
+class PreferenceView(MutableMapping):
+    """
+    Dict view of a profile's float32 preference vector (missing keys read as 0)
+
+    The keys are fixed to PREFERENCE_KEYS: deleting or popping one raises
+    TypeError, and clear() zeroes every weight.
+    """
+
+    __slots__ = ('_vector',)
+
+    def __init__(self, vector):
+        self._vector = vector
+
+    def __getitem__(self, key):
+        return float(self._vector[_PREFERENCE_INDEX[key]])
+
+    def __setitem__(self, key, value):
+        if key not in _PREFERENCE_INDEX:
+            raise KeyError(f"Unknown preference '{key}', expected one of {PREFERENCE_KEYS}")
+        self._vector[_PREFERENCE_INDEX[key]] = value
+
+    def __delitem__(self, key):
+        raise TypeError("Preference keys are fixed; set a weight to 0 instead of deleting it")
+
+    def popitem(self):
+        raise TypeError("Preference keys are fixed; set a weight to 0 instead of deleting it")
+
+    def clear(self):
+        self._vector[:] = 0
+
+    def __iter__(self):
+        return iter(PREFERENCE_KEYS)
+
+    def __len__(self):
+        return len(PREFERENCE_KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class RouteHistory(Sequence):
+    """
+    Compact route history with the list-of-dicts interface
+
+    Columns of typed arrays: int64 timestamps and their UTC offsets plus ids into a shared
+    RouteTable for origin, destination, chosen route and context, and a
+    ragged id array for the alternatives. Records are rebuilt as new dicts
+    on access, so editing one does not change the history.
+    """
+
+    __slots__ = ('table', '_timestamps', '_offsets', '_origins', '_destinations', '_chosen', '_contexts',
+                 '_alternatives', '_alternative_offsets')
+
+    def __init__(self, records=(), table=None):
+        self.table = table if table is not None else RouteTable()
+        self._timestamps = array('q')
+        self._offsets = array('i')
+        self._origins = array('i')
+        self._destinations = array('i')
+        self._chosen = array('i')
+        self._contexts = array('i')
+        self._alternatives = array('i')
+        self._alternative_offsets = array('q', [0])
+        for record in records:
+            self.append(record)
+
+    def append(self, record):
+        """Add a record dict (timestamp, origin, destination, chosen_route, alternatives, context)"""
+        table = self.table
+        micros, offset = _to_micros(record['timestamp'])
+        self._timestamps.append(micros)
+        self._offsets.append(offset)
+        self._origins.append(table.intern(record.get('origin')))
+        self._destinations.append(table.intern(record.get('destination')))
+        self._chosen.append(table.intern(record.get('chosen_route')))
+        self._contexts.append(table.intern(record.get('context')))
+        self._alternatives.extend(table.intern(route) for route in record.get('alternatives') or [])
+        self._alternative_offsets.append(len(self._alternatives))
+
+    @property
+    def timestamps(self):
+        """int64 microseconds since 1970-01-01 of every record (a copy: a view would block appends)"""
+        return np.array(self._timestamps, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('history index out of range')
+        table = self.table
+        start, end = self._alternative_offsets[index], self._alternative_offsets[index + 1]
+        return {
+            'timestamp': _from_micros(self._timestamps[index], self._offsets[index]),
+            'origin': table[self._origins[index]],
+            'destination': table[self._destinations[index]],
+            'chosen_route': table[self._chosen[index]],
+            'alternatives': [table[i] for i in self._alternatives[start:end]],
+            'context': table[self._contexts[index]],
+        }
+
+    def __eq__(self, other):
+        if isinstance(other, (RouteHistory, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"RouteHistory({len(self)} records)"
 
 
 class UserProfile:
     """Represents a user's preferences and history"""
 
-    def __init__(self, user_id=None, preferences=None, constraints=None):
+    __slots__ = ('user_id', 'created_at', 'archetype', 'constraints', 'store', '_preferences', '_history')
+
+    def __init__(self, user_id=None, preferences=None, constraints=None, route_table=None):
+        """
+        Args:
+            user_id: Id (default: a new UUID)
+            preferences: Dict of weights (default: DEFAULT_PREFERENCES)
+            constraints: Dict of constraints
+            route_table: RouteTable to share with other profiles (default: its own)
+        """
         self.user_id = user_id or str(uuid.uuid4())
         self.created_at = datetime.now().isoformat()
 
-        # Default preferences (weights sum to 1.0)
-        self.preferences = preferences or {
-            'time': 0.4,  # Travel time
-            'distance': 0.2,  # Route distance
-            'safety': 0.15,  # Safety score
-            'scenery': 0.15,  # Scenic value
-            'simplicity': 0.1  # Fewer turns
-        }
+        # float32 weights in PREFERENCE_KEYS order (sum to 1.0 by default)
+        self.preferences = preferences or DEFAULT_PREFERENCES
 
         # Constraints
         self.constraints = constraints or {
@@ -29,18 +237,53 @@ class UserProfile:
         }
 
         # Route history
-        self.history = []
+        self._history = RouteHistory(table=route_table)
+
+        # Archetype the profile was generated from (simulated users only)
+        self.archetype = None
+
+        # ProfileStore the profile was loaded from or saved to (optional)
+        self.store = None
+
+    @property
+    def preferences(self):
+        """Preference weights as a dict view of the vector"""
+        return PreferenceView(self._preferences)
+
+    @preferences.setter
+    def preferences(self, preferences):
+        vector = np.zeros(len(PREFERENCE_KEYS), dtype=np.float32)
+        view = PreferenceView(vector)
+        for key, value in preferences.items():
+            view[key] = value
+        self._preferences = vector
+
+    @property
+    def preference_array(self):
+        """float32 preference vector in PREFERENCE_KEYS order"""
+        return self._preferences
+
+    @property
+    def history(self):
+        return self._history
+
+    @history.setter
+    def history(self, records):
+        self._history = RouteHistory(records, self._history.table)
 
     def add_route_to_history(self, origin, destination, chosen_route, alternatives, context):
-        """Record a route choice"""
-        self.history.append({
+        """Record a route choice (and append it to the attached ProfileStore)"""
+        record = {
             'timestamp': datetime.now().isoformat(),
             'origin': origin,
             'destination': destination,
             'chosen_route': chosen_route,
             'alternatives': alternatives,
             'context': context
-        })
+        }
+        self._history.append(record)
+        if self.store is not None:
+            self.store.append_history(self.user_id, record)
 
     def update_preferences(self, new_preferences):
         """Update preference weights"""
@@ -55,16 +298,16 @@ class UserProfile:
         data = {
             'user_id': self.user_id,
             'created_at': self.created_at,
-            'preferences': self.preferences,
+            'preferences': dict(self.preferences),
             'constraints': self.constraints,
-            'history': self.history
+            'history': list(self.history)
         }
 
         with open(filepath, 'w') as f:
             json.dump(data, f, indent=2)
 
     @classmethod
-    def load(cls, filepath):
+    def load(cls, filepath, route_table=None):
         """Load profile from JSON file"""
         with open(filepath, 'r') as f:
             data = json.load(f)
@@ -72,7 +315,8 @@ class UserProfile:
         profile = cls(
             user_id=data['user_id'],
             preferences=data['preferences'],
-            constraints=data['constraints']
+            constraints=data['constraints'],
+            route_table=route_table
         )
         profile.created_at = data['created_at']
         profile.history = data['history']
@@ -103,4 +347,4 @@ if __name__ == "__main__":
 
     # Load
     loaded_user = UserProfile.load('../../data/processed/user_profiles/user_example.json')
-    print(f"Loaded: {loaded_user}")
\ No newline at end of file
+    print(f"Loaded: {loaded_user}")
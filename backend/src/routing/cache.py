@@ -0,0 +1,211 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS
+from route_recommendation.src.routing.alternatives import generate_alternatives
+from route_recommendation.src.routing.costs import preference_vector
+
+
+DEFAULT_MAX_SIZE = 10_000
+
+# Seconds a cached result stays valid even without a traffic update
+DEFAULT_TTL = 900.0
+
+# Preference weights are rounded to multiples of 1 / PREFERENCE_STEPS
+PREFERENCE_STEPS = 20
+
+
+def preference_bucket(preferences, steps=PREFERENCE_STEPS):
+    """
+    Quantized preference vector used in cache keys
+
+    Args:
+        preferences: Dict of weights (normalized here)
+        steps: Quantization steps per unit weight
+
+    Returns:
+        Tuple of ints in PREFERENCE_KEYS order
+    """
+    return tuple(np.rint(preference_vector(preferences) * steps).astype(int).tolist())
+
+
+def bucket_preferences(bucket, steps=PREFERENCE_STEPS):
+    """Representative preference dict of a bucket"""
+    return {key: value / steps for key, value in zip(PREFERENCE_KEYS, bucket)}
+
+
+def constraint_key(constraints):
+    """Hashable form of the constraints that are set (None/False are dropped)"""
+    return tuple(sorted((k, v) for k, v in (constraints or {}).items() if v is not None and v is not False))
+
+
+class RouteCache:
+    """
+    Size-bounded LRU cache with a TTL for routing results
+
+    Keys carry the traffic epoch, and advancing the epoch (by hand or by
+    binding the cache to a TrafficOverlay) drops every entry, so results
+    never outlive the traffic they were computed with.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL, steps=PREFERENCE_STEPS, clock=time.monotonic):
+        """
+        Args:
+            max_size: Maximum number of entries (least recently used go first)
+            ttl: Seconds an entry stays valid (None = no expiry)
+            steps: Preference quantization steps (see preference_bucket)
+            clock: Function returning the current time in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.steps = steps
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, origin, destination, preferences=None, constraints=None, kind='route'):
+        """
+        Cache key for one request
+
+        Args:
+            origin, destination: Snapped node indices
+            preferences: Dict of weights, e.g. UserProfile.preferences
+            constraints: Dict of constraints, e.g. UserProfile.constraints
+            kind: What is cached (e.g. 'route' or 'alternatives:5')
+        """
+        return (kind, int(origin), int(destination), preference_bucket(preferences or {'time': 1.0}, self.steps),
+                constraint_key(constraints), self.epoch)
+
+    def get(self, key):
+        """Cached value or None (expired entries count as misses)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > self._clock()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        expires = None if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, calling compute() on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def advance_epoch(self, epoch=None):
+        """Invalidate everything: new keys use the next (or given) epoch"""
+        with self._lock:
+            self.epoch = self.epoch + 1 if epoch is None else epoch
+            self._entries.clear()
+
+    def bind(self, overlay):
+        """Follow a TrafficOverlay: every applied delta advances the epoch"""
+        self.advance_epoch(overlay.version)
+        overlay.subscribe(lambda snapshot, changed: self.advance_epoch(snapshot.version))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'epoch': self.epoch,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedRouter:
+    """
+    RoutingEngine front end that answers repeated requests from a RouteCache
+
+    Origins and destinations may be node indices or (lat, lon) pairs, which
+    are snapped first so nearby GPS fixes of the same commute share entries.
+    Routes are computed with the bucket's representative preferences, so a
+    cached result is exactly what a fresh query for that bucket returns.
+    """
+
+    def __init__(self, engine, cache=None, snap_index=None, overlay=None):
+        """
+        Args:
+            engine: RoutingEngine
+            cache: RouteCache (default: a new one with default limits)
+            snap_index: SnapIndex for (lat, lon) inputs
+            overlay: Optional TrafficOverlay that both the engine and the
+                cache follow
+        """
+        self.engine = engine
+        self.cache = cache if cache is not None else RouteCache()
+        self.snap_index = snap_index
+        if overlay is not None:
+            overlay.subscribe(engine.apply_traffic_update)
+            self.cache.bind(overlay)
+
+    def _node(self, point):
+        if isinstance(point, (tuple, list)):
+            if self.snap_index is None:
+                raise ValueError("Coordinates need a snap_index")
+            return int(self.snap_index.nearest_nodes(point[0], point[1])[0])
+        return int(point)
+
+    def route(self, origin, destination, preferences=None, constraints=None):
+        """Cached RoutingEngine.route (see there); None if unreachable"""
+        key = self.cache.make_key(self._node(origin), self._node(destination), preferences, constraints)
+        _, o, d, bucket, _, _ = key
+        return self.cache.get_or_compute(key, lambda: self.engine.route(
+            o, d, bucket_preferences(bucket, self.cache.steps), constraints))
+
+    def alternatives(self, origin, destination, k=5, preferences=None, constraints=None):
+        """Cached generate_alternatives (see there)"""
+        key = self.cache.make_key(self._node(origin), self._node(destination), preferences, constraints,
+                                  kind=f'alternatives:{k}')
+        _, o, d, bucket, _, _ = key
+        return self.cache.get_or_compute(key, lambda: generate_alternatives(
+            self.engine, o, d, k=k, preferences=bucket_preferences(bucket, self.cache.steps),
+            constraints=constraints))
+
+
+# Example usage
+if __name__ == "__main__":
+    from route_recommendation.src.models.road_graph import RoadGraph
+    from route_recommendation.src.routing.engine import RoutingEngine
+    from route_recommendation.src.routing.snapping import SnapIndex
+
+    graph = RoadGraph.load('../../data/raw/osm/Timişoara_Romania_drive.graph', overlay='traffic')
+    router = CachedRouter(RoutingEngine(graph), snap_index=SnapIndex(graph))
+    preferences = {'time': 0.4, 'distance': 0.2, 'safety': 0.15, 'scenery': 0.15, 'simplicity': 0.1}
+
+    # Victory Square to Iulius Mall, twice
+    for attempt in ['cold', 'warm']:
+        start = time.perf_counter()
+        route = router.route((45.7489, 21.2272), (45.7663, 21.2274), preferences)
+        print(f"{attempt}: {(time.perf_counter() - start) * 1e6:.0f} µs, {route['length']:.0f} m")
+    print(router.cache.stats())
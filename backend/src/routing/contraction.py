@@ -0,0 +1,450 @@
+import heapq
+import json
+import math
+import os
+import time
+import numpy as np
+
+from route_recommendation.src.models.road_graph import HEADER_FILE, save_array_atomic, write_json_atomic
+
+CH_FORMAT_VERSION = 1
+
+# Witness searches give up after settling this many nodes. Stopping early
+# only adds superfluous shortcuts, it never breaks correctness.
+WITNESS_SETTLE_LIMIT = 500
+
+CH_ARRAYS = ['rank', 'up_indptr', 'up_head', 'up_weight', 'up_arc',
+             'down_indptr', 'down_tail', 'down_weight', 'down_arc',
+             'arc_edge', 'arc_first', 'arc_second']
+
+
+def ch_path(graph_dir, weight):
+    """Where the hierarchy for a weight is stored next to a saved graph"""
+    return os.path.join(graph_dir, f'ch_{weight}')
+
+
+def collapse_parallel_edges(graph, weights):
+    """
+    Cheapest edge per (u, v) pair, without self-loops
+
+    Args:
+        graph: RoadGraph
+        weights: Weight per edge
+
+    Returns:
+        (tails, heads, weights, edge ids) arrays of the kept arcs
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    keep = (graph.edge_u != graph.edge_v) & np.isfinite(weights)
+    edges = np.flatnonzero(keep)
+
+    # Sort by (u, v, weight) and keep the first edge of every (u, v) group
+    order = np.lexsort((weights[edges], graph.edge_v[edges], graph.edge_u[edges]))
+    edges = edges[order]
+    u, v = graph.edge_u[edges], graph.edge_v[edges]
+    first = np.ones(len(edges), dtype=bool)
+    first[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+    edges = edges[first]
+
+    return graph.edge_u[edges], graph.edge_v[edges], weights[edges], edges
+
+
+def _witness_search(out_adj, source, excluded, targets, max_cost):
+    """Distances from source avoiding `excluded`, pruned at max_cost"""
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    remaining = set(targets)
+    settled = 0
+
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        if d > max_cost:
+            break
+        remaining.discard(u)
+        settled += 1
+        if settled > WITNESS_SETTLE_LIMIT:
+            break
+        for v, w in out_adj[u].items():
+            if v == excluded:
+                continue
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+
+    return dist
+
+
+def _needed_shortcuts(out_adj, in_adj, x):
+    """Shortcuts (u, w, weight) that contracting x would require"""
+    shortcuts = []
+    for u, w_ux in in_adj[x].items():
+        targets = {w: w_ux + w_xw for w, w_xw in out_adj[x].items() if w != u}
+        if not targets:
+            continue
+        dist = _witness_search(out_adj, u, x, targets, max(targets.values()))
+        for w, cost in targets.items():
+            if dist.get(w, math.inf) > cost:
+                shortcuts.append((u, w, cost))
+    return shortcuts
+
+
+def _bidirectional_upward_search(up, down, source, target):
+    """
+    Shared CH query: Dijkstra upward from source and (reversed) from target
+
+    Args:
+        up: (indptr, head, weight) lists of upward arcs by tail
+        down: (indptr, tail, weight) lists of downward arcs by head
+        source, target: Node indices
+
+    Returns:
+        (cost, meeting node, forward pred, backward pred); pred maps a node
+        to (arc slot, previous node)
+    """
+    if source == target:
+        return 0.0, source, {}, {}
+
+    searches = [
+        (up, {source: 0.0}, {}, [(0.0, source)]),
+        (down, {target: 0.0}, {}, [(0.0, target)]),
+    ]
+    best, meeting = math.inf, None
+    side = 0
+
+    while searches[0][3] or searches[1][3]:
+        # Alternate directions, skipping a side whose queue is exhausted
+        if not searches[side][3]:
+            side = 1 - side
+        (indptr, heads, weights), dist, pred, heap = searches[side]
+        other_dist = searches[1 - side][1]
+
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            side = 1 - side
+            continue
+        if d >= best:
+            heap.clear()  # this direction cannot improve the answer anymore
+            side = 1 - side
+            continue
+
+        if u in other_dist and d + other_dist[u] < best:
+            best, meeting = d + other_dist[u], u
+
+        for slot in range(indptr[u], indptr[u + 1]):
+            v = heads[slot]
+            nd = d + weights[slot]
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                pred[v] = (slot, u)
+                heapq.heappush(heap, (nd, v))
+        side = 1 - side
+
+    return best, meeting, searches[0][2], searches[1][2]
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over one edge weight of a RoadGraph
+
+    Nodes are contracted one by one (lazy edge-difference ordering with
+    witness searches); the resulting upward/downward arc graphs answer
+    exact shortest-path queries with a small bidirectional search.
+    """
+
+    def __init__(self, arrays, weight=None):
+        self.weight = weight
+        for name in CH_ARRAYS:
+            setattr(self, name, np.asarray(arrays[name]))
+        self._prepare()
+
+    def _prepare(self):
+        # Python lists for the query loop
+        self._up = (self.up_indptr.tolist(), self.up_head.tolist(), self.up_weight.tolist())
+        self._down = (self.down_indptr.tolist(), self.down_tail.tolist(), self.down_weight.tolist())
+        self._up_arc = self.up_arc.tolist()
+        self._down_arc = self.down_arc.tolist()
+        self._arc_edge = self.arc_edge.tolist()
+        self._arc_first = self.arc_first.tolist()
+        self._arc_second = self.arc_second.tolist()
+
+    @property
+    def n_nodes(self):
+        return len(self.rank)
+
+    @property
+    def n_shortcuts(self):
+        return int(np.sum(self.arc_edge < 0))
+
+    # ------------------------------------------------------------------
+    # Preprocessing
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, graph, weight='travel_time', verbose=False):
+        """
+        Contract every node of a RoadGraph
+
+        Args:
+            graph: RoadGraph
+            weight: Column name (e.g. 'travel_time', 'length') or weight array
+            verbose: Print progress
+
+        Returns:
+            ContractionHierarchy
+        """
+        weights = graph.columns[weight] if isinstance(weight, str) else weight
+        tails, heads, arc_weights, arc_edges = collapse_parallel_edges(graph, weights)
+        n = graph.n_nodes
+
+        out_adj = [dict() for _ in range(n)]
+        in_adj = [dict() for _ in range(n)]
+        middle = {}
+        original = {}
+        for u, v, w, e in zip(tails.tolist(), heads.tolist(), arc_weights.tolist(), arc_edges.tolist()):
+            out_adj[u][v] = w
+            in_adj[v][u] = w
+            original[(u, v)] = e
+
+        # Final arcs, recorded when their lower-ranked end node is contracted
+        arc_tail, arc_head, arc_weight, arc_middle = [], [], [], []
+        rank = np.empty(n, dtype=np.int32)
+        deleted_neighbors = [0] * n
+
+        def record(u, v, w):
+            arc_tail.append(u)
+            arc_head.append(v)
+            arc_weight.append(w)
+            arc_middle.append(middle.get((u, v), -1))
+
+        def priority(x):
+            removed = len(in_adj[x]) + len(out_adj[x])
+            return len(_needed_shortcuts(out_adj, in_adj, x)) - removed + deleted_neighbors[x]
+
+        heap = [(priority(x), x) for x in range(n)]
+        heapq.heapify(heap)
+        next_rank = 0
+        start = time.perf_counter()
+
+        while heap:
+            _, x = heapq.heappop(heap)
+            # Lazy update: re-evaluate and requeue if no longer the minimum
+            current = priority(x)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, x))
+                continue
+
+            for u, w, cost in _needed_shortcuts(out_adj, in_adj, x):
+                if cost < out_adj[u].get(w, math.inf):
+                    out_adj[u][w] = cost
+                    in_adj[w][u] = cost
+                    middle[(u, w)] = x
+
+            for u, w in in_adj[x].items():
+                record(u, x, w)
+                del out_adj[u][x]
+                deleted_neighbors[u] += 1
+            for v, w in out_adj[x].items():
+                record(x, v, w)
+                del in_adj[v][x]
+                deleted_neighbors[v] += 1
+            in_adj[x].clear()
+            out_adj[x].clear()
+
+            rank[x] = next_rank
+            next_rank += 1
+            if verbose and next_rank % 1000 == 0:
+                print(f"  Contracted {next_rank:,}/{n:,} nodes ({time.perf_counter() - start:.1f}s)")
+
+        arc_index = {(u, v): i for i, (u, v) in enumerate(zip(arc_tail, arc_head))}
+        arc_edge = np.array([original.get((u, v), -1) if m < 0 else -1
+                             for u, v, m in zip(arc_tail, arc_head, arc_middle)], dtype=np.int64)
+        arc_first = np.array([arc_index[(u, m)] if m >= 0 else -1
+                              for u, m in zip(arc_tail, arc_middle)], dtype=np.int64)
+        arc_second = np.array([arc_index[(m, v)] if m >= 0 else -1
+                               for v, m in zip(arc_head, arc_middle)], dtype=np.int64)
+
+        arrays = _search_graphs(rank, np.array(arc_tail, np.int32), np.array(arc_head, np.int32),
+                                np.array(arc_weight, np.float64))
+        arrays.update(rank=rank, arc_edge=arc_edge, arc_first=arc_first, arc_second=arc_second)
+
+        ch = cls(arrays, weight=weight if isinstance(weight, str) else None)
+        if verbose:
+            print(f"  Built hierarchy with {ch.n_shortcuts:,} shortcuts in {time.perf_counter() - start:.1f}s")
+        return ch
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def unpack(self, arc):
+        """Original edge indices behind an arc (recursively expands shortcuts)"""
+        edges = []
+        stack = [arc]
+        while stack:
+            a = stack.pop()
+            if self._arc_first[a] < 0:
+                edges.append(self._arc_edge[a])
+            else:
+                stack.append(self._arc_second[a])
+                stack.append(self._arc_first[a])
+        return edges
+
+    def query(self, source, target, unpack=True):
+        """
+        Shortest path between two nodes
+
+        Args:
+            source, target: Internal node indices
+            unpack: Also return the path as original edge indices
+
+        Returns:
+            (cost, list of edge indices or None); (inf, None) if unreachable
+        """
+        cost, meeting, forward, backward = _bidirectional_upward_search(self._up, self._down, source, target)
+        if meeting is None:
+            return math.inf, None
+        if not unpack:
+            return cost, None
+
+        arcs = []
+        node = meeting
+        while node != source:
+            slot, node = forward[node]
+            arcs.append(self._up_arc[slot])
+        arcs.reverse()
+        node = meeting
+        while node != target:
+            slot, node = backward[node]
+            arcs.append(self._down_arc[slot])
+
+        edges = []
+        for arc in arcs:
+            edges.extend(self.unpack(arc))
+        return cost, edges
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def save(self, directory):
+        """
+        Write the hierarchy as .npy arrays plus a JSON header
+
+        Same protocol as RoadGraph.save: the old header is removed first and
+        the new one written last, and arrays are replaced atomically.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, HEADER_FILE)):
+            os.remove(os.path.join(directory, HEADER_FILE))
+        for name in CH_ARRAYS:
+            save_array_atomic(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        header = {
+            'format_version': CH_FORMAT_VERSION,
+            'weight': self.weight,
+            'n_nodes': self.n_nodes,
+            'n_shortcuts': self.n_shortcuts,
+        }
+        write_json_atomic(os.path.join(directory, HEADER_FILE), header)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Open a hierarchy written by save()"""
+        with open(os.path.join(directory, HEADER_FILE)) as f:
+            header = json.load(f)
+        if header['format_version'] != CH_FORMAT_VERSION:
+            raise ValueError(f"Unsupported hierarchy format version {header['format_version']}")
+
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in CH_ARRAYS}
+        return cls(arrays, weight=header['weight'])
+
+
+def _search_graphs(rank, arc_tail, arc_head, arc_weight):
+    """Upward CSR (by tail) and downward CSR (by head) of the final arcs"""
+    n = len(rank)
+    arcs = np.arange(len(arc_tail), dtype=np.int64)
+    upward = rank[arc_head] > rank[arc_tail]
+
+    def csr(keys, mask):
+        selected = arcs[mask]
+        order = np.argsort(keys[selected], kind='stable')
+        selected = selected[order]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys[selected], minlength=n), out=indptr[1:])
+        return indptr, selected
+
+    up_indptr, up_arc = csr(arc_tail, upward)
+    down_indptr, down_arc = csr(arc_head, ~upward)
+    return {
+        'up_indptr': up_indptr, 'up_head': arc_head[up_arc], 'up_weight': arc_weight[up_arc], 'up_arc': up_arc,
+        'down_indptr': down_indptr, 'down_tail': arc_tail[down_arc], 'down_weight': arc_weight[down_arc],
+        'down_arc': down_arc,
+    }
+
+
+def benchmark_against_networkx(G, graph, ch, n_pairs=200, seed=0):
+    """
+    Compare hierarchy queries with networkx.shortest_path on random O/D pairs
+
+    Args:
+        G: NetworkX graph the RoadGraph was built from
+        graph: RoadGraph
+        ch: ContractionHierarchy built on graph
+        n_pairs: Number of random origin/destination pairs
+        seed: Random seed
+
+    Returns:
+        Dictionary with mean query times (ms) and the number of mismatches
+    """
+    import networkx as nx
+
+    rng = np.random.default_rng(seed)
+    pairs = rng.integers(0, graph.n_nodes, size=(n_pairs, 2)).tolist()
+    weight = ch.weight or 'travel_time'
+
+    start = time.perf_counter()
+    ch_costs = [ch.query(s, t)[0] for s, t in pairs]
+    ch_time = time.perf_counter() - start
+
+    nx_paths = []
+    start = time.perf_counter()
+    for s, t in pairs:
+        try:
+            nx_paths.append(nx.shortest_path(G, graph.node_ids[s], graph.node_ids[t], weight=weight))
+        except nx.NetworkXNoPath:
+            nx_paths.append(None)
+    nx_time = time.perf_counter() - start
+    nx_costs = [nx.path_weight(G, path, weight) if path else math.inf for path in nx_paths]
+
+    mismatches = sum(1 for a, b in zip(ch_costs, nx_costs)
+                     if not (a == b or abs(a - b) <= 1e-3 * max(1.0, b)))
+    return {
+        'pairs': n_pairs,
+        'ch_query_ms': ch_time / n_pairs * 1000,
+        'networkx_query_ms': nx_time / n_pairs * 1000,
+        'speedup': nx_time / ch_time if ch_time > 0 else math.inf,
+        'mismatches': mismatches,
+    }
+
+
+# Example usage
+if __name__ == "__main__":
+    import pickle
+    from route_recommendation.src.models.road_graph import RoadGraph
+
+    GRAPH_DIR = '../../data/raw/osm/Timişoara_Romania_drive.graph'
+    with open('../../data/raw/osm/Timişoara_Romania_drive.pkl', 'rb') as f:
+        G = pickle.load(f)
+    graph = RoadGraph.load(GRAPH_DIR)
+
+    print("Building contraction hierarchy on travel_time...")
+    ch = ContractionHierarchy.build(graph, 'travel_time', verbose=True)
+    ch.save(ch_path(GRAPH_DIR, 'travel_time'))
+
+    print("\n=== BENCHMARK ===")
+    for key, value in benchmark_against_networkx(G, graph, ch).items():
+        print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
@@ -0,0 +1,129 @@
+import numpy as np
+
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS
+
+
+# Speed used to turn distance-based criteria into seconds (50 km/h urban)
+REFERENCE_SPEED = 50 / 3.6  # m/s
+
+# Fixed penalty per traversed edge for the simplicity criterion: every edge
+# ends at an intersection, i.e. a potential turn or decision point
+DECISION_PENALTY = 10.0  # seconds
+
+# Heuristic safety score per road class (1.0 = safest)
+ROAD_SAFETY = {
+    'motorway': 0.8,
+    'trunk': 0.6,
+    'primary': 0.5,
+    'secondary': 0.6,
+    'tertiary': 0.7,
+    'unclassified': 0.7,
+    'residential': 0.85,
+    'living_street': 0.95,
+}
+DEFAULT_SAFETY = 0.7
+LINK_SAFETY = 0.6  # on/off ramps (*_link)
+
+# Wide roads see more lane changes and higher speeds
+WIDE_ROAD_LANES = 3
+WIDE_ROAD_FACTOR = 0.9
+
+HIGHWAY_CLASSES = ['motorway', 'motorway_link', 'trunk', 'trunk_link']
+
+
+def road_safety(highway):
+    """Safety score of a highway label; 'a|b' labels average their parts"""
+    scores = []
+    for road_type in highway.split('|'):
+        if road_type.endswith('_link'):
+            scores.append(LINK_SAFETY)
+        else:
+            scores.append(ROAD_SAFETY.get(road_type, DEFAULT_SAFETY))
+    return sum(scores) / len(scores)
+
+
+def edge_safety(graph):
+    """
+    Lane-weighted safety score per edge in [0, 1]
+
+    Args:
+        graph: RoadGraph
+
+    Returns:
+        float32 array with one score per edge
+    """
+    class_safety = np.array([road_safety(h) for h in graph.highway_categories], dtype=np.float32)
+    safety = class_safety[graph.highway_code]
+    wide = graph.columns['lanes'] >= WIDE_ROAD_LANES  # NaN (unknown) compares False
+    return np.where(wide, safety * WIDE_ROAD_FACTOR, safety).astype(np.float32)
+
+
+def highway_mask(graph):
+    """Boolean mask of motorway/trunk edges (for avoid_highways)"""
+    is_highway = np.array(
+        [any(t in HIGHWAY_CLASSES for t in h.split('|')) for h in graph.highway_categories], dtype=bool
+    )
+    return is_highway[graph.highway_code]
+
+
+def edge_criteria(graph, scenery=None):
+    """
+    Per-edge inputs of the generalized cost
+
+    Args:
+        graph: RoadGraph
+        scenery: Optional POI-derived scenic score per edge in [0, 1]
+
+    Returns:
+        Dictionary of float32 arrays: length, travel_time, current_travel_time,
+        safety, scenery
+    """
+    return {
+        'length': graph.columns['length'],
+        'travel_time': graph.columns['travel_time'],
+        'current_travel_time': graph.columns['current_travel_time'],
+        'safety': edge_safety(graph),
+        'scenery': (np.zeros(graph.n_edges, np.float32) if scenery is None
+                    else np.clip(np.asarray(scenery, dtype=np.float32), 0, 1)),
+    }
+
+
+def preference_vector(preferences):
+    """Weights in PREFERENCE_KEYS order, normalized to sum to 1"""
+    weights = np.array([float(preferences.get(k, 0.0)) for k in PREFERENCE_KEYS])
+    total = weights.sum()
+    return weights / total if total > 0 else np.full(len(PREFERENCE_KEYS), 1 / len(PREFERENCE_KEYS))
+
+
+def generalized_edge_cost(criteria, preferences, use_traffic=True, blocked=None):
+    """
+    Combine the five preference weights into one cost per edge (in seconds)
+
+    Every criterion is expressed in seconds so the weights are comparable:
+    time is the (traffic-adjusted) travel time, distance/safety/scenery are
+    penalties on the time the edge would take at REFERENCE_SPEED, and
+    simplicity is a fixed penalty per edge.
+
+    Args:
+        criteria: Output of edge_criteria
+        preferences: Dict of weights (e.g. UserProfile.preferences)
+        use_traffic: Use current_travel_time instead of free-flow travel_time
+        blocked: Optional boolean mask of edges that must not be used
+
+    Returns:
+        float64 array of edge costs (inf for blocked edges)
+    """
+    w_time, w_distance, w_safety, w_scenery, w_simplicity = preference_vector(preferences)
+
+    time = criteria['current_travel_time' if use_traffic else 'travel_time'].astype(np.float64)
+    exposure = criteria['length'] / REFERENCE_SPEED
+
+    cost = (w_time * time
+            + w_distance * exposure
+            + w_safety * (1 - criteria['safety']) * exposure
+            + w_scenery * (1 - criteria['scenery']) * exposure
+            + w_simplicity * DECISION_PENALTY)
+
+    if blocked is not None:
+        cost[blocked] = np.inf
+    return cost
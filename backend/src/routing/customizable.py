@@ -0,0 +1,417 @@
+import json
+import math
+import os
+import time
+import numpy as np
+
+from route_recommendation.src.models.road_graph import HEADER_FILE, save_array_atomic, write_json_atomic
+from route_recommendation.src.routing.contraction import _bidirectional_upward_search
+
+
+CCH_FORMAT_VERSION = 1
+
+# Nested dissection stops splitting below this many nodes
+LEAF_SIZE = 32
+
+CCH_ARRAYS = ['rank', 'edge_low', 'edge_high', 'up_indptr', 'up_head', 'up_edge',
+              'tri_low', 'tri_high', 'tri_top', 'level_offsets',
+              'top_indptr', 'top_triangles', 'arc_edge', 'arc_forward']
+
+
+def cch_path(graph_dir):
+    """Where the customizable hierarchy is stored next to a saved graph"""
+    return os.path.join(graph_dir, 'cch')
+
+
+def _undirected_edges(graph):
+    """Unique undirected node pairs (a < b) of the road graph, no self-loops"""
+    u = graph.edge_u.astype(np.int64)
+    v = graph.edge_v.astype(np.int64)
+    keep = u != v
+    pairs = np.unique(np.minimum(u[keep], v[keep]) * graph.n_nodes + np.maximum(u[keep], v[keep]))
+    return pairs // graph.n_nodes, pairs % graph.n_nodes
+
+
+def nested_dissection_order(graph, leaf_size=LEAF_SIZE):
+    """
+    Metric-independent node order from the topology and node coordinates
+
+    Splits the node set at the median of its longer axis, takes the smaller
+    side of the cut boundary as separator and orders it after both halves,
+    recursively. Small cells keep ascending-degree order.
+
+    Args:
+        graph: RoadGraph (node_x/node_y are used when available)
+
+    Returns:
+        int32 rank per node (0 = contracted first)
+    """
+    a, b = _undirected_edges(graph)
+    n = graph.n_nodes
+    degree = np.bincount(np.concatenate([a, b]), minlength=n)
+
+    x = np.nan_to_num(graph.node_x * np.cos(np.radians(np.nanmean(graph.node_y) if n else 0.0)))
+    y = np.nan_to_num(graph.node_y)
+    if not np.isfinite(graph.node_x).any():
+        x = np.arange(n, dtype=float)  # no coordinates: split by index
+
+    in_a = np.zeros(n, dtype=bool)
+    removed = np.zeros(n, dtype=bool)
+
+    def dissect(nodes, edges):
+        if len(nodes) <= leaf_size:
+            return list(nodes[np.argsort(degree[nodes], kind='stable')])
+
+        coords = x[nodes] if np.ptp(x[nodes]) >= np.ptp(y[nodes]) else y[nodes]
+        half = len(nodes) // 2
+        split = np.argpartition(coords, half)
+        side_a, side_b = nodes[split[:half]], nodes[split[half:]]
+        in_a[side_a] = True
+
+        # Vertex separator: the smaller set of cut-edge endpoints on one side
+        ea, eb = a[edges], b[edges]
+        cut = in_a[ea] != in_a[eb]
+        ends_a = np.unique(np.where(in_a[ea[cut]], ea[cut], eb[cut]))
+        ends_b = np.unique(np.where(in_a[ea[cut]], eb[cut], ea[cut]))
+        separator = ends_a if len(ends_a) <= len(ends_b) else ends_b
+        removed[separator] = True
+
+        inner = ~cut & ~removed[ea] & ~removed[eb]
+        edges_a = edges[inner & in_a[ea]]
+        edges_b = edges[inner & ~in_a[ea]]
+        side_a = side_a[~removed[side_a]]
+        side_b = side_b[~removed[side_b]]
+
+        # Reset the shared masks before recursing
+        in_a[nodes] = False
+        removed[separator] = False
+        return dissect(side_a, edges_a) + dissect(side_b, edges_b) + list(separator)
+
+    order = dissect(np.arange(n), np.arange(len(a)))
+    rank = np.empty(n, dtype=np.int32)
+    rank[np.asarray(order, dtype=np.int64)] = np.arange(n, dtype=np.int32)
+    return rank
+
+
+class CustomizedMetric:
+    """Shortcut weights of a CustomizableHierarchy for one edge weight vector"""
+
+    def __init__(self, up_weight, down_weight, base_up, base_down, base_up_edge, base_down_edge):
+        self.up_weight = up_weight
+        self.down_weight = down_weight
+        # Direct (non-shortcut) weights and the road edges they come from
+        self.base_up = base_up
+        self.base_down = base_down
+        self.base_up_edge = base_up_edge
+        self.base_down_edge = base_down_edge
+        self._up = None
+        self._down = None
+
+
+class CustomizableHierarchy:
+    """
+    Customizable contraction hierarchy (CCH)
+
+    The expensive part - node order, chordal shortcut graph and the list of
+    lower triangles - depends only on the topology and is built once. A new
+    edge weight vector (e.g. traffic-adjusted costs for one preference mix)
+    is then applied by customize(), which relaxes all triangles level by
+    level with vectorized numpy operations.
+    """
+
+    def __init__(self, arrays):
+        for name in CCH_ARRAYS:
+            setattr(self, name, np.asarray(arrays[name]))
+        self._up_indptr = self.up_indptr.tolist()
+        self._up_head = self.up_head.tolist()
+        self._up_edge = self.up_edge.tolist()
+
+    @property
+    def n_nodes(self):
+        return len(self.rank)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_low)
+
+    @property
+    def n_triangles(self):
+        return len(self.tri_top)
+
+    # ------------------------------------------------------------------
+    # Metric-independent preprocessing
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, graph, rank=None, verbose=False):
+        """
+        Build the metric-independent structure of a RoadGraph
+
+        Args:
+            graph: RoadGraph
+            rank: Optional node order (default: nested_dissection_order)
+            verbose: Print statistics
+
+        Returns:
+            CustomizableHierarchy
+        """
+        start = time.perf_counter()
+        n = graph.n_nodes
+        if rank is None:
+            rank = nested_dissection_order(graph)
+        order = np.argsort(rank)
+
+        # Symbolic elimination: connect every node's upper neighbours by
+        # merging them into its lowest upper neighbour
+        a, b = _undirected_edges(graph)
+        upper = [set() for _ in range(n)]
+        for p, q in zip(a.tolist(), b.tolist()):
+            if rank[p] < rank[q]:
+                upper[p].add(q)
+            else:
+                upper[q].add(p)
+        rank_list = rank.tolist()
+        for node in order.tolist():
+            if len(upper[node]) > 1:
+                parent = min(upper[node], key=rank_list.__getitem__)
+                upper[parent].update(upper[node])
+                upper[parent].discard(parent)
+
+        # Undirected CCH edges (low, high), grouped by low node in rank order
+        edge_low, edge_high = [], []
+        for node in order.tolist():
+            for other in sorted(upper[node], key=rank_list.__getitem__):
+                edge_low.append(node)
+                edge_high.append(other)
+        edge_low = np.array(edge_low, dtype=np.int32)
+        edge_high = np.array(edge_high, dtype=np.int32)
+        edge_id = {(p, q): i for i, (p, q) in enumerate(zip(edge_low.tolist(), edge_high.tolist()))}
+
+        up_order = np.argsort(edge_low, kind='stable')
+        up_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_low, minlength=n), out=up_indptr[1:])
+
+        # Lower triangles {z, x, y} with z < x < y in rank, grouped by level of z
+        level = np.zeros(n, dtype=np.int64)
+        tri_low, tri_high, tri_top, tri_level = [], [], [], []
+        for z in order.tolist():
+            ups = sorted(upper[z], key=rank_list.__getitem__)
+            for i, x in enumerate(ups):
+                level[x] = max(level[x], level[z] + 1)
+                e_zx = edge_id[(z, x)]
+                for y in ups[i + 1:]:
+                    tri_low.append(e_zx)
+                    tri_high.append(edge_id[(z, y)])
+                    tri_top.append(edge_id[(x, y)])
+                    tri_level.append(level[z])
+
+        tri_level = np.array(tri_level, dtype=np.int64)
+        tri_order = np.argsort(tri_level, kind='stable')
+        tri_low = np.array(tri_low, dtype=np.int64)[tri_order]
+        tri_high = np.array(tri_high, dtype=np.int64)[tri_order]
+        tri_top = np.array(tri_top, dtype=np.int64)[tri_order]
+        n_levels = int(tri_level.max()) + 1 if len(tri_level) else 0
+        level_offsets = np.zeros(n_levels + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tri_level, minlength=n_levels), out=level_offsets[1:])
+
+        # Triangles by top edge, for unpacking shortcuts
+        top_triangles = np.argsort(tri_top, kind='stable')
+        top_indptr = np.zeros(len(edge_low) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tri_top, minlength=len(edge_low)), out=top_indptr[1:])
+
+        # Original road edges mapped onto CCH edges and directions
+        u, v = graph.edge_u.astype(np.int64), graph.edge_v.astype(np.int64)
+        forward = rank[u] < rank[v]
+        low, high = np.where(forward, u, v), np.where(forward, v, u)
+        arc_edge = np.array([edge_id.get((p, q), -1) for p, q in zip(low.tolist(), high.tolist())], dtype=np.int64)
+
+        hierarchy = cls({
+            'rank': rank, 'edge_low': edge_low, 'edge_high': edge_high,
+            'up_indptr': up_indptr, 'up_head': edge_high[up_order], 'up_edge': up_order.astype(np.int64),
+            'tri_low': tri_low, 'tri_high': tri_high, 'tri_top': tri_top, 'level_offsets': level_offsets,
+            'top_indptr': top_indptr, 'top_triangles': top_triangles,
+            'arc_edge': arc_edge, 'arc_forward': forward,
+        })
+        if verbose:
+            print(f"  CCH: {hierarchy.n_edges:,} edges, {hierarchy.n_triangles:,} triangles, "
+                  f"{n_levels} levels in {time.perf_counter() - start:.1f}s")
+        return hierarchy
+
+    # ------------------------------------------------------------------
+    # Customization
+    # ------------------------------------------------------------------
+
+    def customize(self, weights):
+        """
+        Apply an edge weight vector
+
+        Args:
+            weights: One weight per RoadGraph edge, e.g. travel_time *
+                traffic_multiplier or RoutingEngine.edge_costs(preferences);
+                inf marks edges that must not be used
+
+        Returns:
+            CustomizedMetric for query()
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        valid = self.arc_edge >= 0
+        up, up_edge = self._cheapest_arcs(weights, valid & self.arc_forward)
+        down, down_edge = self._cheapest_arcs(weights, valid & ~self.arc_forward)
+        base_up, base_down = up.copy(), down.copy()
+
+        for level in range(len(self.level_offsets) - 1):
+            lo, hi = self.level_offsets[level], self.level_offsets[level + 1]
+            low, high, top = self.tri_low[lo:hi], self.tri_high[lo:hi], self.tri_top[lo:hi]
+            # x -> z -> y and y -> z -> x for triangle z < x < y
+            np.minimum.at(up, top, down[low] + up[high])
+            np.minimum.at(down, top, down[high] + up[low])
+
+        return CustomizedMetric(up, down, base_up, base_down, up_edge, down_edge)
+
+    def _cheapest_arcs(self, weights, mask):
+        """Cheapest road edge per CCH edge for one direction"""
+        road_edges = np.flatnonzero(mask)
+        cch_edges = self.arc_edge[road_edges]
+        order = np.lexsort((weights[road_edges], cch_edges))
+        road_edges, cch_edges = road_edges[order], cch_edges[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = cch_edges[1:] != cch_edges[:-1]
+
+        best = np.full(self.n_edges, np.inf)
+        best_edge = np.full(self.n_edges, -1, dtype=np.int64)
+        best[cch_edges[first]] = weights[road_edges[first]]
+        best_edge[cch_edges[first]] = road_edges[first]
+        return best, best_edge
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _search_graphs(self, metric):
+        if metric._up is None:
+            up_edge = self.up_edge
+            metric._up = (self._up_indptr, self._up_head, metric.up_weight[up_edge].tolist())
+            metric._down = (self._up_indptr, self._up_head, metric.down_weight[up_edge].tolist())
+        return metric._up, metric._down
+
+    def _unpack(self, metric, edge, upward):
+        """Expand one directed CCH edge into RoadGraph edge indices"""
+        stack = [(edge, upward)]
+        road_edges = []
+        while stack:
+            e, up = stack.pop()
+            weight = metric.up_weight[e] if up else metric.down_weight[e]
+            if weight == (metric.base_up[e] if up else metric.base_down[e]):
+                road_edges.append(int(metric.base_up_edge[e] if up else metric.base_down_edge[e]))
+                continue
+
+            for t in self.top_triangles[self.top_indptr[e]:self.top_indptr[e + 1]]:
+                low, high = self.tri_low[t], self.tri_high[t]
+                if up and metric.down_weight[low] + metric.up_weight[high] == weight:
+                    stack.append((high, True))   # z -> y, expanded after x -> z
+                    stack.append((low, False))   # x -> z
+                    break
+                if not up and metric.down_weight[high] + metric.up_weight[low] == weight:
+                    stack.append((low, True))    # z -> x, expanded after y -> z
+                    stack.append((high, False))  # y -> z
+                    break
+            else:
+                raise RuntimeError(f"Cannot unpack CCH edge {e}: metric is inconsistent")
+        return road_edges
+
+    def query(self, metric, source, target, unpack=True):
+        """
+        Shortest path under a customized metric
+
+        Args:
+            metric: Result of customize()
+            source, target: Internal node indices
+            unpack: Also return the path as RoadGraph edge indices
+
+        Returns:
+            (cost, list of edge indices or None); (inf, None) if unreachable
+        """
+        up, down = self._search_graphs(metric)
+        cost, meeting, forward, backward = _bidirectional_upward_search(up, down, source, target)
+        if meeting is None:
+            return math.inf, None
+        if not unpack:
+            return cost, None
+
+        hops = []
+        node = meeting
+        while node != source:
+            slot, node = forward[node]
+            hops.append((self._up_edge[slot], True))
+        hops.reverse()
+        node = meeting
+        while node != target:
+            slot, node = backward[node]
+            hops.append((self._up_edge[slot], False))
+
+        edges = []
+        for e, up_direction in hops:
+            edges.extend(self._unpack(metric, e, up_direction))
+        return cost, edges
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def save(self, directory):
+        """
+        Write the metric-independent structure as .npy arrays plus a header
+
+        Same protocol as RoadGraph.save: the old header is removed first and
+        the new one written last, and arrays are replaced atomically.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, HEADER_FILE)):
+            os.remove(os.path.join(directory, HEADER_FILE))
+        for name in CCH_ARRAYS:
+            save_array_atomic(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        header = {
+            'format_version': CCH_FORMAT_VERSION,
+            'n_nodes': self.n_nodes,
+            'n_edges': self.n_edges,
+            'n_triangles': self.n_triangles,
+        }
+        write_json_atomic(os.path.join(directory, HEADER_FILE), header)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Open a structure written by save()"""
+        with open(os.path.join(directory, HEADER_FILE)) as f:
+            header = json.load(f)
+        if header['format_version'] != CCH_FORMAT_VERSION:
+            raise ValueError(f"Unsupported CCH format version {header['format_version']}")
+        mmap_mode = 'r' if mmap else None
+        return cls({name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                    for name in CCH_ARRAYS})
+
+
+# Example usage
+if __name__ == "__main__":
+    from datetime import datetime
+    from route_recommendation.src.data.simulate_traffic import simulate_graph_traffic
+    from route_recommendation.src.models.road_graph import RoadGraph
+    from route_recommendation.src.routing.engine import RoutingEngine
+
+    GRAPH_DIR = '../../data/raw/osm/Timişoara_Romania_drive.graph'
+    graph = RoadGraph.load(GRAPH_DIR)
+
+    print("Building metric-independent structure...")
+    cch = CustomizableHierarchy.build(graph, verbose=True)
+    cch.save(cch_path(GRAPH_DIR))
+
+    engine = RoutingEngine(graph)
+    preferences = {'time': 0.4, 'distance': 0.2, 'safety': 0.15, 'scenery': 0.15, 'simplicity': 0.1}
+    for hour in [8, 14, 18]:
+        simulate_graph_traffic(graph, datetime(2024, 2, 5, hour), rng=hour)
+        engine.update_traffic()
+
+        start = time.perf_counter()
+        metric = cch.customize(engine.edge_costs(preferences))
+        elapsed = time.perf_counter() - start
+        cost, _ = cch.query(metric, 0, graph.n_nodes // 2)
+        print(f"{hour:02d}:00 customization {elapsed * 1000:.1f} ms, sample route cost {cost:.1f}")
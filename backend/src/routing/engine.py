@@ -0,0 +1,354 @@
+from collections import OrderedDict
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from route_recommendation.src.features.route_features import RouteFeatureExtractor
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS
+from route_recommendation.src.routing.costs import (
+    edge_criteria,
+    generalized_edge_cost,
+    highway_mask,
+    preference_vector,
+)
+from route_recommendation.src.routing.search import (
+    astar,
+    cost_per_meter_bound,
+    haversine,
+    shortest_path_tree,
+)
+
+
+# Fastest route when no preferences are given
+DEFAULT_PREFERENCES = {'time': 1.0}
+
+# Number of (preferences, constraints) cost vectors kept per engine
+COST_CACHE_SIZE = 64
+
+# 'lists': pure-Python A* over list copies of the CSR arrays (fast point to
+# point queries, but the lists cost ~100 bytes per edge); 'csgraph': SciPy's
+# C Dijkstra straight on the numpy arrays, so an engine over a graph in
+# shared memory allocates no per-edge structures of its own
+SEARCH_MODES = ['lists', 'csgraph']
+
+
+def csgraph_arrays(graph):
+    """
+    int32 forward and reverse CSR arrays used by the 'csgraph' search
+
+    Args:
+        graph: RoadGraph
+
+    Returns:
+        Dictionary of arrays: indptr, reverse_indptr, reverse_edges (edge
+        index per reverse slot) and reverse_tails (its start node)
+    """
+    reverse_indptr, reverse_edges = graph.reverse()
+    return {
+        'indptr': graph.indptr.astype(np.int32),
+        'reverse_indptr': reverse_indptr.astype(np.int32),
+        'reverse_edges': reverse_edges,
+        'reverse_tails': graph.edge_u[reverse_edges],
+    }
+
+
+class RoutingEngine:
+    """
+    Multi-criteria routing on a RoadGraph
+
+    Turns UserProfile preference weights, traffic and POI-derived edge
+    scores into one generalized cost per edge (see routing/costs.py) and
+    answers point-to-point queries with A* and a haversine heuristic (or
+    with SciPy's Dijkstra, see SEARCH_MODES).
+    """
+
+    def __init__(self, graph, scenery=None, criteria=None, search='lists', search_arrays=None,
+                 cost_cache_size=COST_CACHE_SIZE):
+        """
+        Args:
+            graph: RoadGraph
+            scenery: Optional POI-derived scenic score per edge in [0, 1]
+            criteria: Precomputed edge_criteria(graph, scenery), e.g.
+                attached from shared memory (scenery is then ignored)
+            search: One of SEARCH_MODES
+            search_arrays: Precomputed csgraph_arrays(graph) for search='csgraph'
+            cost_cache_size: Cost vectors kept for reuse
+        """
+        if search not in SEARCH_MODES:
+            raise ValueError(f"Unknown search '{search}', expected one of {SEARCH_MODES}")
+        self.graph = graph
+        self.search = search
+        self.criteria = criteria if criteria is not None else edge_criteria(graph, scenery)
+        self._highways = highway_mask(graph)
+        self._cost_cache = OrderedDict()
+        self._cost_cache_size = cost_cache_size
+        self._route_features = None
+
+        if search == 'lists':
+            # Python lists: the search loop indexes these millions of times
+            self._indptr = graph.indptr.tolist()
+            self._heads = graph.edge_v.tolist()
+            self._tails = graph.edge_u.tolist()
+            self._reverse_lists = None
+        else:
+            self._heads = graph.edge_v
+            self._tails = graph.edge_u
+            self._search_arrays = search_arrays if search_arrays is not None else csgraph_arrays(graph)
+
+    @property
+    def route_features(self):
+        """RouteFeatureExtractor over the graph, built on first use"""
+        if self._route_features is None:
+            self._route_features = RouteFeatureExtractor(self.graph)
+        return self._route_features
+
+    def update_traffic(self):
+        """Pick up new current_travel_time values from the graph columns"""
+        self.criteria['current_travel_time'] = self.graph.columns['current_travel_time']
+        self._cost_cache.clear()
+
+    def apply_traffic_update(self, snapshot, edges):
+        """
+        Refresh only the edges a traffic delta changed
+
+        Matches the TrafficOverlay subscriber signature, so an engine can
+        follow a live overlay with overlay.subscribe(engine.apply_traffic_update).
+        Cached traffic-aware cost vectors are patched at those edges instead
+        of being recomputed.
+
+        Args:
+            snapshot: TrafficSnapshot (see data/traffic_overlay.py)
+            edges: Indices of the changed edges
+        """
+        edges = np.asarray(edges, dtype=np.int64)
+        current = np.array(self.criteria['current_travel_time'], dtype=np.float32)
+        current[edges] = snapshot.current_travel_time(edges)
+        self.criteria['current_travel_time'] = current
+        if not len(edges):
+            return
+
+        subset = {name: values[edges] for name, values in self.criteria.items()}
+        for key, (costs, cost_list, bound) in self._cost_cache.items():
+            weights, avoid_highways, use_traffic = key
+            if not use_traffic:
+                continue
+            patch = generalized_edge_cost(
+                subset,
+                dict(zip(PREFERENCE_KEYS, weights)),
+                blocked=self._highways[edges] if avoid_highways else None,
+            )
+            # Fresh copies: earlier edge_costs() results stay unchanged
+            costs = costs.copy()
+            costs[edges] = patch
+            if cost_list is not None:
+                cost_list = list(cost_list)
+                for e, cost in zip(edges.tolist(), patch.tolist()):
+                    cost_list[e] = cost
+            # Lower costs may loosen the heuristic bound; higher ones keep it valid
+            bound = min(bound, cost_per_meter_bound(patch, subset['length']))
+            self._cost_cache[key] = (costs, cost_list, bound)
+
+    def _cost_key(self, preferences, constraints, use_traffic):
+        avoid_highways = bool((constraints or {}).get('avoid_highways', False))
+        weights = tuple(np.round(preference_vector(preferences or DEFAULT_PREFERENCES), 6))
+        return weights, avoid_highways, use_traffic
+
+    def _prepared_costs(self, preferences, constraints, use_traffic):
+        """Cost vector, its Python list and the heuristic bound (cached)"""
+        key = self._cost_key(preferences, constraints, use_traffic)
+        if key in self._cost_cache:
+            self._cost_cache.move_to_end(key)
+            return self._cost_cache[key]
+
+        weights, avoid_highways, _ = key
+        costs = generalized_edge_cost(
+            self.criteria,
+            dict(zip(PREFERENCE_KEYS, weights)),
+            use_traffic=use_traffic,
+            blocked=self._highways if avoid_highways else None,
+        )
+        cost_list = costs.tolist() if self.search == 'lists' else None
+        prepared = (costs, cost_list, cost_per_meter_bound(costs, self.criteria['length']))
+
+        self._cost_cache[key] = prepared
+        if len(self._cost_cache) > self._cost_cache_size:
+            self._cost_cache.popitem(last=False)
+        return prepared
+
+    def edge_costs(self, preferences=None, constraints=None, use_traffic=True):
+        """
+        Generalized cost per edge for a preference mix
+
+        Args:
+            preferences: Dict of weights (default: fastest route)
+            constraints: Dict of constraints (only avoid_highways affects costs)
+            use_traffic: Use current_travel_time instead of travel_time
+
+        Returns:
+            float64 array (inf for blocked edges); do not modify in place
+        """
+        return self._prepared_costs(preferences, constraints, use_traffic)[0]
+
+    def heuristic(self, target, bound):
+        """Admissible cost-to-target lower bound for every node"""
+        graph = self.graph
+        if bound <= 0 or np.isnan(graph.node_x[target]):
+            return None
+        distances = haversine(graph.node_x, graph.node_y, graph.node_x[target], graph.node_y[target])
+        return np.nan_to_num(distances * bound, nan=0.0).tolist()
+
+    def route(self, origin, destination, preferences=None, constraints=None, use_traffic=True):
+        """
+        Best route between two nodes for a preference mix
+
+        Args:
+            origin, destination: Internal node indices
+                (use graph.node_index to convert OSM ids)
+            preferences: Dict of weights, e.g. UserProfile.preferences
+            constraints: Dict of constraints, e.g. UserProfile.constraints
+            use_traffic: Use current_travel_time instead of travel_time
+
+        Returns:
+            Dictionary with 'nodes', 'osm_nodes', 'edges', 'cost',
+            'travel_time' and 'length', or None if unreachable
+        """
+        costs, cost_list, bound = self._prepared_costs(preferences, constraints, use_traffic)
+        if self.search == 'csgraph':
+            return self._csgraph_route(origin, destination, costs, use_traffic)
+        total, edges = astar(self._indptr, self._heads, cost_list, origin, destination,
+                             heuristic=self.heuristic(destination, bound))
+        if edges is None:
+            return None
+        return self.describe_route(edges, origin=origin, cost=total, use_traffic=use_traffic)
+
+    def route_with_costs(self, origin, destination, costs, use_traffic=True):
+        """
+        Best route for an explicit cost vector (e.g. penalized costs)
+
+        Args:
+            origin, destination: Internal node indices
+            costs: Cost per edge
+            use_traffic: Which time column to report in the result
+
+        Returns:
+            Route dictionary (see route()) or None if unreachable
+        """
+        costs = np.asarray(costs, dtype=np.float64)
+        if self.search == 'csgraph':
+            return self._csgraph_route(origin, destination, costs, use_traffic)
+        bound = cost_per_meter_bound(costs, self.criteria['length'])
+        total, edges = astar(self._indptr, self._heads, costs.tolist(), origin, destination,
+                             heuristic=self.heuristic(destination, bound))
+        if edges is None:
+            return None
+        return self.describe_route(edges, origin=origin, cost=total, use_traffic=use_traffic)
+
+    def shortest_path_tree(self, node, costs, reverse=False):
+        """
+        One-to-all (or all-to-one with reverse=True) Dijkstra
+
+        Args:
+            node: Root node index
+            costs: Cost per edge (e.g. from edge_costs)
+            reverse: Compute distances *to* node instead of from it
+
+        Returns:
+            (dist, tree_edge) over all nodes (lists, or numpy arrays with
+            search='csgraph'). tree_edge is the edge entering each node on
+            its path from the root, or with reverse=True the edge leaving it
+            towards the root (-1 if none)
+        """
+        costs = np.asarray(costs)
+        if self.search == 'csgraph':
+            return self._csgraph_tree(node, costs, reverse)
+        if not reverse:
+            return shortest_path_tree(self._indptr, self._heads, costs.tolist(), node)
+
+        if self._reverse_lists is None:
+            indptr, edge_ids = self.graph.reverse()
+            self._reverse_lists = (indptr.tolist(), self.graph.edge_u[edge_ids].tolist(), edge_ids)
+        indptr, heads, edge_ids = self._reverse_lists
+        dist, slots = shortest_path_tree(indptr, heads, costs[edge_ids].tolist(), node)
+        edge_list = edge_ids.tolist()
+        return dist, [edge_list[s] if s >= 0 else -1 for s in slots]
+
+    def tree_path(self, tree_edge, node, reverse=False):
+        """Edge indices from the tree root to node (or node to root if reverse)"""
+        path = []
+        step = self._heads if reverse else self._tails
+        e = int(tree_edge[node])
+        while e >= 0:
+            path.append(e)
+            node = step[e]
+            e = int(tree_edge[node])
+        if not reverse:
+            path.reverse()
+        return path
+
+    def _csgraph_tree(self, node, costs, reverse=False):
+        """shortest_path_tree with scipy.sparse.csgraph.dijkstra on the CSR arrays"""
+        graph, arrays = self.graph, self._search_arrays
+        n = graph.n_nodes
+        if reverse:
+            matrix = csr_matrix((costs[arrays['reverse_edges']], arrays['reverse_tails'], arrays['reverse_indptr']),
+                                shape=(n, n))
+        else:
+            matrix = csr_matrix((costs, graph.edge_v, arrays['indptr']), shape=(n, n))
+        dist, pred = dijkstra(matrix, indices=node, return_predecessors=True)
+
+        # Predecessor nodes -> tree edges: the cheapest edge between each
+        # node and its predecessor (parallel edges share both end nodes)
+        ends, starts = (graph.edge_u, graph.edge_v) if reverse else (graph.edge_v, graph.edge_u)
+        on_tree = np.flatnonzero(pred[ends] == starts)
+        on_tree = on_tree[np.lexsort((costs[on_tree], ends[on_tree]))]
+        first = np.ones(len(on_tree), dtype=bool)
+        first[1:] = ends[on_tree[1:]] != ends[on_tree[:-1]]
+        tree_edge = np.full(n, -1, dtype=np.int64)
+        tree_edge[ends[on_tree[first]]] = on_tree[first]
+        return dist, tree_edge
+
+    def _csgraph_route(self, origin, destination, costs, use_traffic):
+        dist, tree_edge = self._csgraph_tree(origin, costs)
+        if not np.isfinite(dist[destination]):
+            return None
+        return self.describe_route(self.tree_path(tree_edge, destination), origin=origin,
+                                   cost=dist[destination], use_traffic=use_traffic)
+
+    def describe_route(self, edges, origin=None, cost=None, use_traffic=True):
+        """Route dictionary for a sequence of edge indices"""
+        graph = self.graph
+        edges = np.asarray(edges, dtype=np.int64)
+        if len(edges):
+            nodes = np.concatenate([graph.edge_u[edges[:1]], graph.edge_v[edges]])
+        else:
+            nodes = np.array([origin], dtype=np.int32)
+
+        time_column = 'current_travel_time' if use_traffic else 'travel_time'
+        return {
+            'nodes': nodes.tolist(),
+            'osm_nodes': graph.node_ids[nodes].tolist(),
+            'edges': edges.tolist(),
+            'cost': float(cost) if cost is not None else None,
+            'travel_time': float(graph.columns[time_column][edges].sum(dtype=np.float64)),
+            'length': float(graph.columns['length'][edges].sum(dtype=np.float64)),
+        }
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+    from route_recommendation.src.models.road_graph import RoadGraph
+
+    graph = RoadGraph.load('../../data/raw/osm/Timişoara_Romania_drive.graph', overlay='traffic')
+    engine = RoutingEngine(graph)
+
+    rng = np.random.default_rng(0)
+    pairs = rng.integers(0, graph.n_nodes, size=(100, 2))
+    preferences = {'time': 0.4, 'distance': 0.2, 'safety': 0.15, 'scenery': 0.15, 'simplicity': 0.1}
+
+    engine.route(0, 1, preferences)  # warm the cost cache
+    start = time.perf_counter()
+    for origin, destination in pairs:
+        engine.route(int(origin), int(destination), preferences)
+    elapsed = (time.perf_counter() - start) / len(pairs)
+    print(f"Average query time: {elapsed * 1000:.2f} ms")
@@ -0,0 +1,110 @@
+import heapq
+import math
+import numpy as np
+
+
+EARTH_RADIUS = 6371009  # meters (same radius OSMnx uses for edge lengths)
+
+# Edge lengths are float32, so keep the heuristic a hair below the bound
+HEURISTIC_SLACK = 0.999
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """Great-circle distance in meters (vectorized over numpy arrays)"""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def cost_per_meter_bound(cost, length):
+    """
+    Largest c such that cost[e] >= c * length[e] for every usable edge
+
+    Multiplied by the straight-line distance this is an admissible and
+    consistent A* heuristic, because edge lengths are never shorter than
+    the great-circle distance between their end nodes.
+    """
+    usable = np.isfinite(cost) & (length > 0)
+    if not usable.any():
+        return 0.0
+    return float(np.min(cost[usable] / length[usable])) * HEURISTIC_SLACK
+
+
+def astar(indptr, heads, costs, source, target, heuristic=None):
+    """
+    Heap-based A* (plain Dijkstra when heuristic is None)
+
+    Args:
+        indptr, heads, costs: CSR adjacency as Python lists - list indexing
+            is much faster than numpy scalar access in the inner loop
+        source, target: Node indices
+        heuristic: Optional list with a lower bound of the cost to target
+            for every node
+
+    Returns:
+        (cost, list of edge indices), or (inf, None) if target is unreachable
+    """
+    dist = {source: 0.0}
+    pred = {}
+    settled = set()
+    heap = [(heuristic[source] if heuristic is not None else 0.0, 0.0, source)]
+
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        if u == target:
+            break
+        settled.add(u)
+
+        for e in range(indptr[u], indptr[u + 1]):
+            v = heads[e]
+            nd = d + costs[e]
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                pred[v] = (e, u)
+                heapq.heappush(heap, (nd + heuristic[v] if heuristic is not None else nd, nd, v))
+    else:
+        return math.inf, None
+
+    path = []
+    node = target
+    while node != source:
+        e, node = pred[node]
+        path.append(e)
+    path.reverse()
+    return dist[target], path
+
+
+def shortest_path_tree(indptr, heads, costs, source):
+    """
+    Full one-to-all Dijkstra
+
+    Args:
+        indptr, heads, costs: CSR adjacency as Python lists
+        source: Node index
+
+    Returns:
+        (dist, pred_edge) lists over all nodes; unreachable nodes have
+        dist inf and pred_edge -1
+    """
+    n = len(indptr) - 1
+    dist = [math.inf] * n
+    pred = [-1] * n
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for e in range(indptr[u], indptr[u + 1]):
+            v = heads[e]
+            nd = d + costs[e]
+            if nd < dist[v]:
+                dist[v] = nd
+                pred[v] = e
+                heapq.heappush(heap, (nd, v))
+
+    return dist, pred
@@ -0,0 +1,257 @@
+import heapq
+import math
+import numpy as np
+
+from route_recommendation.src.data.simulate_traffic import MULTIPLIER_TABLE, encode_road_types
+from route_recommendation.src.routing.search import cost_per_meter_bound, haversine
+
+
+BUCKET_SECONDS = 3600
+N_BUCKETS = 168  # hours in a week; bucket = day_of_week * 24 + hour
+WEEK_SECONDS = N_BUCKETS * BUCKET_SECONDS
+
+PROFILE_FORMAT_VERSION = 1
+
+
+def week_time(when):
+    """Seconds since Monday 00:00 for a datetime"""
+    return (when.weekday() * 24 + when.hour) * 3600 + when.minute * 60 + when.second + when.microsecond / 1e6
+
+
+class TravelTimeProfiles:
+    """
+    Piecewise-constant weekly travel-time profiles for every edge
+
+    Each edge keeps its free-flow travel time and the index of a shared
+    168-bucket multiplier profile (one per road class by default), so a
+    whole week of traffic costs one small array plus a byte per edge.
+
+    Multipliers slow down (or speed up) progress along an edge rather than
+    being fixed when it is entered: a trip that starts at 16:45 and crosses
+    17:00 drives the rest of the edge at rush-hour speed. That keeps arrival
+    times FIFO (leaving later never arrives earlier), which makes the
+    time-dependent Dijkstra below exact.
+    """
+
+    def __init__(self, base_time, edge_profile, profiles):
+        """
+        Args:
+            base_time: Free-flow travel time per edge (seconds); NaN or inf
+                marks an edge without a usable time, which is never taken
+            edge_profile: Profile index per edge
+            profiles: Array of shape (n_profiles, 168) with positive multipliers
+        """
+        self.base_time = np.asarray(base_time, dtype=np.float32)
+        self.edge_profile = np.asarray(edge_profile, dtype=np.uint8)
+        self.profiles = np.asarray(profiles, dtype=np.float32)
+        if self.profiles.shape[1] != N_BUCKETS:
+            raise ValueError(f"Profiles need {N_BUCKETS} hourly buckets, got {self.profiles.shape[1]}")
+        if np.any(self.profiles <= 0):
+            raise ValueError("Profile multipliers must be positive")
+        if np.any(self.base_time < 0):
+            raise ValueError("Travel times must not be negative")
+
+        # Python lists for the search loop
+        self._base = self.base_time.tolist()
+        self._edge_profile = self.edge_profile.tolist()
+        self._profiles = self.profiles.tolist()
+
+    @classmethod
+    def from_graph(cls, graph, table=MULTIPLIER_TABLE):
+        """
+        Road-class profiles from the traffic model (see simulate_traffic.py)
+
+        Args:
+            graph: RoadGraph
+            table: Multipliers of shape (7, 24, n_classes), default MULTIPLIER_TABLE
+
+        Returns:
+            TravelTimeProfiles sharing one profile per road class
+        """
+        road_codes = encode_road_types(graph.highway_categories)[graph.highway_code]
+        profiles = np.asarray(table).reshape(N_BUCKETS, -1).T
+        return cls(graph.columns['travel_time'], road_codes, profiles)
+
+    @property
+    def n_edges(self):
+        return len(self.base_time)
+
+    @property
+    def nbytes(self):
+        return self.base_time.nbytes + self.edge_profile.nbytes + self.profiles.nbytes
+
+    def arrival_time(self, edge, t):
+        """
+        Arrival at the end of an edge entered at week time t (seconds)
+
+        The free-flow time is consumed bucket by bucket at the speed each
+        bucket's multiplier allows. t may exceed one week; it wraps. Edges
+        without a finite travel time are never reached (inf).
+        """
+        remaining = self._base[edge]
+        if not math.isfinite(remaining):
+            return math.inf
+        profile = self._profiles[self._edge_profile[edge]]
+        while True:
+            bucket = int(t // BUCKET_SECONDS)
+            multiplier = profile[bucket % N_BUCKETS]
+            span = (bucket + 1) * BUCKET_SECONDS - t
+            if remaining * multiplier <= span:
+                return t + remaining * multiplier
+            remaining -= span / multiplier
+            t = (bucket + 1) * BUCKET_SECONDS
+
+    def travel_times_at(self, t):
+        """Static snapshot: travel time of every edge if entered at week time t"""
+        bucket = int(t // BUCKET_SECONDS) % N_BUCKETS
+        return self.base_time * self.profiles[self.edge_profile, bucket]
+
+    def min_travel_times(self):
+        """Lower bound of each edge's travel time over the whole week"""
+        return self.base_time * self.profiles.min(axis=1)[self.edge_profile]
+
+    def save(self, path):
+        """Write the profiles as one compressed .npz file"""
+        np.savez_compressed(path, base_time=self.base_time, edge_profile=self.edge_profile,
+                            profiles=self.profiles, format_version=PROFILE_FORMAT_VERSION)
+
+    @classmethod
+    def load(cls, path):
+        """Read profiles written by save()"""
+        with np.load(path) as data:
+            if int(data['format_version']) != PROFILE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported profile format version {int(data['format_version'])}")
+            return cls(data['base_time'], data['edge_profile'], data['profiles'])
+
+
+def td_astar(indptr, heads, arrival_time, source, target, departure, heuristic=None):
+    """
+    Time-dependent Dijkstra / A* for FIFO edge arrival functions
+
+    Args:
+        indptr, heads: CSR adjacency as Python lists
+        arrival_time: Function (edge, time) -> arrival time at the edge head
+        source, target: Node indices
+        departure: Departure time at source
+        heuristic: Optional list with a lower bound of the remaining travel
+            time for every node
+
+    Returns:
+        (arrival time, list of edge indices), or (inf, None) if unreachable
+    """
+    arrival = {source: departure}
+    pred = {}
+    settled = set()
+    heap = [(departure + (heuristic[source] if heuristic is not None else 0.0), departure, source)]
+
+    while heap:
+        _, t, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        if u == target:
+            break
+        settled.add(u)
+
+        for e in range(indptr[u], indptr[u + 1]):
+            v = heads[e]
+            at = arrival_time(e, t)
+            if at < arrival.get(v, math.inf):
+                arrival[v] = at
+                pred[v] = (e, u)
+                heapq.heappush(heap, (at + heuristic[v] if heuristic is not None else at, at, v))
+    else:
+        return math.inf, None
+
+    path = []
+    node = target
+    while node != source:
+        e, node = pred[node]
+        path.append(e)
+    path.reverse()
+    return arrival[target], path
+
+
+class TimeDependentRouter:
+    """
+    Departure-time-aware fastest routes over one set of weekly profiles
+
+    Nothing is rebuilt when the hour changes: every query reads edge costs
+    at the time it actually reaches them.
+    """
+
+    def __init__(self, graph, profiles=None):
+        """
+        Args:
+            graph: RoadGraph
+            profiles: TravelTimeProfiles (default: road-class profiles)
+        """
+        self.graph = graph
+        self.profiles = profiles if profiles is not None else TravelTimeProfiles.from_graph(graph)
+        self._indptr = graph.indptr.tolist()
+        self._heads = graph.edge_v.tolist()
+        self._bound = cost_per_meter_bound(self.profiles.min_travel_times().astype(np.float64),
+                                           graph.columns['length'])
+
+    def heuristic(self, target):
+        """Admissible remaining-time bound for every node (None without coordinates)"""
+        graph = self.graph
+        if self._bound <= 0 or np.isnan(graph.node_x[target]):
+            return None
+        distances = haversine(graph.node_x, graph.node_y, graph.node_x[target], graph.node_y[target])
+        return np.nan_to_num(distances * self._bound, nan=0.0).tolist()
+
+    def route(self, origin, destination, departure):
+        """
+        Fastest route for a departure time
+
+        Args:
+            origin, destination: Internal node indices
+            departure: datetime, or seconds since Monday 00:00
+
+        Returns:
+            Dictionary with 'nodes', 'osm_nodes', 'edges', 'departure',
+            'arrival' (week seconds), 'travel_time' and 'length', or None
+            if unreachable
+        """
+        start = week_time(departure) if hasattr(departure, 'weekday') else float(departure)
+        arrival, edges = td_astar(self._indptr, self._heads, self.profiles.arrival_time,
+                                  origin, destination, start, heuristic=self.heuristic(destination))
+        if edges is None:
+            return None
+
+        graph = self.graph
+        edge_array = np.asarray(edges, dtype=np.int64)
+        nodes = (np.concatenate([graph.edge_u[edge_array[:1]], graph.edge_v[edge_array]])
+                 if len(edges) else np.array([origin], dtype=np.int32))
+        return {
+            'nodes': nodes.tolist(),
+            'osm_nodes': graph.node_ids[nodes].tolist(),
+            'edges': edges,
+            'departure': start,
+            'arrival': arrival,
+            'travel_time': arrival - start,
+            'length': float(graph.columns['length'][edge_array].sum(dtype=np.float64)),
+        }
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+    from datetime import datetime
+    from route_recommendation.src.models.road_graph import RoadGraph
+
+    graph = RoadGraph.load('../../data/raw/osm/Timişoara_Romania_drive.graph')
+    profiles = TravelTimeProfiles.from_graph(graph)
+    print(f"Profiles: {len(profiles.profiles)} shared x {N_BUCKETS} buckets, {profiles.nbytes / 1e3:.1f} kB")
+
+    router = TimeDependentRouter(graph, profiles)
+    rng = np.random.default_rng(0)
+    pairs = rng.integers(0, graph.n_nodes, size=(100, 2))
+
+    for departure in [datetime(2024, 2, 5, 3, 0), datetime(2024, 2, 5, 16, 45), datetime(2024, 2, 5, 18, 0)]:
+        start = time.perf_counter()
+        routes = [router.route(int(o), int(d), departure) for o, d in pairs]
+        elapsed = (time.perf_counter() - start) / len(pairs)
+        times = [r['travel_time'] for r in routes if r is not None]
+        print(f"{departure:%A %H:%M}: mean trip {np.mean(times) / 60:.1f} min, "
+              f"{elapsed * 1000:.2f} ms per query")
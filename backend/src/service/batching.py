@@ -0,0 +1,155 @@
+import asyncio
+from collections import deque
+
+from route_recommendation.src.utils.instrumentation import count
+
+
+# Requests per handler call at most
+MAX_BATCH = 64
+
+# Seconds the first request of a batch waits for others to join
+MAX_BATCH_DELAY = 0.002
+
+# Handler calls running at the same time; while they are busy new requests
+# keep joining the pending batches, so batches grow with the load
+MAX_INFLIGHT = 1
+
+
+class _Batch:
+    __slots__ = ('items', 'futures', 'handle', 'ready')
+
+    def __init__(self, handle):
+        self.items = []
+        self.futures = []
+        self.handle = handle
+        self.ready = False
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests into batches handed to an executor
+
+    Requests submitted under the same key are processed by a single handler
+    call in the executor - the event loop never runs the work itself. A
+    batch becomes ready max_delay after its first request or once it holds
+    max_batch requests, and is dispatched as soon as fewer than max_inflight
+    handler calls are running. Requests with the same coalescing key that
+    are still pending or running share one result.
+    """
+
+    def __init__(self, handler, executor, max_batch=MAX_BATCH, max_delay=MAX_BATCH_DELAY,
+                 max_inflight=MAX_INFLIGHT):
+        """
+        Args:
+            handler: Function taking a list of items and returning a list of
+                results in the same order (an Exception instance fails only
+                that item)
+            executor: concurrent.futures executor the handler runs in
+            max_batch: Items per handler call at most
+            max_delay: Seconds a batch stays open for more items
+            max_inflight: Handler calls running at the same time
+        """
+        self.handler = handler
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_inflight = max_inflight
+        self.requests = 0
+        self.batches = 0
+        self.coalesced = 0
+        self._pending = {}  # batch key -> _Batch
+        self._ready = deque()  # keys of ready batches, oldest first
+        self._running = 0
+        self._inflight = {}  # coalescing key -> future
+
+    async def submit(self, key, item, coalesce=None):
+        """
+        Queue one item and wait for its result
+
+        Args:
+            key: Batch key; only items with equal keys share a handler call
+            item: Passed to the handler as part of a list
+            coalesce: Optional hashable identifying identical requests
+
+        Returns:
+            The handler's result for item
+        """
+        if coalesce is not None and coalesce in self._inflight:
+            self.coalesced += 1
+            count('service.coalesced')
+            return await asyncio.shield(self._inflight[coalesce])
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if coalesce is not None:
+            self._inflight[coalesce] = future
+            future.add_done_callback(lambda _: self._inflight.pop(coalesce, None))
+
+        self.requests += 1
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch(loop.call_later(self.max_delay, self._mark_ready, key))
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= self.max_batch:
+            self._mark_ready(key)
+        # A client disconnecting must not cancel a result others may share
+        return await asyncio.shield(future)
+
+    def _mark_ready(self, key):
+        batch = self._pending.get(key)
+        if batch is None or batch.ready:
+            return
+        batch.handle.cancel()
+        batch.ready = True
+        self._ready.append(key)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._ready and self._running < self.max_inflight:
+            key = self._ready.popleft()
+            batch = self._pending[key]
+            items, futures = batch.items[:self.max_batch], batch.futures[:self.max_batch]
+            del batch.items[:self.max_batch], batch.futures[:self.max_batch]
+            if batch.items:
+                self._ready.append(key)  # the overflow goes next
+            else:
+                del self._pending[key]
+
+            self._running += 1
+            self.batches += 1
+            count('service.batches')
+            count('service.batched_requests', len(items))
+            task = asyncio.get_running_loop().run_in_executor(self.executor, self.handler, items)
+            task.add_done_callback(lambda task, futures=futures: self._finished(task, futures))
+
+    def _finished(self, task, futures):
+        self._running -= 1
+        if task.cancelled():
+            results = [asyncio.CancelledError()] * len(futures)
+        elif task.exception() is not None:
+            results = [task.exception()] * len(futures)
+        else:
+            results = task.result()
+        for future, result in zip(futures, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        self._dispatch()
+
+    def flush_all(self):
+        """Mark every open batch ready now (e.g. before shutting down)"""
+        for key in list(self._pending):
+            self._mark_ready(key)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'coalesced': self.coalesced,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'pending': sum(len(batch.items) for batch in self._pending.values()),
+        }
@@ -0,0 +1,201 @@
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+
+from route_recommendation.src.service.server import DEFAULT_HOST, DEFAULT_PORT
+
+
+# Origins/destinations are drawn around this many hotspots (0 = uniform)
+DEFAULT_HOTSPOTS = 20
+HOTSPOT_SPREAD = 0.003  # degrees
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 client over asyncio streams"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, payload=None):
+        """
+        Send one request
+
+        Returns:
+            (status, decoded JSON body or text)
+        """
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b''
+        self._writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                           .encode('latin-1') + body)
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        data = await self._reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        if headers.get('content-type', '').startswith('application/json'):
+            return status, json.loads(data)
+        return status, data.decode()
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+
+def make_payloads(endpoint, n_requests, bbox, users=(), hotspots=DEFAULT_HOTSPOTS, k=5, seed=0):
+    """
+    Random request bodies inside a bounding box
+
+    Args:
+        endpoint: 'route', 'recommend' or 'matrix'
+        n_requests: Number of bodies
+        bbox: (min_lat, min_lon, max_lat, max_lon), e.g. from GET /health
+        users: User ids for 'recommend' (and to attach to every other 'route')
+        hotspots: Points are drawn around this many centers, like commuters
+            heading to a few districts (0 = uniform over the box)
+        k: Routes per recommendation
+        seed: Random seed
+
+    Returns:
+        List of JSON-serializable dicts
+    """
+    rng = np.random.default_rng(seed)
+    low, high = np.array(bbox[:2]), np.array(bbox[2:])
+
+    def points(n):
+        if not hotspots:
+            return rng.uniform(low, high, size=(n, 2))
+        centers = rng.uniform(low, high, size=(hotspots, 2))
+        jitter = rng.normal(0, HOTSPOT_SPREAD, size=(n, 2))
+        return np.clip(centers[rng.integers(hotspots, size=n)] + jitter, low, high)
+
+    if endpoint == 'matrix':
+        return [{'origins': points(10).tolist(), 'destinations': points(10).tolist()} for _ in range(n_requests)]
+
+    origins, destinations = points(n_requests).tolist(), points(n_requests).tolist()
+    users = list(users)
+    payloads = []
+    for i in range(n_requests):
+        payload = {'origin': origins[i], 'destination': destinations[i]}
+        if endpoint == 'recommend':
+            if not users:
+                raise ValueError("The recommend endpoint needs user ids")
+            payload.update(user_id=users[i % len(users)], k=k)
+        elif endpoint == 'route' and users and i % 2:
+            payload['user_id'] = users[i % len(users)]
+        payloads.append(payload)
+    return payloads
+
+
+async def run_load_test(host=DEFAULT_HOST, port=DEFAULT_PORT, endpoint='route', n_requests=1_000,
+                        concurrency=32, hotspots=DEFAULT_HOTSPOTS, seed=0):
+    """
+    Fire requests from concurrent keep-alive connections
+
+    Args:
+        host, port: Server address
+        endpoint: 'route', 'recommend' or 'matrix'
+        n_requests: Total requests
+        concurrency: Simultaneous connections
+        hotspots: See make_payloads
+        seed: Random seed
+
+    Returns:
+        Dictionary with requests, errors, seconds, throughput (requests/s)
+        and p50/p90/p99/max latency in milliseconds
+    """
+    probe = Connection(host, port)
+    _, health = await probe.request('GET', '/health')
+    users = []
+    if endpoint in ('route', 'recommend'):
+        _, listing = await probe.request('GET', '/users')
+        users = listing['users']
+    await probe.close()
+
+    payloads = make_payloads(endpoint, n_requests, health['bbox'], users, hotspots, seed=seed)
+    queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+    latencies, errors = [], []
+
+    async def client():
+        connection = Connection(host, port)
+        try:
+            while not queue.empty():
+                payload = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    status, body = await connection.request('POST', f'/{endpoint}', payload)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    errors.append(str(e))
+                    await connection.close()
+                    continue
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors.append(body.get('error', status) if isinstance(body, dict) else status)
+        finally:
+            await connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latency_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'endpoint': endpoint,
+        'requests': len(payloads),
+        'errors': len(errors),
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': float(np.percentile(latency_ms, 50)),
+        'p90_ms': float(np.percentile(latency_ms, 90)),
+        'p99_ms': float(np.percentile(latency_ms, 99)),
+        'max_ms': float(latency_ms.max()),
+    }
+
+
+def print_report(report):
+    print(f"{report['endpoint']}: {report['requests']:,} requests, {report['concurrency']} connections, "
+          f"{report['errors']} errors")
+    print(f"  throughput {report['throughput']:8.1f} req/s")
+    print(f"  latency    p50 {report['p50_ms']:.1f} ms  p90 {report['p90_ms']:.1f} ms  "
+          f"p99 {report['p99_ms']:.1f} ms  max {report['max_ms']:.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test a running route recommendation server")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--endpoint', choices=['route', 'recommend', 'matrix'], default='route')
+    parser.add_argument('--requests', type=int, default=1_000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--hotspots', type=int, default=DEFAULT_HOTSPOTS)
+    parser.add_argument('--output', help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load_test(args.host, args.port, args.endpoint, args.requests,
+                                       args.concurrency, args.hotspots))
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,665 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit
+import numpy as np
+import shapely
+
+from route_recommendation.src.data.download_pois import load_pois
+from route_recommendation.src.data.traffic_overlay import TrafficOverlay
+from route_recommendation.src.features.poi_features import POIIndex
+from route_recommendation.src.models.profile_store import ProfileStore
+from route_recommendation.src.models.road_graph import RoadGraph, list_overlays
+from route_recommendation.src.models.scoring import preference_matrix, recommend, route_feature_matrix
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS
+from route_recommendation.src.routing.alternatives import generate_alternatives
+from route_recommendation.src.routing.cache import bucket_preferences, constraint_key, preference_bucket
+from route_recommendation.src.routing.engine import DEFAULT_PREFERENCES, RoutingEngine
+from route_recommendation.src.routing.matrix import MATRIX_METRICS, cost_matrix, metric_matrix
+from route_recommendation.src.routing.snapping import SnapIndex
+from route_recommendation.src.service.batching import MAX_BATCH, MAX_BATCH_DELAY, MicroBatcher
+from route_recommendation.src.utils.instrumentation import count, prometheus_text, timer
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+# Executor threads: one searches at a time (pure Python, see RouteService),
+# the others keep matrix queries (SciPy, GIL released) and traffic updates moving
+DEFAULT_WORKERS = 4
+
+# Candidate routes generated per origin/destination pair for /recommend
+# (so also the most routes a request can ask for)
+CANDIDATE_ROUTES = 8
+
+# POI categories that make an edge scenic, and the radius they count in (meters)
+SCENIC_CATEGORIES = ['parks', 'historic']
+SCENERY_DISTANCE = 300
+
+MAX_BODY_BYTES = 1 << 20
+MAX_MATRIX_CELLS = 250_000
+
+# Times a request is re-queued because traffic changed before its batch ran
+EPOCH_RETRIES = 5
+
+
+def edge_scenery(graph, pois, max_distance=SCENERY_DISTANCE):
+    """
+    Scenic score per edge from nearby parks and historic sites
+
+    Args:
+        graph: RoadGraph
+        pois: POI GeoDataFrame or POIIndex
+        max_distance: Radius in meters; the score falls linearly to 0 there
+
+    Returns:
+        float32 array in [0, 1] (the best proximity over SCENIC_CATEGORIES)
+    """
+    index = pois if isinstance(pois, POIIndex) else POIIndex(pois)
+    scenery = np.zeros(graph.n_edges, dtype=np.float32)
+    categories = [c for c in SCENIC_CATEGORIES if c in index.categories]
+    if not categories or not graph.n_edges:
+        return scenery
+
+    coords = np.stack([
+        np.column_stack([graph.node_x[graph.edge_u], graph.node_y[graph.edge_u]]),
+        np.column_stack([graph.node_x[graph.edge_v], graph.node_y[graph.edge_v]]),
+    ], axis=1)
+    metrics = index.query_many(shapely.linestrings(coords), max_distance=max_distance)
+    for category in categories:
+        np.maximum(scenery, metrics[category]['proximity_score'], out=scenery)
+    return scenery
+
+
+class StaleEpoch(Exception):
+    """A batch was queued for an older traffic epoch than the one it would run on"""
+
+    def __init__(self, epoch):
+        super().__init__(epoch)
+        self.epoch = epoch
+
+
+def _point(value, name):
+    """(lat, lon) tuple from a JSON value, ValueError if malformed"""
+    try:
+        lat, lon = (float(v) for v in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be [lat, lon]") from None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"'{name}' is out of range: {value}")
+    return lat, lon
+
+
+def _finite_or_none(values):
+    return [[v if math.isfinite(v) else None for v in row] for row in values.tolist()]
+
+
+class RouteService:
+    """
+    Routing and recommendation state shared by every request
+
+    Loads the graph, traffic overlay, POI-derived scenery and user profiles
+    once, and answers whole batches of requests: points are snapped in one
+    vectorized call, route requests whose origins snap to the same node
+    share one shortest-path tree, and recommendation requests for the same
+    origin/destination nodes share one candidate set scored for all their
+    users in a single matrix product.
+
+    The search loops are pure Python and the engine's cost cache is not
+    thread-safe, so searches take a lock; more threads do not make them
+    faster (see workers.SharedRouteService for a multi-process pool).
+    """
+
+    # Batches of each kind that may be processed at the same time
+    batch_concurrency = 1
+
+    def __init__(self, graph, profiles=(), pois=None, overlay=None):
+        """
+        Args:
+            graph: RoadGraph
+            profiles: Iterable of UserProfile
+            pois: Optional POI GeoDataFrame used for the scenery criterion
+            overlay: TrafficOverlay to follow (default: one over the graph's
+                traffic_multiplier column)
+        """
+        self.graph = graph
+        self.profiles = {profile.user_id: profile for profile in profiles}
+        self.engine = RoutingEngine(graph, scenery=edge_scenery(graph, pois) if pois is not None else None)
+        self.snap_index = SnapIndex(graph)
+        self.overlay = overlay if overlay is not None else TrafficOverlay(graph)
+        self.overlay.subscribe(self.engine.apply_traffic_update)
+        self._search_lock = threading.Lock()
+        self._matrices = {}  # metric -> (epoch, csr matrix)
+
+    @classmethod
+    def from_dataset(cls, city_name="Timişoara, Romania", data_dir='../../data', **kwargs):
+        """
+        Open the files written by build_complete_dataset
+
+        Args:
+            city_name: City the dataset was built for
+            data_dir: Root of the data directory
+            **kwargs: Passed on to the constructor
+
+        Returns:
+            RouteService
+        """
+        city_slug = city_name.replace(" ", "_").replace(",", "")
+        graph_dir = os.path.join(data_dir, 'raw', 'osm', f'{city_slug}_drive.graph')
+        poi_path = os.path.join(data_dir, 'raw', 'pois', f'{city_slug}_pois.parquet')
+        profile_db = os.path.join(data_dir, 'processed', 'user_profiles.sqlite')
+
+        print(f"Loading road graph from {graph_dir}...")
+        has_traffic = 'traffic' in list_overlays(graph_dir)
+        graph = RoadGraph.load(graph_dir, overlay='traffic' if has_traffic else None)
+        overlay = TrafficOverlay.load(graph, graph_dir) if has_traffic else None
+
+        pois = None
+        if os.path.exists(poi_path):
+            print(f"Loading POIs from {poi_path}...")
+            pois = load_pois(poi_path)
+
+        profiles = []
+        if os.path.exists(profile_db):
+            with ProfileStore(profile_db) as store:
+                profiles = [store.load_profile(user_id, with_history=False) for user_id in store.user_ids()]
+            for profile in profiles:
+                profile.store = None
+
+        service = cls(graph, profiles, pois, overlay, **kwargs)
+        print(f"✓ {graph.n_nodes:,} nodes, {graph.n_edges:,} edges, {len(service.profiles)} profiles")
+        return service
+
+    @property
+    def epoch(self):
+        """Traffic version; results of different epochs are never batched together"""
+        return self.overlay.version
+
+    def _check_epoch(self, requests):
+        """
+        Make sure a batch runs on the traffic it was queued for (call under _search_lock)
+
+        Raises:
+            StaleEpoch: If a request carries an 'epoch' other than the current one
+        """
+        epoch = self.epoch
+        if any(request.get('epoch', epoch) != epoch for request in requests):
+            count('service.stale_batches')
+            raise StaleEpoch(epoch)
+
+    def profile(self, user_id):
+        if user_id not in self.profiles:
+            raise ValueError(f"Unknown user '{user_id}'")
+        return self.profiles[user_id]
+
+    def _snap(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return self.snap_index.nearest_nodes(points[:, 0], points[:, 1]).tolist()
+
+    def snap_requests(self, requests):
+        """
+        Origin and destination nodes of a batch, snapped in one call
+
+        Requests that already carry origin_node/destination_node (snapped by
+        another process) are not snapped again.
+
+        Returns:
+            (origin nodes, destination nodes) lists
+        """
+        if all('origin_node' in r for r in requests):
+            return [r['origin_node'] for r in requests], [r['destination_node'] for r in requests]
+        n = len(requests)
+        nodes = self._snap([r['origin'] for r in requests] + [r['destination'] for r in requests])
+        return nodes[:n], nodes[n:]
+
+    # ------------------------------------------------------------------
+    # Batch handlers (run in the executor)
+    # ------------------------------------------------------------------
+
+    def route_batch(self, requests):
+        """
+        Best route for each request
+
+        Args:
+            requests: List of dicts with origin, destination ((lat, lon)),
+                preferences, constraints and optionally the traffic epoch
+                they were queued for
+
+        Returns:
+            List of route dictionaries (see RoutingEngine.route) or None
+            where unreachable
+
+        Raises:
+            StaleEpoch: If traffic changed since the requests were queued
+        """
+        n = len(requests)
+        origins, destinations = self.snap_requests(requests)
+
+        # Same origin and preference bucket: one search serves every destination
+        groups = {}
+        for i, request in enumerate(requests):
+            bucket = preference_bucket(request['preferences'])
+            key = (origins[i], bucket, constraint_key(request['constraints']))
+            groups.setdefault(key, []).append(i)
+
+        results = [None] * n
+        with self._search_lock:
+            self._check_epoch(requests)
+            for (origin, bucket, _), members in groups.items():
+                preferences = bucket_preferences(bucket)
+                constraints = requests[members[0]]['constraints']
+                targets = {destinations[i] for i in members}
+                if len(targets) == 1:
+                    route = self.engine.route(origin, destinations[members[0]], preferences, constraints)
+                    routes = {destinations[members[0]]: route}
+                else:
+                    costs = self.engine.edge_costs(preferences, constraints)
+                    dist, tree_edge = self.engine.shortest_path_tree(origin, costs)
+                    routes = {
+                        target: self.engine.describe_route(self.engine.tree_path(tree_edge, target),
+                                                           origin=origin, cost=dist[target])
+                        if math.isfinite(dist[target]) else None
+                        for target in targets
+                    }
+                for i in members:
+                    results[i] = routes[destinations[i]]
+        count('service.route_searches', len(groups))
+        return results
+
+    def _candidates(self, origin, destination, profiles):
+        """Candidate edge lists for a group of users, generated for their mean preferences"""
+        weights = preference_matrix(profiles).mean(axis=0)
+        preferences = dict(zip(PREFERENCE_KEYS, weights.tolist()))
+        candidates = list(generate_alternatives(self.engine, origin, destination, k=CANDIDATE_ROUTES,
+                                                preferences=preferences)['edges'])
+        if any(profile.constraints.get('avoid_highways') for profile in profiles):
+            seen = {tuple(edges) for edges in candidates}
+            for edges in generate_alternatives(self.engine, origin, destination, k=CANDIDATE_ROUTES,
+                                               preferences=preferences,
+                                               constraints={'avoid_highways': True})['edges']:
+                if tuple(edges) not in seen:
+                    candidates.append(edges)
+        return candidates
+
+    def recommend_batch(self, requests):
+        """
+        Top-k routes for each request's user
+
+        Args:
+            requests: List of dicts with user_id, origin, destination, k and
+                optionally the traffic epoch they were queued for
+
+        Returns:
+            List of lists of ranked route dictionaries (empty if unreachable
+            or nothing satisfies the user's constraints)
+
+        Raises:
+            StaleEpoch: If traffic changed since the requests were queued
+        """
+        n = len(requests)
+        origins, destinations = self.snap_requests(requests)
+        groups = {}
+        for i in range(n):
+            groups.setdefault((origins[i], destinations[i]), []).append(i)
+
+        results = [[] for _ in range(n)]
+        # One traffic state for the whole batch: candidates, scores and descriptions
+        with self._search_lock:
+            self._check_epoch(requests)
+            for (origin, destination), members in groups.items():
+                profiles = [self.profiles[requests[i]['user_id']] for i in members]
+                candidates = self._candidates(origin, destination, profiles)
+                if not candidates:
+                    continue
+                routes = route_feature_matrix(self.engine, candidates)
+                indices, scores = recommend(profiles, routes, k=max(requests[i]['k'] for i in members))
+
+                for row, i in enumerate(members):
+                    for rank, (index, score) in enumerate(zip(indices[row].tolist(), scores[row].tolist())):
+                        if index < 0 or rank >= requests[i]['k']:
+                            break
+                        route = self.engine.describe_route(candidates[index], origin=origin, cost=score)
+                        route['rank'] = rank + 1
+                        results[i].append(route)
+        count('service.recommend_groups', len(groups))
+        return results
+
+    def matrix(self, origins, destinations=None, metric='travel_time'):
+        """
+        Cost matrix between (lat, lon) points (see routing.matrix.cost_matrix)
+
+        Returns:
+            Nested lists with None where a destination is unreachable
+        """
+        # Epoch, weights and the matrix built from them are read together:
+        # apply_traffic changes the live travel times under the same lock
+        with self._search_lock:
+            epoch = self.epoch
+            cached = self._matrices.get(metric)
+            if cached is None or (metric == 'current_travel_time' and cached[0] != epoch):
+                weights = self.engine.criteria['current_travel_time'] if metric == 'current_travel_time' else None
+                cached = (epoch, metric_matrix(self.graph, metric, weights=weights))
+                self._matrices[metric] = cached
+        costs = cost_matrix(self.graph, origins, destinations, metric=metric, inputs='latlon',
+                            processes=1, matrix=cached[1], snap_index=self.snap_index)
+        return _finite_or_none(costs)
+
+    def apply_traffic(self, edges, multipliers):
+        """Apply a sparse traffic delta; returns the new epoch"""
+        with self._search_lock:
+            self.overlay.apply(edges, multipliers)
+        return self.epoch
+
+    def close(self):
+        """Release resources held outside the process (nothing for in-process searches)"""
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RecommendationServer:
+    """
+    asyncio HTTP/1.1 front end of a RouteService (keep-alive, JSON bodies)
+
+    Endpoints:
+        GET  /health     status, traffic epoch and batching statistics
+        GET  /users      known user ids
+        GET  /metrics    instrumentation counters in Prometheus text format
+        POST /route      {origin, destination, user_id? | preferences?, constraints?}
+        POST /recommend  {user_id, origin, destination, k?}
+        POST /matrix     {origins, destinations?, metric?}
+        POST /traffic    {edges, multipliers}
+
+    /route and /recommend go through a MicroBatcher keyed by traffic epoch.
+    The handler re-checks the epoch under the search lock and a batch whose
+    traffic changed while it was queued is re-queued under the new epoch,
+    so a batch never mixes traffic states and the returned epoch is the one
+    the routes were computed on. Everything that searches runs in the
+    executor.
+    """
+
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS,
+                 max_batch=MAX_BATCH, max_delay=MAX_BATCH_DELAY):
+        """
+        Args:
+            service: RouteService (or workers.SharedRouteService)
+            host, port: Address to listen on (port 0 picks a free port)
+            workers: Executor threads (raised to cover the service's
+                batch_concurrency for both batchers)
+            max_batch, max_delay: Micro-batching limits (see MicroBatcher)
+        """
+        self.service = service
+        self.host = host
+        self.port = port
+        concurrency = service.batch_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max(workers, 2 * concurrency + 2),
+                                           thread_name_prefix='route-service')
+        self.route_batcher = MicroBatcher(service.route_batch, self.executor, max_batch, max_delay, concurrency)
+        self.recommend_batcher = MicroBatcher(service.recommend_batch, self.executor, max_batch, max_delay,
+                                              concurrency)
+        self._server = None
+        self._connections = {}  # handler task -> writer
+        self._endpoints = {
+            ('GET', '/health'): self.health,
+            ('GET', '/users'): self.users,
+            ('GET', '/metrics'): self.metrics,
+            ('POST', '/route'): self.route,
+            ('POST', '/recommend'): self.recommend,
+            ('POST', '/matrix'): self.matrix,
+            ('POST', '/traffic'): self.traffic,
+        }
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+
+    async def _submit(self, batcher, item, coalesce):
+        """
+        Queue an item in the batch of the current traffic epoch
+
+        Returns:
+            (result, epoch the result was computed on)
+        """
+        for _ in range(EPOCH_RETRIES):
+            epoch = self.service.epoch
+            try:
+                return await batcher.submit(epoch, dict(item, epoch=epoch), (epoch,) + coalesce), epoch
+            except StaleEpoch:
+                continue
+        raise HTTPError(503, "Traffic changed on every attempt, try again")
+
+    async def health(self, body):
+        graph = self.service.graph
+        return {
+            'status': 'ok',
+            'epoch': self.service.epoch,
+            'nodes': graph.n_nodes,
+            'edges': graph.n_edges,
+            'users': len(self.service.profiles),
+            'bbox': [float(np.nanmin(graph.node_y)), float(np.nanmin(graph.node_x)),
+                     float(np.nanmax(graph.node_y)), float(np.nanmax(graph.node_x))],
+            'batching': {'route': self.route_batcher.stats(), 'recommend': self.recommend_batcher.stats()},
+        }
+
+    async def users(self, body):
+        return {'users': list(self.service.profiles)}
+
+    async def metrics(self, body):
+        return prometheus_text()
+
+    async def route(self, body):
+        origin, destination = _point(body.get('origin'), 'origin'), _point(body.get('destination'), 'destination')
+        if body.get('user_id') is not None:
+            profile = self.service.profile(body['user_id'])
+            preferences = body.get('preferences') or dict(profile.preferences)
+            constraints = body.get('constraints') or profile.constraints
+        else:
+            preferences = body.get('preferences') or DEFAULT_PREFERENCES
+            constraints = body.get('constraints') or {}
+        if not isinstance(preferences, dict) or not isinstance(constraints, dict):
+            raise ValueError("'preferences' and 'constraints' must be objects")
+
+        item = {'origin': origin, 'destination': destination,
+                'preferences': preferences, 'constraints': constraints}
+        coalesce = (origin, destination, preference_bucket(preferences), constraint_key(constraints))
+        route, epoch = await self._submit(self.route_batcher, item, coalesce)
+        return {'route': route, 'epoch': epoch}
+
+    async def recommend(self, body):
+        user_id = body.get('user_id')
+        self.service.profile(user_id)
+        k = int(body.get('k', 5))
+        if not 1 <= k <= CANDIDATE_ROUTES:
+            raise ValueError(f"'k' must be between 1 and {CANDIDATE_ROUTES}")
+        origin, destination = _point(body.get('origin'), 'origin'), _point(body.get('destination'), 'destination')
+
+        item = {'user_id': user_id, 'origin': origin, 'destination': destination, 'k': k}
+        routes, epoch = await self._submit(self.recommend_batcher, item, (user_id, origin, destination, k))
+        return {'routes': routes, 'epoch': epoch}
+
+    async def matrix(self, body):
+        metric = body.get('metric', 'travel_time')
+        if metric not in MATRIX_METRICS:
+            raise ValueError(f"'metric' must be one of {MATRIX_METRICS}")
+        origins = [_point(p, 'origins') for p in body.get('origins') or []]
+        destinations = body.get('destinations')
+        if destinations is not None:
+            destinations = [_point(p, 'destinations') for p in destinations]
+        if len(origins) * len(destinations if destinations is not None else origins) > MAX_MATRIX_CELLS:
+            raise HTTPError(413, f"Matrix larger than {MAX_MATRIX_CELLS:,} cells")
+        if not origins:
+            return {'matrix': [], 'metric': metric}
+
+        loop = asyncio.get_running_loop()
+        costs = await loop.run_in_executor(self.executor, self.service.matrix, origins, destinations, metric)
+        return {'matrix': costs, 'metric': metric}
+
+    async def traffic(self, body):
+        edges = np.asarray(body.get('edges', []), dtype=np.int64)
+        multipliers = np.asarray(body.get('multipliers', []), dtype=np.float32)
+        if edges.shape != multipliers.shape or edges.ndim != 1:
+            raise ValueError("'edges' and 'multipliers' must be lists of equal length")
+        if len(edges) and (edges.min() < 0 or edges.max() >= self.service.graph.n_edges):
+            raise ValueError("Edge index out of range")
+        loop = asyncio.get_running_loop()
+        epoch = await loop.run_in_executor(self.executor, self.service.apply_traffic, edges, multipliers)
+        return {'epoch': epoch}
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line") from None
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = headers.get('content-length') or '0'
+        if not length.isdigit():
+            raise HTTPError(400, "Invalid Content-Length")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), urlsplit(target).path, headers, body
+
+    async def _dispatch(self, method, path, body):
+        endpoint = self._endpoints.get((method, path))
+        if endpoint is None:
+            if any(p == path for _, p in self._endpoints):
+                raise HTTPError(405, f"{method} not allowed on {path}")
+            raise HTTPError(404, f"No endpoint {path}")
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON") from None
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        with timer(f'service.{path.strip("/")}'):
+            return await endpoint(payload)
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as e:
+                    await self._respond(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                try:
+                    status, payload = 200, await self._dispatch(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except (ValueError, KeyError, TypeError) as e:
+                    status, payload = 400, {'error': str(e)}
+                except Exception as e:
+                    status, payload = 500, {'error': f'{type(e).__name__}: {e}'}
+                count(f'service.responses_{status}')
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive=True):
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload).encode(), 'application/json'
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def start(self):
+        """Start listening (self.port holds the bound port afterwards)"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        print(f"Serving on http://{self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self.route_batcher.flush_all()
+        self.recommend_batcher.flush_all()
+        if self._server is not None:
+            self._server.close()
+        # Idle keep-alive connections see EOF and their handlers return
+        tasks = list(self._connections)
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve route recommendations over HTTP")
+    parser.add_argument('--city', default="Timişoara, Romania")
+    parser.add_argument('--data-dir', default='../../data')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="executor threads")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="search processes sharing the graph in shared memory (1 = search in threads)")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-delay-ms', type=float, default=MAX_BATCH_DELAY * 1000)
+    args = parser.parse_args(argv)
+
+    if args.processes > 1:
+        from route_recommendation.src.service.workers import SharedRouteService
+        service = SharedRouteService.from_dataset(args.city, args.data_dir, processes=args.processes)
+    else:
+        service = RouteService.from_dataset(args.city, args.data_dir)
+    server = RecommendationServer(service, args.host, args.port, args.workers,
+                                  args.max_batch, args.max_delay_ms / 1000)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
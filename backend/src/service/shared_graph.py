@@ -0,0 +1,233 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+from route_recommendation.src.models.road_graph import STRUCTURE_ARRAYS, RoadGraph
+
+
+# Byte alignment of every array inside a block
+ALIGNMENT = 64
+
+
+def _open_block(name):
+    """Attach to an existing block without registering it for cleanup in this process"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedArrays:
+    """
+    Named numpy arrays packed into one shared memory block
+
+    The creating process copies the arrays in once; other processes attach
+    by handle and get views into the same physical pages, so N workers cost
+    the memory of one copy.
+    """
+
+    def __init__(self, block, layout, metadata, owner):
+        self._block = block
+        self.layout = layout
+        self.metadata = metadata
+        self.owner = owner
+        self.arrays = {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf, offset=offset)
+            for name, (offset, dtype, shape) in layout.items()
+        }
+        if not owner:
+            for array in self.arrays.values():
+                array.setflags(write=False)
+
+    @classmethod
+    def create(cls, arrays, metadata=None):
+        """
+        Copy arrays into a new block
+
+        Args:
+            arrays: Dictionary name -> numpy array
+            metadata: Small picklable extras carried in the handle
+
+        Returns:
+            SharedArrays owning the block (call unlink() when done)
+        """
+        layout, size = {}, 0
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            layout[name] = (size, array.dtype.str, array.shape)
+            size += array.nbytes
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls(block, layout, metadata or {}, owner=True)
+        for name, array in arrays.items():
+            shared.arrays[name][...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, handle):
+        """Read-only views of a block created elsewhere (handle from .handle)"""
+        name, layout, metadata = handle
+        return cls(_open_block(name), layout, metadata, owner=False)
+
+    @property
+    def handle(self):
+        """Picklable (name, layout, metadata) to pass to other processes"""
+        return self._block.name, self.layout, self.metadata
+
+    @property
+    def nbytes(self):
+        return self._block.size
+
+    def close(self):
+        """Drop this process's mapping (views must no longer be used)"""
+        self.arrays = {}
+        self._block.close()
+
+    def unlink(self):
+        """Free the block once every process has closed it (owner only)"""
+        self.close()
+        self._block.unlink()
+
+
+def share_graph(graph, extra=None):
+    """
+    Copy a RoadGraph (and per-edge extras such as scenery) into shared memory
+
+    Args:
+        graph: RoadGraph
+        extra: Optional dictionary name -> array stored alongside
+
+    Returns:
+        SharedArrays; pass its handle to attach_graph in the workers
+    """
+    arrays = {name: getattr(graph, name) for name in STRUCTURE_ARRAYS}
+    arrays.update({f'column/{name}': values for name, values in graph.columns.items()})
+    arrays.update({f'extra/{name}': values for name, values in (extra or {}).items()})
+    return SharedArrays.create(arrays, {'highway_categories': graph.highway_categories, 'crs': graph.crs})
+
+
+def attach_graph(handle):
+    """
+    Zero-copy RoadGraph over a block written by share_graph
+
+    Returns:
+        (RoadGraph, dictionary of extras, SharedArrays keeping the mapping open)
+    """
+    shared = SharedArrays.attach(handle)
+    arrays = shared.arrays
+    columns = {name[len('column/'):]: values for name, values in arrays.items() if name.startswith('column/')}
+    extra = {name[len('extra/'):]: values for name, values in arrays.items() if name.startswith('extra/')}
+    graph = RoadGraph(
+        node_ids=arrays['node_ids'],
+        indptr=arrays['indptr'],
+        edge_v=arrays['edge_v'],
+        columns=columns,
+        highway_code=arrays['highway_code'],
+        highway_categories=shared.metadata['highway_categories'],
+        edge_key=arrays['edge_key'],
+        edge_osmid=arrays['edge_osmid'],
+        oneway=arrays['oneway'],
+        node_x=arrays['node_x'],
+        node_y=arrays['node_y'],
+        street_count=arrays['street_count'],
+        edge_u=arrays['edge_u'],
+        crs=shared.metadata['crs'],
+    )
+    return graph, extra, shared
+
+
+class TrafficChannel:
+    """
+    Live travel times published by one process and read by many
+
+    Two buffers and a generation counter in shared memory: the writer fills
+    the buffer readers are not using, then increments the generation, which
+    flips the active buffer (generation % 2). Readers copy the active buffer
+    and re-check the generation; if it moved, the writer may have been
+    reusing that buffer and the read is retried (a seqlock). Readers never
+    see a half-written update, and the buffer copy itself runs unlocked.
+
+    Plain numpy stores carry no ordering guarantee on weakly ordered CPUs,
+    so the generation and version are only touched under a shared lock:
+    its release/acquire orders the buffer stores before the flip for every
+    reader. The lock is held for a few scalar loads and stores, never for
+    the copy.
+    """
+
+    def __init__(self, shared, lock):
+        self._shared = shared
+        self._lock = lock
+        self._generation = shared.arrays['generation']
+        self._versions = shared.arrays['versions']
+        self._buffers = shared.arrays['buffers']
+
+    @classmethod
+    def create(cls, current_travel_time, version=0, context=None):
+        """
+        Args:
+            current_travel_time: Initial travel time per edge
+            version: Traffic version of the initial state (e.g. overlay.version)
+            context: multiprocessing context of the reader processes (its
+                start method decides how the lock is passed to them)
+        """
+        current_travel_time = np.asarray(current_travel_time, dtype=np.float32)
+        shared = SharedArrays.create({
+            'generation': np.zeros(1, dtype=np.int64),
+            'versions': np.full(2, version, dtype=np.int64),
+            'buffers': np.stack([current_travel_time, current_travel_time]),
+        })
+        return cls(shared, (context or multiprocessing).Lock())
+
+    @classmethod
+    def attach(cls, handle):
+        shared_handle, lock = handle
+        return cls(SharedArrays.attach(shared_handle), lock)
+
+    @property
+    def handle(self):
+        """(block handle, lock): pass to reader processes when starting them"""
+        return self._shared.handle, self._lock
+
+    @property
+    def generation(self):
+        with self._lock:
+            return int(self._generation[0])
+
+    def publish(self, current_travel_time, version):
+        """Make new travel times visible to every reader (single writer only)"""
+        generation = self.generation
+        slot = (generation + 1) % 2
+        self._buffers[slot] = current_travel_time
+        with self._lock:
+            self._versions[slot] = version
+            self._generation[0] = generation + 1
+
+    def read(self, known_generation=None):
+        """
+        Latest travel times
+
+        Args:
+            known_generation: Generation the caller already has
+
+        Returns:
+            (generation, version, float32 copy of the travel times), or None
+            if the generation is still known_generation
+        """
+        while True:
+            with self._lock:
+                generation = int(self._generation[0])
+                slot = generation % 2
+                version = int(self._versions[slot])
+            if generation == known_generation:
+                return None
+            values = self._buffers[slot].copy()
+            if self.generation == generation:
+                return generation, version, values
+
+    def close(self):
+        self._generation = self._versions = self._buffers = None
+        self._shared.close()
+
+    def unlink(self):
+        self._generation = self._versions = self._buffers = None
+        self._shared.unlink()
@@ -0,0 +1,193 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from route_recommendation.src.routing.engine import RoutingEngine, csgraph_arrays
+from route_recommendation.src.service.server import RouteService
+from route_recommendation.src.service.shared_graph import TrafficChannel, attach_graph, share_graph
+from route_recommendation.src.utils.instrumentation import count
+
+
+# Workers are started from a process that already runs threads (the event
+# loop's executor), where fork is unsafe
+DEFAULT_START_METHOD = 'spawn'
+
+# Cost vectors (8 bytes per edge each) a worker keeps; route batches use
+# bucketed preferences, so a few cover most requests
+WORKER_COST_CACHE_SIZE = 8
+
+# Engine inputs computed once by the parent and shared with the workers
+SHARED_CRITERIA = ['safety', 'scenery']
+
+_WORKER = None
+
+
+class _WorkerService(RouteService):
+    """
+    RouteService over a graph attached from shared memory
+
+    Builds only the routing engine, and that one searches the shared CSR
+    arrays with SciPy (search='csgraph') using the criteria the parent
+    computed, so a worker's own memory does not grow with the graph beyond
+    its traffic copy and cached cost vectors. Requests arrive already
+    snapped by the parent (no SnapIndex per worker) and traffic comes from
+    the parent's TrafficChannel instead of a TrafficOverlay.
+    """
+
+    def __init__(self, graph, profiles, extra, traffic):
+        self.graph = graph
+        self.profiles = {profile.user_id: profile for profile in profiles}
+        criteria = {name: graph.columns[name] for name in ['length', 'travel_time', 'current_travel_time']}
+        criteria.update({name: extra[name] for name in SHARED_CRITERIA})
+        search_arrays = {name[len('search/'):]: values for name, values in extra.items()
+                         if name.startswith('search/')}
+        self.engine = RoutingEngine(graph, criteria=criteria, search='csgraph', search_arrays=search_arrays,
+                                    cost_cache_size=WORKER_COST_CACHE_SIZE)
+        self.traffic = traffic
+        self.generation = None
+        self.version = 0
+        self._search_lock = threading.Lock()
+        self._matrices = {}
+
+    @property
+    def epoch(self):
+        return self.version
+
+    def sync_traffic(self):
+        """Pick up the latest published travel times if they changed"""
+        update = self.traffic.read(self.generation)
+        if update is None:
+            return
+        self.generation, self.version, current = update
+        self.graph.columns['current_travel_time'] = current
+        self.engine.update_traffic()
+
+
+def _init_worker(graph_handle, traffic_handle, profiles):
+    global _WORKER
+    graph, extra, shared = attach_graph(graph_handle)
+    service = _WorkerService(graph, profiles, extra, TrafficChannel.attach(traffic_handle))
+    service.shared = shared  # keeps the mapping alive with the worker
+    service.sync_traffic()
+    _WORKER = service
+
+
+def _run_batch(kind, requests):
+    _WORKER.sync_traffic()
+    if kind == 'route':
+        return _WORKER.route_batch(requests)
+    return _WORKER.recommend_batch(requests)
+
+
+def _worker_info(delay):
+    time.sleep(delay)  # hold this worker so the others take the remaining calls
+    return os.getpid(), _WORKER.generation
+
+
+class SharedRouteService(RouteService):
+    """
+    RouteService whose searches run in a pool of worker processes
+
+    The parent loads the graph, traffic, POI scenery and profiles once and
+    copies the graph arrays, the per-edge cost criteria and the search CSR
+    arrays into one shared memory block; workers attach to it zero-copy
+    instead of each unpickling or loading their own network, and search it
+    in place. The parent snaps each batch (one SnapIndex in the
+    whole pool) and hands the node pairs to a worker, so batches from the
+    MicroBatcher run on as many cores as there are workers.
+
+    Traffic deltas applied to the parent's overlay are published through a
+    double-buffered TrafficChannel; each worker picks up the newest
+    generation before its next batch.
+    """
+
+    def __init__(self, graph, profiles=(), pois=None, overlay=None, processes=None,
+                 start_method=DEFAULT_START_METHOD):
+        """
+        Args:
+            graph, profiles, pois, overlay: See RouteService
+            processes: Worker processes (default: CPU count)
+            start_method: multiprocessing start method of the workers
+        """
+        super().__init__(graph, profiles, pois, overlay)
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_concurrency = self.processes
+
+        extra = {name: self.engine.criteria[name] for name in SHARED_CRITERIA}
+        extra.update({f'search/{name}': values for name, values in csgraph_arrays(graph).items()})
+        self.shared_graph = share_graph(graph, extra)
+        context = multiprocessing.get_context(start_method)
+        self.traffic = TrafficChannel.create(self.engine.criteria['current_travel_time'], self.epoch, context)
+        self.overlay.subscribe(self._publish_traffic)
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.shared_graph.handle, self.traffic.handle, list(self.profiles.values())),
+        )
+
+    def _publish_traffic(self, snapshot, edges):
+        self.traffic.publish(snapshot.current_travel_time(), snapshot.version)
+        count('service.traffic_published')
+
+    def warm_up(self, delay=0.2):
+        """
+        Start every worker now instead of on the first requests
+
+        Returns:
+            Set of worker process ids that answered
+        """
+        calls = [self._pool.submit(_worker_info, delay) for _ in range(self.processes)]
+        return {call.result()[0] for call in calls}
+
+    def _submit(self, kind, requests):
+        origins, destinations = self.snap_requests(requests)
+        requests = [dict(request, origin_node=o, destination_node=d)
+                    for request, o, d in zip(requests, origins, destinations)]
+        return self._pool.submit(_run_batch, kind, requests).result()
+
+    def route_batch(self, requests):
+        """RouteService.route_batch, run in a worker process"""
+        return self._submit('route', requests)
+
+    def recommend_batch(self, requests):
+        """RouteService.recommend_batch, run in a worker process"""
+        return self._submit('recommend', requests)
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        self._pool.shutdown(wait=True)
+        self.overlay.unsubscribe(self._publish_traffic)
+        self.shared_graph.unlink()
+        self.traffic.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Example usage
+if __name__ == "__main__":
+    import asyncio
+    from route_recommendation.src.service.load_test import print_report, run_load_test
+    from route_recommendation.src.service.server import RecommendationServer
+
+    async def measure(service):
+        server = await RecommendationServer(service, port=0).start()
+        try:
+            return await run_load_test(port=server.port, endpoint='route', n_requests=2_000, concurrency=64)
+        finally:
+            await server.close()
+
+    print("1 process (threads)")
+    print_report(asyncio.run(measure(RouteService.from_dataset("Timişoara, Romania", '../../data'))))
+    for processes in sorted({2, 4, os.cpu_count() or 1}):
+        with SharedRouteService.from_dataset("Timişoara, Romania", '../../data', processes=processes) as service:
+            print(f"\n{processes} processes, shared graph block {service.shared_graph.nbytes / 1e6:.1f} MB")
+            service.warm_up()
+            print_report(asyncio.run(measure(service)))
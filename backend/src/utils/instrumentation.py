@@ -0,0 +1,311 @@
+import atexit
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Environment switches, so runs can be instrumented without code changes:
+#   ROUTE_RECOMMENDATION_METRICS=1            collect timers, counters and memory
+#   ROUTE_RECOMMENDATION_METRICS_FILE=m.json  export at exit (.prom/.txt for Prometheus text)
+#   ROUTE_RECOMMENDATION_PROFILE=a,b|all      cProfile + tracemalloc for these profiled() names
+#   ROUTE_RECOMMENDATION_PROFILE_DIR=dir      where .prof and tracemalloc reports go
+ENV_METRICS = 'ROUTE_RECOMMENDATION_METRICS'
+ENV_METRICS_FILE = 'ROUTE_RECOMMENDATION_METRICS_FILE'
+ENV_PROFILE = 'ROUTE_RECOMMENDATION_PROFILE'
+ENV_PROFILE_DIR = 'ROUTE_RECOMMENDATION_PROFILE_DIR'
+
+PROMETHEUS_PREFIX = 'route_recommendation'
+
+# Lines of the per-stage tracemalloc report
+TRACEMALLOC_TOP = 25
+
+
+class Metrics:
+    """Thread-safe registry of timers, counters and memory high-water marks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.timers = {}  # name -> [count, total, min, max] seconds
+            self.counters = {}
+            self.memory = {}  # name -> bytes (high-water mark)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                self.timers[name] = [1, seconds, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = min(stats[2], seconds)
+                stats[3] = max(stats[3], seconds)
+
+    def add_count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_high_water(self, name, value):
+        with self._lock:
+            if value > self.memory.get(name, -1):
+                self.memory[name] = value
+
+    def snapshot(self):
+        """Plain-dict copy of everything collected so far"""
+        with self._lock:
+            return {
+                'timers': {name: {'count': c, 'total': t, 'min': lo, 'max': hi, 'mean': t / c}
+                           for name, (c, t, lo, hi) in self.timers.items()},
+                'counters': dict(self.counters),
+                'memory_high_water_bytes': dict(self.memory),
+            }
+
+
+METRICS = Metrics()
+
+_enabled = os.environ.get(ENV_METRICS, '').lower() in ('1', 'true', 'yes')
+_profiled = {name.strip() for name in os.environ.get(ENV_PROFILE, '').split(',') if name.strip()}
+
+
+def enable(profile=None):
+    """
+    Start collecting metrics
+
+    Args:
+        profile: Optional names of profiled() sections to capture with
+            cProfile/tracemalloc ('all' for every section)
+    """
+    global _enabled, _profiled
+    _enabled = True
+    if profile is not None:
+        _profiled = {profile} if isinstance(profile, str) else set(profile)
+
+
+def disable():
+    global _enabled, _profiled
+    _enabled = False
+    _profiled = set()
+
+
+def is_enabled():
+    return _enabled
+
+
+def peak_rss():
+    """Peak resident set size of the process in bytes (0 where unavailable)"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # kB on Linux
+
+
+class _NullTimer:
+    """Shared no-op context used while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        METRICS.add_time(self.name, time.perf_counter() - self._start)
+        METRICS.set_high_water('process', peak_rss())
+        return False
+
+
+def timer(name):
+    """
+    Context manager timing a block under a name
+
+        with timer('poi.query_many'):
+            ...
+
+    Costs one flag check while metrics are disabled.
+    """
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def timed(name=None):
+    """Decorator form of timer (default name: module.function)"""
+    def decorator(func):
+        label = name or f'{func.__module__.rsplit(".", 1)[-1]}.{func.__name__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Timer(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """Add to a counter (e.g. edges processed, routes scored)"""
+    if _enabled:
+        METRICS.add_count(name, value)
+
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+class _Profiled(_Timer):
+    """
+    Timer that also captures cProfile stats and the tracemalloc peak
+
+    tracemalloc is process-wide: sections profiled at the same time (e.g.
+    concurrent pipeline stages) share one trace, so their peaks overlap.
+    """
+
+    def __enter__(self):
+        global _tracemalloc_users
+        self._profiler = None
+        self._capturing = 'all' in _profiled or self.name in _profiled
+        if self._capturing:
+            with _tracemalloc_lock:
+                if _tracemalloc_users == 0:
+                    tracemalloc.start()
+                _tracemalloc_users += 1
+                tracemalloc.reset_peak()
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:  # another profiler is active (one at a time on Python 3.12+)
+                self._profiler = None
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        global _tracemalloc_users
+        super().__exit__(*exc)
+        if not self._capturing:
+            return False
+
+        directory = os.environ.get(ENV_PROFILE_DIR, 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        filename = self.name.replace('/', '_')
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(os.path.join(directory, f'{filename}.prof'))
+
+        _, peak = tracemalloc.get_traced_memory()
+        METRICS.set_high_water(self.name, peak)
+        with open(os.path.join(directory, f'{filename}.tracemalloc.txt'), 'w') as f:
+            f.write(f"peak {peak} bytes\n")
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:TRACEMALLOC_TOP]:
+                f.write(f"{stat}\n")
+        with _tracemalloc_lock:
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0:
+                tracemalloc.stop()
+        return False
+
+
+def profiled(name):
+    """
+    timer() that can additionally capture a cProfile dump and tracemalloc
+    report for the block, when enabled for this name (see enable and
+    ROUTE_RECOMMENDATION_PROFILE). Meant for coarse sections such as
+    pipeline stages, not inner loops.
+    """
+    return _Profiled(name) if _enabled else _NULL_TIMER
+
+
+# ----------------------------------------------------------------------
+# Export
+# ----------------------------------------------------------------------
+
+def _prometheus_label(name):
+    return name.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text(snapshot=None):
+    """Metrics in the Prometheus text exposition format"""
+    snapshot = snapshot or METRICS.snapshot()
+    prefix = PROMETHEUS_PREFIX
+    lines = [f'# TYPE {prefix}_duration_seconds summary']
+    for name, stats in sorted(snapshot['timers'].items()):
+        label = f'{{name="{_prometheus_label(name)}"}}'
+        lines.append(f'{prefix}_duration_seconds_count{label} {stats["count"]}')
+        lines.append(f'{prefix}_duration_seconds_sum{label} {stats["total"]:.9g}')
+    lines.append(f'# TYPE {prefix}_duration_seconds_max gauge')
+    for name, stats in sorted(snapshot['timers'].items()):
+        lines.append(f'{prefix}_duration_seconds_max{{name="{_prometheus_label(name)}"}} {stats["max"]:.9g}')
+    lines.append(f'# TYPE {prefix}_events_total counter')
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append(f'{prefix}_events_total{{name="{_prometheus_label(name)}"}} {value}')
+    lines.append(f'# TYPE {prefix}_memory_high_water_bytes gauge')
+    for name, value in sorted(snapshot['memory_high_water_bytes'].items()):
+        lines.append(f'{prefix}_memory_high_water_bytes{{name="{_prometheus_label(name)}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def export(path):
+    """
+    Write the collected metrics to a file
+
+    Args:
+        path: .json for structured JSON, .prom or .txt for Prometheus text
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    snapshot = METRICS.snapshot()
+    with open(path, 'w') as f:
+        if path.endswith(('.prom', '.txt')):
+            f.write(prometheus_text(snapshot))
+        else:
+            json.dump(snapshot, f, indent=2, sort_keys=True)
+
+
+def _export_at_exit():
+    path = os.environ.get(ENV_METRICS_FILE)
+    if _enabled and path:
+        export(path)
+
+
+atexit.register(_export_at_exit)
+
+
+# Example usage
+if __name__ == "__main__":
+    import numpy as np
+
+    enable(profile='demo')
+
+    @timed()
+    def square_sum(values):
+        count('demo.values', len(values))
+        return float(np.square(values).sum())
+
+    with profiled('demo'):
+        for _ in range(100):
+            square_sum(np.random.rand(10_000))
+
+    print(json.dumps(METRICS.snapshot(), indent=2))
+    print(prometheus_text())
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from route_recommendation.benchmarks.run_benchmarks import compare, run_benchmarks
+from route_recommendation.benchmarks.synthetic import synthetic_network, synthetic_pois, synthetic_profiles
+from route_recommendation.src.models.road_graph import RoadGraph
+
+
+@pytest.mark.parametrize('layout', ['grid', 'radial'])
+def test_synthetic_network_is_osmnx_shaped(layout):
+    G = synthetic_network(5_000, layout)
+    assert 4_000 <= G.number_of_edges() <= 6_000
+    _, _, data = next(iter(G.edges(data=True)))
+    assert {'osmid', 'highway', 'oneway', 'length', 'speed_kph', 'travel_time'} <= set(data)
+
+    graph = RoadGraph.from_networkx(G)
+    assert graph.n_edges == G.number_of_edges()
+    assert (graph.columns['length'] > 0).all()
+    assert set(graph.highway_categories) == {'primary', 'secondary', 'tertiary', 'residential'}
+
+    pois = synthetic_pois(G, 100)
+    assert len(pois) == 100 and pois['category'].nunique() == 5
+    assert synthetic_network(5_000, layout, seed=1).number_of_edges() > 0
+
+
+def test_benchmark_results_are_json_and_comparable():
+    results = run_benchmarks(sizes=[500], n_users=5, repeat=1,
+                             only=['graph_load_mmap', 'simulate_current_traffic', 'profile_load_store'])
+    assert [r['benchmark'] for r in results['results']] == [
+        'graph_load_mmap', 'simulate_current_traffic', 'profile_load_store']
+    assert all(r['median'] > 0 for r in results['results'])
+    baseline = json.loads(json.dumps(results))
+
+    for r in baseline['results']:
+        r['median'] /= 10
+    assert len(compare(results, baseline)) == 3
+    assert compare(results, results) == []
+    assert len(synthetic_profiles(3, history_length=2)[0].history) == 2
@@ -1,7 +1,6 @@
-import pickle
 import geopandas as gpd
-import os
-import json
+from route_recommendation.src.models.profile_store import ProfileStore
+from route_recommendation.src.models.road_graph import RoadGraph
 
 
 def test_all_data_sources():
@@ -12,17 +11,15 @@ def test_all_data_sources():
     # Test 1: Road Network
     print("[1] Testing road network...")
     try:
-        with open(
-            "route_recommendation/data/raw/osm/Timişoara_Romania_drive.pkl", "rb"
-        ) as f:
-            G = pickle.load(f)
-        print(f"  ✓ Loaded graph: {G.number_of_nodes():,} nodes")
+        graph = RoadGraph.load(
+            "route_recommendation/data/raw/osm/Timişoara_Romania_drive.graph"
+        )
+        print(f"  ✓ Loaded graph: {graph.n_nodes:,} nodes")
 
         # Check for required attributes
-        sample_edge = list(G.edges(data=True))[0]
         required_attrs = ["length", "speed_kph", "travel_time"]
         for attr in required_attrs:
-            assert attr in sample_edge[2], f"Missing {attr}"
+            assert attr in graph.columns, f"Missing {attr}"
         print(f"  ✓ Has required attributes: {required_attrs}")
     except Exception as e:
         print(f"  ✗ Error: {e}")
@@ -44,13 +41,11 @@ def test_all_data_sources():
     print("\n[3] Testing user profiles...")
     try:
         profile_dir = "route_recommendation/data/processed/user_profiles"
-        profiles = [f for f in os.listdir(profile_dir) if f.endswith(".json")]
-        print(f"  ✓ Found {len(profiles)} user profiles")
-
-        # Load one profile
-        with open(os.path.join(profile_dir, profiles[0]), "r") as f:
-            sample_profile = json.load(f)
-        print(f"  ✓ Sample preferences: {sample_profile['preferences']}")
+        with ProfileStore(":memory:") as store:
+            store.import_json_dir(profile_dir)
+            user_ids, preferences = store.preference_matrix()
+            print(f"  ✓ Found {store.count()} user profiles")
+            print(f"  ✓ Sample preferences: {store.load_profile(user_ids[0]).preferences}")
     except Exception as e:
         print(f"  ✗ Error: {e}")
         return False
@@ -58,17 +53,15 @@ def test_all_data_sources():
     # Test 4: Traffic Data
     print("\n[4] Testing traffic simulation...")
     try:
-        with open(
-            "route_recommendation/data/raw/osm/Timişoara_Romania_drive_with_traffic.pkl",
-            "rb",
-        ) as f:
-            G_traffic = pickle.load(f)
+        G_traffic = RoadGraph.load(
+            "route_recommendation/data/raw/osm/Timişoara_Romania_drive.graph",
+            overlay="traffic",
+        )
 
-        sample_edge = list(G_traffic.edges(data=True))[0]
-        assert "current_travel_time" in sample_edge[2], "Missing traffic data"
+        assert "current_travel_time" in G_traffic.columns, "Missing traffic data"
         print(f"  ✓ Traffic data available")
         print(
-            f"  ✓ Sample traffic multiplier: {sample_edge[2].get('traffic_multiplier', 1.0):.2f}x"
+            f"  ✓ Sample traffic multiplier: {G_traffic.columns['traffic_multiplier'][0]:.2f}x"
         )
     except Exception as e:
         print(f"  ✗ Error: {e}")
@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+from route_recommendation.src.data.pipeline import Pipeline, Stage
+from route_recommendation.src.utils import instrumentation
+from route_recommendation.src.utils.instrumentation import METRICS, count, profiled, timed, timer
+
+
+@pytest.fixture
+def metrics():
+    METRICS.reset()
+    yield METRICS
+    instrumentation.disable()
+    METRICS.reset()
+
+
+def test_disabled_instrumentation_records_nothing(metrics):
+    instrumentation.disable()
+
+    @timed('test.square')
+    def square(x):
+        return x * x
+
+    with timer('test.block'), profiled('test.stage'):
+        count('test.items', 3)
+        assert square(4) == 16
+
+    assert metrics.snapshot() == {'timers': {}, 'counters': {}, 'memory_high_water_bytes': {}}
+
+
+def test_timers_counters_and_export(metrics, tmp_path):
+    instrumentation.enable()
+
+    @timed()
+    def square_sum(values):
+        count('test.values', len(values))
+        return float(np.square(values).sum())
+
+    for _ in range(3):
+        square_sum(np.ones(10))
+    with timer('test.block'):
+        pass
+
+    snapshot = metrics.snapshot()
+    assert snapshot['timers']['test_instrumentation.square_sum']['count'] == 3
+    assert snapshot['timers']['test.block']['count'] == 1
+    assert snapshot['counters']['test.values'] == 30
+    assert snapshot['memory_high_water_bytes']['process'] > 0
+
+    instrumentation.export(str(tmp_path / 'metrics.json'))
+    with open(tmp_path / 'metrics.json') as f:
+        assert json.load(f)['counters'] == {'test.values': 30}
+
+    instrumentation.export(str(tmp_path / 'metrics.prom'))
+    text = (tmp_path / 'metrics.prom').read_text()
+    assert 'route_recommendation_events_total{name="test.values"} 30' in text
+    assert 'route_recommendation_duration_seconds_count{name="test.block"} 1' in text
+
+
+def test_pipeline_stages_are_timed_and_profiled(metrics, tmp_path, monkeypatch):
+    monkeypatch.setenv(instrumentation.ENV_PROFILE_DIR, str(tmp_path / 'profiles'))
+    instrumentation.enable(profile=['pipeline.build'])
+
+    def build():
+        (tmp_path / 'out.txt').write_text('x' * 1000)
+
+    stages = [Stage('build', build, outputs=[str(tmp_path / 'out.txt')]),
+              Stage('check', lambda: None, deps=['build'])]
+    pipeline = Pipeline(stages, str(tmp_path / 'state.json'))
+    pipeline.run(verbose=False)
+    pipeline.run(verbose=False)
+
+    snapshot = metrics.snapshot()
+    assert snapshot['timers']['pipeline.build']['count'] == 1
+    assert snapshot['timers']['pipeline.check']['count'] == 1
+    assert snapshot['counters'] == {'pipeline.stages_ran': 2, 'pipeline.stages_cached': 2}
+    assert 'pipeline.build' in snapshot['memory_high_water_bytes']
+
+    # Only the requested stage is captured
+    assert (tmp_path / 'profiles' / 'pipeline.build.prof').exists()
+    assert (tmp_path / 'profiles' / 'pipeline.build.tracemalloc.txt').read_text().startswith('peak ')
+    assert not (tmp_path / 'profiles' / 'pipeline.check.prof').exists()
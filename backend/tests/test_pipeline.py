@@ -0,0 +1,114 @@
+import os
+import threading
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import Point
+
+from route_recommendation.src.data.download_pois import download_pois, offline_fetcher
+from route_recommendation.src.data.pipeline import Pipeline, Stage
+
+
+def _writer(path, text, calls, barrier=None):
+    def run():
+        if barrier is not None:
+            barrier.wait(timeout=5)  # only passes if both stages run at once
+        calls.append(os.path.basename(path))
+        with open(path, 'w') as f:
+            f.write(text())
+    return run
+
+
+def test_pipeline_runs_concurrently_caches_and_resumes(tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('v1')
+    calls = []
+    barrier = threading.Barrier(2)
+    fail = {'c': True}
+
+    def c_text():
+        if fail['c']:
+            raise OSError('network down')
+        return 'c'
+
+    def stages():
+        return [
+            Stage('a', _writer(str(tmp_path / 'a.txt'), lambda: source.read_text(), calls, barrier),
+                  inputs=[str(source)], outputs=[str(tmp_path / 'a.txt')]),
+            Stage('b', _writer(str(tmp_path / 'b.txt'), lambda: 'b', calls, barrier),
+                  outputs=[str(tmp_path / 'b.txt')]),
+            Stage('c', _writer(str(tmp_path / 'c.txt'), c_text, calls), deps=['a', 'b'],
+                  outputs=[str(tmp_path / 'c.txt')]),
+        ]
+
+    state_path = str(tmp_path / 'state.json')
+    with pytest.raises(RuntimeError, match="Stage 'c' failed"):
+        Pipeline(stages(), state_path).run(verbose=False)
+    assert sorted(calls) == ['a.txt', 'b.txt', 'c.txt']
+
+    # Resume: finished stages are checkpointed, only the failed one runs
+    fail['c'] = False
+    barrier = None
+    calls.clear()
+    assert Pipeline(stages(), state_path).run(verbose=False) == {'a': 'cached', 'b': 'cached', 'c': 'ran'}
+    assert Pipeline(stages(), state_path).run(verbose=False) == {'a': 'cached', 'b': 'cached', 'c': 'cached'}
+
+    # Changed input reruns its stage and the dependents whose upstream output changed
+    source.write_text('v2')
+    assert Pipeline(stages(), state_path).run(verbose=False) == {'a': 'ran', 'b': 'cached', 'c': 'ran'}
+
+    # Touched or deleted outputs are rebuilt
+    os.remove(tmp_path / 'b.txt')
+    assert Pipeline(stages(), state_path).run(verbose=False)['b'] == 'ran'
+    assert Pipeline(stages(), state_path).run(force=['a'], verbose=False)['a'] == 'ran'
+
+    with pytest.raises(ValueError, match='cycle'):
+        Pipeline([Stage('x', lambda: None, deps=['y']), Stage('y', lambda: None, deps=['x'])], state_path)
+
+
+def test_download_pois_offline(tmp_path):
+    snapshot = gpd.GeoDataFrame({
+        'amenity': ['restaurant', 'fuel', None, 'restaurant'],
+        'leisure': [None, None, 'park', None],
+        'historic': [None, None, None, 'memorial'],
+        'name': ['A', 'B', 'C', 'D'],
+    }, geometry=[Point(21.2 + i * 0.01, 45.75) for i in range(4)], crs='EPSG:4326')
+    snapshot_path = str(tmp_path / 'snapshot.parquet')
+    snapshot.to_parquet(snapshot_path)
+
+    tags = {'parks': {'leisure': 'park'}, 'restaurants': {'amenity': 'restaurant'},
+            'historic': {'historic': True}, 'fuel_or_parks': {'amenity': ['fuel'], 'leisure': 'park'}}
+    pois = download_pois('Timişoara, Romania', tags, save_dir=str(tmp_path / 'pois'),
+                         fetch=offline_fetcher(snapshot_path), max_workers=4)
+    assert pois.groupby('category')['name'].apply(sorted).to_dict() == {
+        'parks': ['C'], 'restaurants': ['A', 'D'], 'historic': ['D'], 'fuel_or_parks': ['B', 'C']}
+    assert os.path.exists(tmp_path / 'pois' / 'Timişoara_Romania_pois.parquet')
+
+
+def test_build_complete_dataset_offline_caches_every_stage(tmp_path, capsys):
+    import pickle
+    from datetime import datetime
+
+    from route_recommendation.benchmarks.synthetic import synthetic_network, synthetic_pois
+    from route_recommendation.src.data.build_complete_dataset import build_complete_dataset
+
+    offline_dir = tmp_path / 'offline'
+    offline_dir.mkdir()
+    G = synthetic_network(400)
+    with open(offline_dir / 'Timişoara_Romania_drive.pkl', 'wb') as f:
+        pickle.dump(G, f)
+    synthetic_pois(G, 50).to_parquet(offline_dir / 'Timişoara_Romania_pois.parquet')
+
+    def build():
+        return build_complete_dataset(data_dir=str(tmp_path / 'data'), offline_dir=str(offline_dir), num_users=5,
+                                      traffic_time=datetime(2024, 2, 5, 8))
+
+    graph, pois = build()
+    assert graph.n_edges == G.number_of_edges() and len(pois) > 0
+    capsys.readouterr()
+
+    build()
+    output = capsys.readouterr().out
+    for stage in ['network', 'pois', 'profiles', 'traffic']:
+        assert f'✓ {stage} (cached)' in output
+    assert 'Added' not in output and 'Generated' not in output
@@ -0,0 +1,103 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import LineString, Point
+
+from route_recommendation.src.features.poi_features import (
+    POIIndex,
+    add_poi_features_to_routes,
+    calculate_poi_proximity,
+    route_poi_features,
+)
+
+
+def _brute_force(route, pois, category, max_distance=500):
+    """Reference implementation: reproject everything, measure everything"""
+    subset = pois[pois['category'] == category].to_crs('EPSG:32635')
+    line = gpd.GeoSeries([route], crs='EPSG:4326').to_crs('EPSG:32635').iloc[0]
+    distances = subset.geometry.distance(line)
+    return distances.min(), (distances <= max_distance).sum()
+
+
+def _sample_data(seed=0):
+    rng = np.random.default_rng(seed)
+    lon = 21.22 + rng.uniform(-0.02, 0.02, 300)
+    lat = 45.75 + rng.uniform(-0.02, 0.02, 300)
+    categories = rng.choice(['parks', 'restaurants', 'hospitals'], 300, p=[0.3, 0.68, 0.02])
+    pois = gpd.GeoDataFrame(
+        {'category': categories},
+        geometry=[Point(x, y) for x, y in zip(lon, lat)],
+        crs='EPSG:4326',
+    )
+    routes = [
+        LineString(np.cumsum(rng.normal(0, 0.004, (5, 2)), axis=0) + [21.22, 45.75])
+        for _ in range(25)
+    ]
+    return pois, routes
+
+
+def test_index_matches_brute_force():
+    pois, routes = _sample_data()
+    index = POIIndex(pois)
+    metrics = index.query_many(routes, max_distance=500)
+
+    for category in index.categories:
+        for i, route in enumerate(routes):
+            min_dist, count = _brute_force(route, pois, category)
+            assert np.isclose(metrics[category]['min_distance'][i], min_dist)
+            assert metrics[category]['count_within_range'][i] == count
+
+
+def test_single_route_api_is_unchanged():
+    pois, routes = _sample_data(seed=1)
+    index = POIIndex(pois)
+
+    from_gdf = calculate_poi_proximity(routes[0], pois, category='parks')
+    from_index = calculate_poi_proximity(routes[0], index, category='parks')
+    assert from_gdf == from_index
+    assert set(from_index) == {'min_distance', 'avg_distance', 'count_within_range', 'proximity_score'}
+
+    missing = calculate_poi_proximity(routes[0], index, category='museums')
+    assert missing['count_within_range'] == 0 and missing['min_distance'] == np.inf
+
+
+def test_add_poi_features_to_routes_columns():
+    pois, routes = _sample_data(seed=2)
+    routes_df = pd.DataFrame({'geometry': routes})
+    routes_df = add_poi_features_to_routes(routes_df, pois)
+
+    for category in ['parks', 'restaurants', 'hospitals']:
+        assert f'poi_{category}_proximity' in routes_df
+        assert f'poi_{category}_count' in routes_df
+        assert routes_df[f'poi_{category}_proximity'].between(0, 1).all()
+
+
+def test_route_features_from_edge_table_match_geometry():
+    import networkx as nx
+    from route_recommendation.src.data.extract_road_features import extract_edge_poi_features
+
+    pois, _ = _sample_data(seed=2)
+    pois = pois.iloc[:30]  # fewer POIs than edges: the edges get indexed
+    rng = np.random.default_rng(2)
+    G = nx.MultiDiGraph()
+    for node in range(40):
+        G.add_node(node, x=21.20 + rng.uniform(0, 0.04), y=45.73 + rng.uniform(0, 0.04))
+    for node in range(39):
+        G.add_edge(node, node + 1)
+
+    index = POIIndex(pois)
+    edge_table = extract_edge_poi_features(G, index)
+    assert len(edge_table) == G.number_of_edges()
+
+    route_edges = [[0, 1, 2], list(range(10, 30)), [5], []]
+    features = route_poi_features(edge_table, route_edges)
+    geometries = [LineString([(G.nodes[n]['x'], G.nodes[n]['y']) for n in range(e[0], e[-1] + 2)])
+                  for e in route_edges[:3]]
+    expected = index.query_many(geometries)
+
+    for category in index.categories:
+        np.testing.assert_allclose(features[f'poi_{category}_min_distance'][:3],
+                                   expected[category]['min_distance'], rtol=1e-5)
+        assert features[f'poi_{category}_edge_hits'].iloc[3] == 0
+        assert f'poi_{category}_count' not in features
+        assert features[f'poi_{category}_proximity'].iloc[3] == 0
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from route_recommendation.src.models.profile_store import ProfileStore
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS, UserProfile
+
+
+def test_import_json_profiles_and_preference_matrix(tmp_path):
+    profiles = [UserProfile(preferences={'time': 0.5 + i / 100, 'safety': 0.5 - i / 100}) for i in range(5)]
+    profiles[0].add_route_to_history(1, 2, {'route_id': 0}, [{'route_id': 1}], {'hour': 8})
+    for i, profile in enumerate(profiles):
+        profile.save(str(tmp_path / 'json' / f'user_{i:03d}.json'))
+
+    with ProfileStore(str(tmp_path / 'profiles.sqlite')) as store:
+        assert store.import_json_dir(str(tmp_path / 'json')) == 5
+        assert store.count() == 5 and store.history_count() == 1
+
+        # Re-importing keeps what the store learned since
+        stored = store.load_profile(profiles[0].user_id)
+        stored.add_route_to_history(2, 3, {'route_id': 2}, [], {'hour': 9})
+        assert store.import_json_dir(str(tmp_path / 'json')) == 0
+        assert store.history_count() == 2
+        assert store.import_json_dir(str(tmp_path / 'json'), replace=True) == 5
+        assert store.count() == 5 and store.history_count() == 1
+
+        user_ids, matrix = store.preference_matrix()
+        assert matrix.shape == (5, len(PREFERENCE_KEYS)) and matrix.dtype == np.float32
+        expected = {p.user_id: [p.preferences.get(k, 0.0) for k in PREFERENCE_KEYS] for p in profiles}
+        np.testing.assert_allclose(matrix, [expected[u] for u in user_ids], rtol=1e-6)
+
+        loaded = store.load_profile(profiles[0].user_id)
+        assert loaded.history == profiles[0].history
+        assert loaded.constraints == profiles[0].constraints
+        with pytest.raises(KeyError):
+            store.load_profile('missing')
+
+
+def test_history_appends_go_to_the_store(tmp_path):
+    path = str(tmp_path / 'profiles.sqlite')
+    user = UserProfile()
+    user.archetype = 'scenic_focused'
+    with ProfileStore(path) as store:
+        store.save_profile(user)
+        for i in range(3):
+            user.add_route_to_history(0, i, {'route_id': i}, [], {'hour': 7 + i})
+
+    with ProfileStore(path) as store:
+        loaded = store.load_profile(user.user_id)
+        assert [r['destination'] for r in loaded.history] == [0, 1, 2]
+        assert [r['context']['hour'] for r in store.history(user.user_id, limit=2)] == [8, 9]
+        assert loaded.archetype == 'scenic_focused'
+        assert loaded.preferences == pytest.approx(user.preferences)
@@ -0,0 +1,104 @@
+import os
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from route_recommendation.src.models.road_graph import RoadGraph
+
+
+def _toy_network():
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    G.add_node(30, x=21.20, y=45.75, street_count=2)
+    G.add_node(10, x=21.21, y=45.75, street_count=3)
+    G.add_node(20, x=21.21, y=45.76, street_count=3)
+    G.add_edge(30, 10, osmid=1, highway='primary', length=780.0, speed_kph=50.0, travel_time=56.2, lanes='2')
+    G.add_edge(10, 20, osmid=[2, 3], highway=['residential', 'unclassified'],
+               length=1110.0, speed_kph=30.0, travel_time=133.2)
+    G.add_edge(10, 20, osmid=4, highway='tertiary', length=1200.0, speed_kph=50.0, travel_time=86.4, lanes=['1', '2'])
+    G.add_edge(20, 30, osmid=5, highway='secondary', length=1400.0, speed_kph=50.0, travel_time=100.8)
+    return G
+
+
+def test_csr_layout_and_id_mapping():
+    G = _toy_network()
+    graph = RoadGraph.from_networkx(G)
+
+    assert (graph.n_nodes, graph.n_edges) == (3, 4)
+    assert graph.edge_v.dtype == np.int32 and graph.columns['length'].dtype == np.float32
+    for i, (u, v, key) in enumerate(G.edges(keys=True)):
+        assert graph.edge_index(u, v, key) == i
+        assert graph.node_ids[graph.edge_u[i]] == u and graph.node_ids[graph.edge_v[i]] == v
+
+    assert list(graph.highway) == ['primary', 'residential|unclassified', 'tertiary', 'secondary']
+    assert graph.columns['lanes'][2] == 2.0 and np.isnan(graph.columns['lanes'][1])
+    np.testing.assert_array_equal(graph.node_index([20, 30]), [2, 0])
+
+    in_ptr, in_edges = graph.reverse()
+    assert sorted(in_edges[in_ptr[2]:in_ptr[3]]) == [1, 2]
+
+
+def test_edge_features_round_trip():
+    graph = RoadGraph.from_networkx(_toy_network())
+    table = graph.to_dataframe()
+    table['highway'] = table['highway'].astype(str)
+    nodes = pd.DataFrame({'x': graph.node_x, 'y': graph.node_y}, index=graph.node_ids)
+
+    rebuilt = RoadGraph.from_edge_features(table, nodes=nodes)
+    np.testing.assert_array_equal(rebuilt.node_ids[rebuilt.edge_u], graph.node_ids[graph.edge_u])
+    np.testing.assert_array_equal(rebuilt.node_x, graph.node_x)
+    for name, column in graph.columns.items():
+        np.testing.assert_array_equal(rebuilt.columns[name], column)
+
+
+def test_save_load_mmap_with_overlay(tmp_path):
+    from route_recommendation.src.models.road_graph import list_overlays, save_overlay
+
+    graph = RoadGraph.from_networkx(_toy_network())
+    graph_dir = str(tmp_path / 'toy.graph')
+    graph.save(graph_dir)
+
+    multipliers = np.array([1.5, 1.0, 1.2, 0.9], dtype=np.float32)
+    save_overlay(graph_dir, 'traffic', {
+        'current_travel_time': graph.columns['travel_time'] * multipliers,
+        'traffic_multiplier': multipliers,
+    }, metadata={'timestamp': '2024-02-05T08:00:00'})
+    assert list_overlays(graph_dir) == ['traffic']
+
+    base = RoadGraph.load(graph_dir)
+    assert isinstance(base.columns['length'].base, np.memmap)
+    np.testing.assert_array_equal(base.indptr, graph.indptr)
+    assert base.highway_categories == graph.highway_categories
+    np.testing.assert_array_equal(base.columns['traffic_multiplier'], np.ones(4))
+
+    with_traffic = RoadGraph.load(graph_dir, overlay='traffic')
+    np.testing.assert_array_equal(with_traffic.columns['traffic_multiplier'], multipliers)
+
+    # Re-saving replaces the files; graphs mapped earlier keep the old arrays
+    graph.columns['length'] = graph.columns['length'] * 2
+    graph.save(graph_dir)
+    np.testing.assert_array_equal(base.columns['length'], graph.columns['length'] / 2)
+    np.testing.assert_array_equal(RoadGraph.load(graph_dir).columns['length'], graph.columns['length'])
+    assert not any(name.endswith('.tmp') for name in os.listdir(graph_dir))
+
+
+def test_parquet_edge_table_round_trip(tmp_path):
+    from route_recommendation.src.data.extract_road_features import extract_edge_features, load_edge_features
+
+    G = _toy_network()
+    path = str(tmp_path / 'edge_features.parquet')
+    table = extract_edge_features(G, save_path=path)
+    assert table['osmid'].tolist()[:2] == [[1], [2, 3]]
+    assert table['length'].dtype == np.float32 and table['highway'].dtype == 'category'
+
+    subset = load_edge_features(path, columns=['u', 'highway', 'length'])
+    assert list(subset.columns) == ['u', 'highway', 'length']
+    assert list(subset['highway']) == ['primary', 'residential|unclassified', 'tertiary', 'secondary']
+
+    graph = RoadGraph.from_networkx(G)
+    for source in (path, table):
+        rebuilt = RoadGraph.from_edge_features(source)
+        np.testing.assert_array_equal(rebuilt.edge_osmid, graph.edge_osmid)
+        assert list(rebuilt.highway) == list(graph.highway)
+        for name, column in graph.columns.items():
+            np.testing.assert_array_equal(rebuilt.columns[name], column)
@@ -0,0 +1,96 @@
+import networkx as nx
+import numpy as np
+
+from route_recommendation.benchmarks.synthetic import synthetic_network, synthetic_routes
+from route_recommendation.src.features.route_features import (
+    ROAD_CLASSES, TURN_ANGLE, SHARP_TURN_ANGLE, U_TURN_ANGLE, RouteFeatureExtractor, edge_bearings,
+    road_class, to_ragged,
+)
+from route_recommendation.src.models.road_graph import RoadGraph
+from route_recommendation.src.routing.costs import edge_safety
+
+
+def _cross_network():
+    """A plus-shaped junction: straight on, a right turn and a dead end to turn around in"""
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    positions = {1: (21.200, 45.740), 2: (21.201, 45.740), 3: (21.202, 45.740),
+                 4: (21.201, 45.739), 5: (21.201, 45.741)}
+    for node, (x, y) in positions.items():
+        G.add_node(node, x=x, y=y, street_count=4 if node == 2 else 1)
+    for u, v, highway in [(1, 2, 'primary'), (2, 3, 'primary'), (2, 4, 'residential'), (3, 2, 'primary'),
+                          (2, 1, 'primary_link'), (2, 5, 'motorway')]:
+        G.add_edge(u, v, highway=highway, length=80.0, speed_kph=50.0, travel_time=5.8,
+                   current_travel_time=11.6)
+    return RoadGraph.from_networkx(G)
+
+
+def test_turns_intersections_and_mix_on_a_junction():
+    graph = _cross_network()
+    e = {(graph.node_ids[u], graph.node_ids[v]): i for i, (u, v) in enumerate(zip(graph.edge_u, graph.edge_v))}
+    routes = [[e[1, 2], e[2, 3]],  # straight on
+              [e[1, 2], e[2, 4]],  # right turn (east then south)
+              [e[1, 2], e[2, 3], e[3, 2], e[2, 1]],  # U-turn at the dead end
+              [e[1, 2], e[2, 5]],
+              []]
+    features = RouteFeatureExtractor(graph).extract_routes(routes)
+
+    assert features['n_edges'].tolist() == [2, 2, 4, 2, 0]
+    assert features['turns'].tolist() == [0, 1, 1, 1, 0]
+    assert features['sharp_turns'].tolist() == [0, 0, 1, 0, 0]
+    assert features['u_turns'].tolist() == [0, 0, 1, 0, 0]
+    assert np.isclose(features['max_turn_angle'][1], 90, atol=1)
+    assert np.isclose(features['max_turn_angle'][2], 180, atol=1e-6)
+    # The U-turn route passes the junction twice; the dead end is no intersection
+    assert features['intersections'].tolist() == [1, 1, 2, 1, 0]
+    assert np.allclose(features['length'][:4], [160, 160, 320, 160]) and features['length'][4] == 0
+    assert np.allclose(features['time'][:4], [23.2, 23.2, 46.4, 23.2])
+    assert features['uses_highway'].tolist() == [False, False, False, True, False]
+    assert np.isclose(features['residential_share'][1], 0.5) and features['primary_share'][2] == 1.0
+    assert np.isclose(features['motorway_share'][3], 0.5) and features['other_share'].sum() == 0
+    assert np.isnan(features['safety'][4])
+    assert road_class('primary_link|secondary') == 'primary' and road_class('service') == 'other'
+
+    # The scoring simplicity criterion charges these turns, not edges
+    from route_recommendation.src.models.scoring import route_feature_matrix
+    from route_recommendation.src.routing.costs import DECISION_PENALTY
+    from route_recommendation.src.routing.engine import RoutingEngine
+
+    scored = route_feature_matrix(RoutingEngine(graph), routes)
+    np.testing.assert_allclose(scored['features'][:, -1], features['turns'] * DECISION_PENALTY)
+
+
+def test_vectorized_features_match_a_per_route_loop():
+    G = synthetic_network(4_000, layout='radial')
+    graph = RoadGraph.from_networkx(G)
+    walks = synthetic_routes(G, 300, n_edges=25, seed=3)['nodes']
+    index = {node: i for i, node in enumerate(graph.node_ids)}
+    route_edges = []
+    for walk in walks:
+        edges = []
+        for u, v in zip(walk[:-1], walk[1:]):
+            start, stop = graph.indptr[index[u]], graph.indptr[index[u] + 1]
+            edges.append(start + int(np.flatnonzero(graph.edge_v[start:stop] == index[v])[0]))
+        route_edges.append(edges)
+    route_edges.append([])
+
+    values, offsets = to_ragged(route_edges)
+    features = RouteFeatureExtractor(graph).extract(values, offsets, use_traffic=False)
+    bearings, safety = edge_bearings(graph), edge_safety(graph)
+
+    for i, edges in enumerate(route_edges):
+        length = graph.columns['length'][edges].astype(float)
+        changes = [abs((bearings[b] - bearings[a] + 180) % 360 - 180) for a, b in zip(edges[:-1], edges[1:])]
+        changes = np.nan_to_num(changes)
+        row = features.iloc[i]
+        assert row['n_edges'] == len(edges)
+        assert np.isclose(row['length'], length.sum())
+        assert np.isclose(row['time'], graph.columns['travel_time'][edges].astype(float).sum())
+        assert row['turns'] == (changes >= TURN_ANGLE).sum()
+        assert row['sharp_turns'] == (changes >= SHARP_TURN_ANGLE).sum()
+        assert row['u_turns'] == (changes >= U_TURN_ANGLE).sum()
+        assert np.isclose(row['max_turn_angle'], changes.max() if len(changes) else 0)
+        assert row['intersections'] == sum(graph.street_count[graph.edge_v[e]] >= 3 for e in edges[:-1])
+        if edges:
+            assert np.isclose(row['safety'], (length * safety[edges]).sum() / length.sum())
+            shares = row[[f'{name}_share' for name in ROAD_CLASSES]]
+            assert np.isclose(shares.sum(), 1.0)
@@ -0,0 +1,433 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from route_recommendation.src.models.road_graph import RoadGraph
+from route_recommendation.src.routing.engine import RoutingEngine
+from route_recommendation.src.routing.search import haversine
+
+HIGHWAYS = ['residential', 'tertiary', 'secondary', 'primary', 'motorway']
+
+
+def _grid_network(size=12, seed=0):
+    """Perturbed grid around Timisoara with mixed road types and one-way streets"""
+    rng = np.random.default_rng(seed)
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    for i in range(size):
+        for j in range(size):
+            G.add_node(1000 + i * size + j, x=21.20 + 0.002 * j + rng.uniform(-3e-4, 3e-4),
+                       y=45.74 + 0.0015 * i + rng.uniform(-3e-4, 3e-4), street_count=4)
+
+    def connect(a, b):
+        ax, ay, bx, by = G.nodes[a]['x'], G.nodes[a]['y'], G.nodes[b]['x'], G.nodes[b]['y']
+        length = float(haversine(ax, ay, bx, by)) * rng.uniform(1.0, 1.3)
+        highway = HIGHWAYS[rng.integers(len(HIGHWAYS))]
+        speed = {'residential': 30, 'tertiary': 40, 'secondary': 50, 'primary': 60, 'motorway': 90}[highway]
+        travel_time = length / (speed / 3.6) * rng.uniform(1.0, 1.5)
+        G.add_edge(a, b, highway=highway, length=length, speed_kph=float(speed),
+                   travel_time=travel_time, current_travel_time=travel_time * rng.uniform(0.8, 2.0))
+
+    for i in range(size):
+        for j in range(size):
+            node = 1000 + i * size + j
+            for neighbor in ([node + 1] if j + 1 < size else []) + ([node + size] if i + 1 < size else []):
+                connect(node, neighbor)
+                if rng.random() > 0.15:  # some one-way streets
+                    connect(neighbor, node)
+    return G
+
+
+@pytest.fixture(scope='module')
+def network():
+    G = _grid_network()
+    return G, RoadGraph.from_networkx(G)
+
+
+def _random_pairs(graph, count, seed=1):
+    return np.random.default_rng(seed).integers(0, graph.n_nodes, size=(count, 2)).tolist()
+
+
+def test_fastest_route_matches_networkx(network):
+    G, graph = network
+    engine = RoutingEngine(graph)
+
+    for origin, destination in _random_pairs(graph, 60):
+        route = engine.route(origin, destination, use_traffic=False)
+        u, v = graph.node_ids[origin], graph.node_ids[destination]
+        try:
+            expected = nx.shortest_path_length(G, u, v, weight='travel_time')
+        except nx.NetworkXNoPath:
+            assert route is None
+            continue
+        assert route['cost'] == pytest.approx(expected, rel=1e-5)
+        assert route['osm_nodes'][0] == u and route['osm_nodes'][-1] == v
+
+
+def test_multi_criteria_route_is_optimal_for_its_cost(network):
+    G, graph = network
+    engine = RoutingEngine(graph)
+    preferences = {'time': 0.3, 'distance': 0.2, 'safety': 0.3, 'scenery': 0.1, 'simplicity': 0.1}
+    costs = engine.edge_costs(preferences)
+
+    H = nx.DiGraph()
+    for e in range(graph.n_edges):
+        u, v = int(graph.edge_u[e]), int(graph.edge_v[e])
+        if not H.has_edge(u, v) or H[u][v]['cost'] > costs[e]:
+            H.add_edge(u, v, cost=costs[e])
+
+    for origin, destination in _random_pairs(graph, 40, seed=2):
+        route = engine.route(origin, destination, preferences)
+        if route is None:
+            continue
+        expected = nx.shortest_path_length(H, origin, destination, weight='cost')
+        assert route['cost'] == pytest.approx(expected, rel=1e-6)
+        assert route['cost'] == pytest.approx(costs[route['edges']].sum(), rel=1e-6)
+
+
+def test_avoid_highways_blocks_motorways(network):
+    _, graph = network
+    engine = RoutingEngine(graph)
+    motorway = graph.highway_categories.index('motorway')
+
+    for origin, destination in _random_pairs(graph, 20, seed=3):
+        route = engine.route(origin, destination, constraints={'avoid_highways': True})
+        if route is not None:
+            assert not np.any(graph.highway_code[route['edges']] == motorway)
+
+
+def test_csgraph_search_matches_lists(network):
+    _, graph = network
+    lists = RoutingEngine(graph)
+    csgraph = RoutingEngine(graph, search='csgraph')
+    preferences = {'time': 0.5, 'safety': 0.3, 'scenery': 0.2}
+
+    for origin, destination in _random_pairs(graph, 30, seed=4):
+        expected = lists.route(origin, destination, preferences)
+        route = csgraph.route(origin, destination, preferences)
+        if expected is None:
+            assert route is None
+            continue
+        _assert_valid_path(graph, route['edges'], origin, destination)
+        assert route['cost'] == pytest.approx(expected['cost'], rel=1e-9)
+
+    costs = lists.edge_costs(preferences)
+    for reverse in [False, True]:
+        dist, _ = lists.shortest_path_tree(7, costs, reverse=reverse)
+        csgraph_dist, _ = csgraph.shortest_path_tree(7, costs, reverse=reverse)
+        np.testing.assert_allclose(csgraph_dist, dist, rtol=1e-9)
+
+    with pytest.raises(ValueError):
+        RoutingEngine(graph, search='bfs')
+
+
+def _assert_valid_path(graph, edges, source, target):
+    if source == target:
+        assert edges == []
+        return
+    assert graph.edge_u[edges[0]] == source and graph.edge_v[edges[-1]] == target
+    assert all(graph.edge_v[a] == graph.edge_u[b] for a, b in zip(edges, edges[1:]))
+
+
+def test_contraction_hierarchy_matches_dijkstra(network, tmp_path):
+    from route_recommendation.src.routing.contraction import ContractionHierarchy
+
+    G, graph = network
+    ch = ContractionHierarchy.build(graph, 'travel_time')
+    ch.save(str(tmp_path / 'ch_travel_time'))
+    loaded = ContractionHierarchy.load(str(tmp_path / 'ch_travel_time'))
+
+    for source, target in _random_pairs(graph, 80, seed=4):
+        cost, edges = loaded.query(source, target)
+        try:
+            expected = nx.shortest_path_length(G, graph.node_ids[source], graph.node_ids[target],
+                                               weight='travel_time')
+        except nx.NetworkXNoPath:
+            assert edges is None
+            continue
+        assert cost == pytest.approx(expected, rel=1e-6)
+        _assert_valid_path(graph, edges, source, target)
+        assert graph.columns['travel_time'][edges].sum() == pytest.approx(cost, rel=1e-5)
+
+    # Saving over a hierarchy that is still mapped leaves the mapped one intact
+    ch.save(str(tmp_path / 'ch_travel_time'))
+    assert loaded.query(0, graph.n_nodes - 1) == ch.query(0, graph.n_nodes - 1)
+    assert not [p for p in (tmp_path / 'ch_travel_time').iterdir() if p.suffix == '.tmp']
+
+
+def test_customizable_hierarchy_follows_new_weights(network, tmp_path):
+    from route_recommendation.src.routing.customizable import CustomizableHierarchy
+    from route_recommendation.src.routing.search import astar
+
+    _, graph = network
+    cch = CustomizableHierarchy.build(graph)
+    cch.save(str(tmp_path / 'cch'))
+    cch = CustomizableHierarchy.load(str(tmp_path / 'cch'))
+    engine = RoutingEngine(graph)
+
+    for preferences, constraints in [({'time': 1.0}, None),
+                                     ({'time': 0.2, 'safety': 0.6, 'simplicity': 0.2}, {'avoid_highways': True})]:
+        weights = engine.edge_costs(preferences, constraints)
+        metric = cch.customize(weights)
+        for source, target in _random_pairs(graph, 40, seed=5):
+            expected, _ = astar(engine._indptr, engine._heads, weights.tolist(), source, target)
+            cost, edges = cch.query(metric, source, target)
+            if edges is None:
+                assert expected == np.inf
+                continue
+            assert cost == pytest.approx(expected, rel=1e-9)
+            _assert_valid_path(graph, edges, source, target)
+            assert weights[edges].sum() == pytest.approx(cost, rel=1e-9)
+
+    # Re-saving while the loaded structure is still mapped keeps it usable
+    cch.save(str(tmp_path / 'cch'))
+    assert cch.query(metric, 0, graph.n_nodes - 1) == CustomizableHierarchy.load(
+        str(tmp_path / 'cch')).query(metric, 0, graph.n_nodes - 1)
+    assert not [p for p in (tmp_path / 'cch').iterdir() if p.suffix == '.tmp']
+
+
+def test_alternatives_are_diverse_and_bounded(network):
+    from route_recommendation.src.routing.alternatives import generate_alternatives
+
+    _, graph = network
+    engine = RoutingEngine(graph)
+    preferences = {'time': 0.5, 'distance': 0.3, 'safety': 0.2}
+    costs = engine.edge_costs(preferences)
+    lengths = graph.columns['length'].astype(float)
+
+    for origin, destination in _random_pairs(graph, 10, seed=6):
+        routes = generate_alternatives(engine, origin, destination, k=5, preferences=preferences,
+                                       max_overlap=0.7, max_stretch=0.5)
+        best = engine.route(origin, destination, preferences)
+        if best is None:
+            assert len(routes) == 0
+            continue
+
+        assert 1 <= len(routes) <= 5
+        assert routes.crs.to_epsg() == 4326
+        assert routes['cost'].iloc[0] == pytest.approx(best['cost'])
+        for i, row in routes.iterrows():
+            _assert_valid_path(graph, row['edges'], origin, destination)
+            assert row['cost'] == pytest.approx(costs[row['edges']].sum())
+            assert row['cost'] <= best['cost'] * 1.5 + 1e-6
+            for other in routes['edges'].iloc[:i]:
+                shared = lengths[list(set(row['edges']) & set(other))].sum()
+                assert shared <= 0.7 * lengths[row['edges']].sum() + 1e-6
+
+    same = generate_alternatives(engine, 3, 3)
+    assert len(same) == 1 and same['length'].iloc[0] == 0
+
+
+def test_cost_matrix_matches_dijkstra(network, monkeypatch):
+    from route_recommendation.src.routing import matrix as matrix_module
+    from route_recommendation.src.routing.matrix import cost_matrix
+
+    G, graph = network
+    rng = np.random.default_rng(7)
+    origins = rng.integers(0, graph.n_nodes, size=12)
+    destinations = rng.integers(0, graph.n_nodes, size=9)
+
+    for metric in ['travel_time', 'current_travel_time', 'length']:
+        costs = cost_matrix(graph, origins, destinations, metric=metric, processes=1)
+        assert costs.shape == (12, 9)
+        for i, origin in enumerate(origins):
+            lengths = nx.single_source_dijkstra_path_length(G, graph.node_ids[origin], weight=metric)
+            for j, destination in enumerate(destinations):
+                expected = lengths.get(graph.node_ids[destination], np.inf)
+                assert costs[i, j] == pytest.approx(expected, rel=1e-5)
+
+    # Same matrix from OSM ids, from snapped coordinates and from the process pool
+    expected = cost_matrix(graph, origins, destinations, processes=1)
+    osm = cost_matrix(graph, graph.node_ids[origins], graph.node_ids[destinations], inputs='osm')
+    latlon = cost_matrix(graph, np.column_stack([graph.node_y[origins], graph.node_x[origins]]),
+                         np.column_stack([graph.node_y[destinations], graph.node_x[destinations]]),
+                         inputs='latlon')
+    monkeypatch.setattr(matrix_module, 'ORIGIN_CHUNK', 4)
+    monkeypatch.setattr(matrix_module, 'PARALLEL_MIN_CELLS', 0)
+    pooled = cost_matrix(graph, origins, destinations, processes=2)
+    for other in (osm, latlon, pooled):
+        np.testing.assert_allclose(other, expected, rtol=1e-6)
+
+
+def test_snap_index_matches_brute_force(network):
+    from route_recommendation.src.routing.snapping import SnapIndex
+
+    _, graph = network
+    index = SnapIndex(graph, sample_spacing=40.0)
+    rng = np.random.default_rng(8)
+    # Points inside the grid and well outside it
+    lat = rng.uniform(graph.node_y.min() - 0.01, graph.node_y.max() + 0.01, size=500)
+    lon = rng.uniform(graph.node_x.min() - 0.01, graph.node_x.max() + 0.01, size=500)
+    points = index.project(lat, lon)
+
+    nodes, node_dist = index.nearest_nodes(lat, lon, return_dist=True)
+    brute = np.hypot(*(points[:, None, :] - index.node_xy[None, :, :]).transpose(2, 0, 1))
+    np.testing.assert_allclose(node_dist, brute.min(axis=1))
+    np.testing.assert_allclose(brute[np.arange(500), nodes], brute.min(axis=1))
+
+    edges, offsets, distances = index.nearest_edges(lat, lon)
+    all_edges = np.arange(graph.n_edges)
+    _, brute = index._project_onto_edges(points[:, None, :], all_edges[None, :])
+    np.testing.assert_allclose(distances, brute.min(axis=1), atol=1e-6)
+    assert np.all((offsets >= 0) & (offsets <= 1))
+
+    # The offset reproduces the snapped point at the reported distance
+    a = index.node_xy[graph.edge_u[edges]]
+    b = index.node_xy[graph.edge_v[edges]]
+    snapped = a + offsets[:, None] * (b - a)
+    np.testing.assert_allclose(np.hypot(*(points - snapped).T), distances, atol=1e-6)
+
+
+def _label_correcting_arrival(graph, profiles, source, departure):
+    """Reference earliest arrival: relax every edge until nothing improves"""
+    arrival = np.full(graph.n_nodes, np.inf)
+    arrival[source] = departure
+    changed = True
+    while changed:
+        changed = False
+        for e in range(graph.n_edges):
+            u, v = graph.edge_u[e], graph.edge_v[e]
+            if np.isfinite(arrival[u]):
+                at = profiles.arrival_time(e, arrival[u])
+                if at < arrival[v] - 1e-9:
+                    arrival[v] = at
+                    changed = True
+    return arrival
+
+
+def test_time_dependent_routing_is_fifo_and_exact(network, tmp_path):
+    from datetime import datetime
+    from route_recommendation.src.routing.time_dependent import (
+        TimeDependentRouter,
+        TravelTimeProfiles,
+        week_time,
+    )
+
+    G, graph = network
+    profiles = TravelTimeProfiles.from_graph(graph)
+    profiles.save(str(tmp_path / 'profiles.npz'))
+    profiles = TravelTimeProfiles.load(str(tmp_path / 'profiles.npz'))
+    router = TimeDependentRouter(graph, profiles)
+
+    # Leaving later never means arriving earlier, also across bucket borders
+    starts = week_time(datetime(2024, 2, 5, 16, 59)) + np.arange(0, 240, 0.5)
+    for e in range(0, graph.n_edges, 17):
+        arrivals = [profiles.arrival_time(e, t) for t in starts]
+        assert np.all(np.diff(arrivals) >= 0)
+
+    # A 16:59 departure pays evening-rush prices for the part after 17:00
+    edge = int(np.argmax(graph.columns['travel_time'] * (profiles.profiles[profiles.edge_profile, 17] > 1)))
+    t0 = week_time(datetime(2024, 2, 5, 16, 59, 50))
+    assert profiles.arrival_time(edge, t0) - t0 > profiles.travel_times_at(t0)[edge]
+
+    for departure in [datetime(2024, 2, 5, 16, 55), datetime(2024, 2, 5, 19, 58)]:
+        start = week_time(departure)
+        for source, target in _random_pairs(graph, 5, seed=9):
+            expected = _label_correcting_arrival(graph, profiles, source, start)[target]
+            route = router.route(source, target, departure)
+            if route is None:
+                assert expected == np.inf
+                continue
+            assert route['arrival'] == pytest.approx(expected, rel=1e-9)
+            _assert_valid_path(graph, route['edges'], source, target)
+
+    # Flat profiles reduce to static fastest routes
+    flat = TravelTimeProfiles(graph.columns['travel_time'], np.zeros(graph.n_edges), np.ones((1, 168)))
+    static = RoutingEngine(graph)
+    for source, target in _random_pairs(graph, 20, seed=10):
+        route = TimeDependentRouter(graph, flat).route(source, target, 0.0)
+        expected = static.route(source, target, use_traffic=False)
+        if expected is None:
+            assert route is None
+            continue
+        assert route['travel_time'] == pytest.approx(expected['cost'], rel=1e-5)
+
+
+def test_time_dependent_routing_skips_edges_without_travel_time():
+    from route_recommendation.src.routing.time_dependent import TimeDependentRouter, TravelTimeProfiles
+
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    for node, x in [(1, 21.200), (2, 21.202), (3, 21.201)]:
+        G.add_node(node, x=x, y=45.74, street_count=2)
+    G.add_edge(1, 2, highway='primary', length=160.0)  # no travel_time: NaN in the RoadGraph
+    G.add_edge(1, 3, highway='primary', length=90.0, travel_time=10.0)
+    G.add_edge(3, 2, highway='primary', length=90.0, travel_time=10.0)
+    graph = RoadGraph.from_networkx(G)
+
+    profiles = TravelTimeProfiles.from_graph(graph)
+    assert profiles.arrival_time(graph.edge_index(1, 2, 0), 0.0) == np.inf
+    route = TimeDependentRouter(graph, profiles).route(0, 1, 0.0)
+    assert graph.node_ids[route['nodes']].tolist() == [1, 3, 2]
+
+    with pytest.raises(ValueError):
+        TravelTimeProfiles([-1.0], [0], np.ones((1, 168)))
+
+
+def test_engine_follows_traffic_overlay_deltas(network):
+    from route_recommendation.src.data.traffic_overlay import TrafficOverlay
+
+    _, graph = network
+    # The fixture sets current_travel_time directly, so derive matching multipliers
+    multipliers = graph.columns['current_travel_time'] / graph.columns['travel_time']
+    overlay = TrafficOverlay(graph, multipliers, block_size=64)
+    engine = RoutingEngine(graph)
+    overlay.subscribe(engine.apply_traffic_update)
+    preferences = {'time': 0.6, 'safety': 0.4}
+    held = engine.edge_costs(preferences)
+    before = held.copy()
+    engine.edge_costs(preferences, {'avoid_highways': True})
+
+    rng = np.random.default_rng(11)
+    edges = rng.choice(graph.n_edges, size=30, replace=False)
+    snapshot = overlay.apply(edges, rng.uniform(0.3, 3.0, size=30))
+    np.testing.assert_array_equal(held, before)  # results handed out earlier stay as they were
+    assert np.any(engine.edge_costs(preferences)[edges] != before[edges])
+
+    fresh = RoutingEngine(graph)
+    fresh.criteria['current_travel_time'] = snapshot.current_travel_time()
+    for constraints in [None, {'avoid_highways': True}]:
+        np.testing.assert_allclose(engine.edge_costs(preferences, constraints),
+                                   fresh.edge_costs(preferences, constraints), rtol=1e-6)
+        for origin, destination in _random_pairs(graph, 10, seed=12):
+            route = engine.route(origin, destination, preferences, constraints)
+            expected = fresh.route(origin, destination, preferences, constraints)
+            assert (route is None) == (expected is None)
+            if route is not None:
+                assert route['cost'] == pytest.approx(expected['cost'], rel=1e-6)
+
+
+def test_route_cache_lru_ttl_and_traffic_epoch(network):
+    from route_recommendation.src.data.traffic_overlay import TrafficOverlay
+    from route_recommendation.src.routing.cache import CachedRouter, RouteCache
+
+    _, graph = network
+    now = [0.0]
+    cache = RouteCache(max_size=3, ttl=60, clock=lambda: now[0])
+    overlay = TrafficOverlay(graph, graph.columns['current_travel_time'] / graph.columns['travel_time'])
+    engine = RoutingEngine(graph)
+    router = CachedRouter(engine, cache, overlay=overlay)
+    preferences = {'time': 0.5, 'safety': 0.3, 'scenery': 0.2}
+
+    first = router.route(0, 100, preferences)
+    # A nearly identical preference mix falls into the same bucket
+    assert router.route(0, 100, {'time': 0.501, 'safety': 0.3, 'scenery': 0.199}) is first
+    assert router.route(0, 100, preferences, {'avoid_highways': True}) is not first
+    assert first['cost'] == pytest.approx(engine.route(0, 100, preferences)['cost'])
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # TTL expiry
+    now[0] = 61
+    assert router.route(0, 100, preferences) is not first
+
+    # LRU eviction
+    for destination in (101, 102, 103):
+        router.route(0, destination, preferences)
+    assert len(cache) == 3 and cache.evictions >= 1
+
+    # A traffic delta advances the epoch and drops every entry
+    overlay.apply([first['edges'][0]], 3.0)
+    assert len(cache) == 0 and cache.epoch == overlay.version == 1
+    updated = router.route(0, 100, preferences)
+    assert updated['cost'] == pytest.approx(engine.route(0, 100, preferences)['cost'])
+
+    routes = router.alternatives(0, 100, k=3, preferences=preferences)
+    assert router.alternatives(0, 100, k=3, preferences=preferences) is routes
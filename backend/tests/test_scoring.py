@@ -0,0 +1,75 @@
+import numpy as np
+
+from route_recommendation.benchmarks.synthetic import synthetic_network
+from route_recommendation.src.models import scoring
+from route_recommendation.src.models.road_graph import RoadGraph
+from route_recommendation.src.models.scoring import (
+    constraint_arrays,
+    preference_matrix,
+    recommend,
+    route_feature_matrix,
+    top_k_routes,
+)
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS, UserProfile
+from route_recommendation.src.routing.costs import DECISION_PENALTY, highway_mask
+from route_recommendation.src.routing.engine import RoutingEngine
+
+
+def _network_with_motorways():
+    """Synthetic grid whose primary streets are motorways, so avoid_highways matters"""
+    G = synthetic_network(600)
+    for _, _, data in G.edges(data=True):
+        if data['highway'] == 'primary':
+            data['highway'] = 'motorway'
+    return RoadGraph.from_networkx(G)
+
+
+def test_batch_scoring_matches_per_user_ranking(monkeypatch):
+    graph = _network_with_motorways()
+    engine = RoutingEngine(graph)
+    pairs = np.random.default_rng(1).integers(0, graph.n_nodes, size=(40, 2)).tolist()
+    routes = [engine.route(o, d) for o, d in pairs]
+    candidates = [route['edges'] for route in routes if route is not None] + [[]]
+    routes = route_feature_matrix(engine, candidates)
+
+    rng = np.random.default_rng(3)
+    profiles = []
+    for i in range(30):
+        user = UserProfile(preferences=dict(zip(PREFERENCE_KEYS,
+                                                rng.dirichlet(np.ones(5)) * rng.uniform(0.5, 2))))
+        user.constraints = {'max_time': [None, 3.0][i % 2], 'max_distance': [None, 1.5][i % 3 == 0],
+                            'avoid_highways': i % 5 == 0}
+        profiles.append(user)
+
+    # Small chunks so the chunked path is exercised
+    monkeypatch.setattr(scoring, 'SCORE_CHUNK', 100)
+    indices, scores = recommend(profiles, routes, k=4)
+    assert indices.shape == scores.shape == (30, 4)
+
+    highways = highway_mask(graph)
+    turns = engine.route_features.extract_routes(candidates)['turns'].to_numpy()
+    for user, weights, row, row_scores in zip(profiles, preference_matrix(profiles), indices, scores):
+        # Scores are route generalized costs under the user's preferences,
+        # with the simplicity penalty charged per turn instead of per edge
+        costs = engine.edge_costs(user.preferences)
+        simplicity = weights[PREFERENCE_KEYS.index('simplicity')] * DECISION_PENALTY
+        expected = []
+        for r, edges in enumerate(candidates):
+            c = user.constraints
+            if ((c['max_time'] is not None and routes['travel_time'][r] > c['max_time'] * 60)
+                    or (c['max_distance'] is not None and routes['length'][r] > c['max_distance'] * 1000)
+                    or (c['avoid_highways'] and highways[edges].any())):
+                continue
+            expected.append((costs[edges].sum() + simplicity * (turns[r] - len(edges)), r))
+        expected.sort()
+        feasible = row[row >= 0]
+        assert len(feasible) == min(4, len(expected))
+        np.testing.assert_allclose(row_scores[:len(feasible)], [cost for cost, _ in expected[:len(feasible)]],
+                                   rtol=1e-4, atol=1e-3)
+        assert np.all(np.isinf(row_scores[len(feasible):]))
+
+    # Zero preferences fall back to uniform weights; no constraints means everything is feasible
+    weights = preference_matrix([UserProfile(preferences={'time': 0.0})])
+    np.testing.assert_allclose(weights, 0.2)
+    indices, _ = top_k_routes(weights, routes, constraint_arrays([{}]), k=len(candidates) + 3)
+    assert sorted(indices[0].tolist()) == list(range(len(candidates)))
@@ -0,0 +1,253 @@
+import asyncio
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from route_recommendation.benchmarks.synthetic import synthetic_network, synthetic_pois, synthetic_profiles
+from route_recommendation.src.models.road_graph import RoadGraph
+from route_recommendation.src.routing.matrix import cost_matrix
+from route_recommendation.src.service.batching import MicroBatcher
+from route_recommendation.src.service.load_test import Connection, run_load_test
+from route_recommendation.src.service.server import RecommendationServer, RouteService, StaleEpoch
+from route_recommendation.src.service.shared_graph import TrafficChannel, attach_graph, share_graph
+from route_recommendation.src.service.workers import SharedRouteService
+
+
+def test_micro_batcher_batches_coalesces_and_isolates_errors():
+    calls = []
+    release = threading.Event()
+
+    def handler(items):
+        release.wait(timeout=5)
+        calls.append(list(items))
+        return [ValueError(f'bad {x}') if x < 0 else x * 10 for x in items]
+
+    async def run():
+        with ThreadPoolExecutor(2) as executor:
+            batcher = MicroBatcher(handler, executor, max_batch=4, max_delay=0.01)
+            first = asyncio.ensure_future(batcher.submit('a', 0))
+            await asyncio.sleep(0.05)  # first batch is running and blocked
+            tasks = [batcher.submit('a', x, coalesce=x) for x in [1, 2, 2, -1, 3, 4]]
+            tasks = [asyncio.ensure_future(t) for t in tasks]
+            await asyncio.sleep(0.05)
+            release.set()
+            results = await asyncio.gather(first, *tasks, return_exceptions=True)
+            return results, batcher.stats()
+
+    results, stats = asyncio.run(run())
+    assert results[0] == 0
+    assert results[1:4] == [10, 20, 20]
+    assert isinstance(results[4], ValueError) and results[5:] == [30, 40]
+    # Requests arriving while the handler was busy waited and were split at max_batch
+    assert calls == [[0], [1, 2, -1, 3], [4]]
+    assert stats['coalesced'] == 1 and stats['batches'] == 3
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    G = synthetic_network(3_000)
+    return RoadGraph.from_networkx(G), synthetic_pois(G, 200)
+
+
+@pytest.fixture
+def service(dataset):
+    # A fresh service per test: tests apply traffic and check epochs
+    graph, pois = dataset
+    return RouteService(graph, synthetic_profiles(8, history_length=0), pois)
+
+
+def _serve(service, scenario):
+    async def run():
+        server = await RecommendationServer(service, port=0, max_delay=0.005).start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_service_endpoints_match_the_engine(service):
+    graph = service.graph
+    rng = np.random.default_rng(0)
+    nodes = rng.choice(graph.n_nodes, size=12, replace=False)
+    points = np.column_stack([graph.node_y[nodes], graph.node_x[nodes]]).tolist()
+    user_id = next(iter(service.profiles))
+
+    async def scenario(server):
+        connections = [Connection(port=server.port) for _ in range(6)]
+        # Same origin, several destinations: concurrent requests share one batch
+        routes = await asyncio.gather(*(
+            c.request('POST', '/route', {'origin': points[0], 'destination': points[i + 1]})
+            for i, c in enumerate(connections)))
+        recommended = await connections[0].request(
+            'POST', '/recommend', {'user_id': user_id, 'origin': points[0], 'destination': points[7], 'k': 3})
+        matrix = await connections[0].request('POST', '/matrix', {'origins': points[:3], 'destinations': points[3:6]})
+        errors = [await connections[0].request('POST', '/route', {'origin': points[0]}),
+                  await connections[0].request('POST', '/recommend', {'user_id': 'nobody', 'origin': points[0],
+                                                                      'destination': points[1]}),
+                  await connections[0].request('GET', '/missing'),
+                  await connections[0].request('POST', '/recommend', {'user_id': user_id, 'origin': points[0],
+                                                                      'destination': points[1], 'k': 10_000})]
+        # A malformed Content-Length gets a 400 response, not a dropped connection
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        writer.write(b'POST /route HTTP/1.1\r\nContent-Length: -1\r\n\r\n')
+        await writer.drain()
+        bad_length = await reader.readline()
+        writer.close()
+        traffic = await connections[0].request('POST', '/traffic', {'edges': [0, 1], 'multipliers': [3.0, 3.0]})
+        _, health = await connections[0].request('GET', '/health')
+        for c in connections:
+            await c.close()
+        return routes, recommended, matrix, errors, bad_length, traffic, health
+
+    routes, recommended, matrix, errors, bad_length, traffic, health = _serve(service, scenario)
+
+    for i, (status, body) in enumerate(routes):
+        assert status == 200 and body['epoch'] == 0
+        expected = service.engine.route(int(nodes[0]), int(nodes[i + 1]))
+        assert body['route']['edges'] == expected['edges']
+        assert math.isclose(body['route']['cost'], expected['cost'], rel_tol=1e-6)
+    assert health['batching']['route']['batches'] < len(routes)
+
+    status, body = recommended
+    assert status == 200 and 1 <= len(body['routes']) <= 3
+    assert [r['rank'] for r in body['routes']] == list(range(1, len(body['routes']) + 1))
+    costs = [r['cost'] for r in body['routes']]
+    assert costs == sorted(costs)
+    assert all(r['nodes'][0] == nodes[0] and r['nodes'][-1] == nodes[7] for r in body['routes'])
+
+    status, body = matrix
+    expected = cost_matrix(graph, nodes[:3], nodes[3:6], processes=1)
+    assert status == 200 and np.allclose(body['matrix'], expected)
+
+    assert [status for status, _ in errors] == [400, 400, 404, 400]
+    assert bad_length.startswith(b'HTTP/1.1 400')
+    assert traffic == (200, {'epoch': 1}) and health['epoch'] == 1
+
+
+def test_batches_queued_before_a_traffic_update_are_requeued(service):
+    graph = service.graph
+    nodes = np.random.default_rng(3).choice(graph.n_nodes, size=2, replace=False)
+    request = {'origin_node': int(nodes[0]), 'destination_node': int(nodes[1]),
+               'preferences': {'time': 1.0}, 'constraints': {}, 'epoch': service.epoch}
+    with pytest.raises(StaleEpoch):
+        service.route_batch([dict(request, epoch=service.epoch - 1)])
+
+    first = service.route_batch([request])[0]['edges']
+    points = [[float(graph.node_y[n]), float(graph.node_x[n])] for n in nodes]
+
+    async def scenario(server):
+        handler = server.route_batcher.handler
+        runs = []
+
+        def slowed_first(items):
+            # Traffic changes after the batch was queued but before it runs
+            if not runs:
+                service.apply_traffic(first, np.full(len(first), 10.0, dtype=np.float32))
+            runs.append([item['epoch'] for item in items])
+            return handler(items)
+
+        server.route_batcher.handler = slowed_first
+        connection = Connection(port=server.port)
+        response = await connection.request('POST', '/route', {'origin': points[0], 'destination': points[1],
+                                                               'preferences': {'time': 1.0}})
+        await connection.close()
+        return response, runs
+
+    before = service.epoch
+    (status, body), runs = _serve(service, scenario)
+    assert status == 200 and runs == [[before], [before + 1]]
+    assert body['epoch'] == before + 1 == service.epoch
+    expected = service.engine.route(int(nodes[0]), int(nodes[1]), {'time': 1.0})
+    assert body['route']['edges'] == expected['edges'] != first
+
+
+def test_load_test_reports_latency_percentiles(service):
+    async def scenario(server):
+        return await run_load_test(port=server.port, endpoint='route', n_requests=60, concurrency=8)
+
+    report = _serve(service, scenario)
+    assert report['requests'] == 60 and report['errors'] == 0
+    assert 0 < report['p50_ms'] <= report['p99_ms'] <= report['max_ms']
+    assert report['throughput'] > 0
+
+
+def test_shared_graph_and_traffic_channel(service):
+    graph = service.graph
+    shared = share_graph(graph, {'scenery': service.engine.criteria['scenery']})
+    channel = TrafficChannel.create(graph.columns['current_travel_time'], version=3)
+    try:
+        attached, extra, view = attach_graph(shared.handle)
+        assert np.shares_memory(attached.edge_v, view.arrays['edge_v'])
+        assert not attached.edge_v.flags.writeable
+        assert (attached.indptr == graph.indptr).all() and attached.highway_categories == graph.highway_categories
+        assert np.array_equal(extra['scenery'], service.engine.criteria['scenery'])
+
+        reader = TrafficChannel.attach(channel.handle)
+        generation, version, values = reader.read()
+        assert (generation, version) == (0, 3) and reader.read(generation) is None
+        for step in range(1, 4):
+            channel.publish(graph.columns['current_travel_time'] * (step + 1), version=3 + step)
+            generation, version, values = reader.read(generation)
+            assert (generation, version) == (step, 3 + step)
+            assert np.allclose(values, graph.columns['current_travel_time'] * (step + 1))
+        view.close()
+        reader.close()
+    finally:
+        shared.unlink()
+        channel.unlink()
+
+
+def test_traffic_channel_reads_are_consistent_while_another_process_publishes():
+    context = multiprocessing.get_context('fork')
+    channel = TrafficChannel.create(np.zeros(200_000, dtype=np.float32), context=context)
+
+    def publish():
+        writer = TrafficChannel.attach(channel.handle)
+        for version in range(1, 200):
+            writer.publish(np.full(200_000, version, dtype=np.float32), version)
+
+    try:
+        writer = context.Process(target=publish)
+        writer.start()
+        generation, seen = None, 0
+        while writer.is_alive() or seen < 199:
+            update = channel.read(generation)
+            if update is None:
+                if not writer.is_alive():
+                    break
+                continue
+            generation, version, values = update
+            # Every read is one whole publish: uniform and matching its version
+            assert values.min() == values.max() == version
+            seen = version
+        writer.join()
+        assert writer.exitcode == 0 and channel.read()[1] == 199
+    finally:
+        channel.unlink()
+
+
+def test_worker_processes_route_on_the_shared_graph(service):
+    graph = service.graph
+    rng = np.random.default_rng(2)
+    nodes = rng.choice(graph.n_nodes, size=6, replace=False)
+    requests = [{'origin_node': int(o), 'destination_node': int(d), 'preferences': {'time': 1.0},
+                 'constraints': {}} for o, d in zip(nodes[:3], nodes[3:])]
+
+    with SharedRouteService(graph, processes=1) as pool:
+        assert len(pool.warm_up(delay=0)) == 1
+        for request, route in zip(requests, pool.route_batch(requests)):
+            assert route['edges'] == pool.engine.route(request['origin_node'], request['destination_node'])['edges']
+
+        # Make the first route's edges ten times slower: the workers must see it
+        slowed = pool.route_batch(requests[:1])[0]['edges']
+        pool.apply_traffic(slowed, np.full(len(slowed), 10.0, dtype=np.float32))
+        request = requests[0]
+        expected = pool.engine.route(request['origin_node'], request['destination_node'])
+        rerouted = pool.route_batch(requests[:1])[0]
+        assert rerouted['edges'] == expected['edges'] and rerouted['edges'] != slowed
+        assert math.isclose(rerouted['cost'], expected['cost'], rel_tol=1e-6)
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from route_recommendation.src.data.simulate_traffic import (
+    ROAD_CLASSES,
+    encode_road_types,
+    get_base_multiplier,
+    traffic_multiplier_matrix,
+    weekly_traffic_multipliers,
+)
+
+ROAD_TYPES = ['motorway', 'primary', 'secondary', 'tertiary', 'residential',
+              'unclassified', 'primary_link', ['residential', 'unclassified']]
+
+
+def test_lookup_table_matches_scalar_model():
+    codes = encode_road_types(ROAD_TYPES)
+    assert codes.max() < len(ROAD_CLASSES)
+
+    week = weekly_traffic_multipliers(codes, rng=0, dtype=np.float64)
+    for day in range(7):
+        for hour in range(24):
+            base = np.array([get_base_multiplier(t, hour, day) for t in ROAD_TYPES])
+            ratio = week[day * 24 + hour] / base
+            assert np.all((ratio >= 0.9) & (ratio <= 1.1))
+
+
+def test_matrix_shape_and_seed():
+    codes = encode_road_types(ROAD_TYPES * 10)
+    times = [datetime(2024, 2, 5, 8), datetime(2024, 2, 10, 15), datetime(2024, 2, 6, 23)]
+
+    first = traffic_multiplier_matrix(codes, times, rng=7)
+    second = traffic_multiplier_matrix(codes, times, rng=7)
+    assert first.shape == (3, len(codes))
+    assert first.dtype == np.float32
+    np.testing.assert_array_equal(first, second)
+
+
+def test_graph_traffic_on_road_graph():
+    from route_recommendation.src.data.simulate_traffic import simulate_graph_traffic
+    from route_recommendation.src.models.road_graph import RoadGraph
+
+    edges = pd.DataFrame({
+        'u': [1, 1, 2], 'v': [2, 3, 3], 'key': [0, 0, 0], 'osmid': [10, 11, "[12, 13]"],
+        'highway': ['primary', 'residential', "['unclassified', 'residential']"],
+        'length': [100.0, 50.0, 80.0], 'speed_kph': [50.0, 30.0, 30.0],
+        'travel_time': [7.2, 6.0, 9.6], 'lanes': ['2', None, "['1', '2']"], 'oneway': [True, False, False],
+    })
+    graph = simulate_graph_traffic(RoadGraph.from_edge_features(edges), datetime(2024, 2, 5, 18), rng=0)
+
+    ratio = graph.columns['traffic_multiplier'] / np.array([2.0, 1.0, 1.0])
+    assert np.all((ratio >= 0.9) & (ratio <= 1.1))
+    np.testing.assert_allclose(graph.columns['current_travel_time'],
+                               graph.columns['travel_time'] * graph.columns['traffic_multiplier'])
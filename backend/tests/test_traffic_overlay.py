@@ -0,0 +1,88 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from route_recommendation.src.data.traffic_overlay import TrafficOverlay
+from route_recommendation.src.models.road_graph import RoadGraph
+
+
+def _graph(n_edges=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    edges = {
+        'u': rng.integers(0, 200, n_edges), 'v': rng.integers(0, 200, n_edges), 'key': np.zeros(n_edges, int),
+        'osmid': np.arange(n_edges), 'highway': ['residential'] * n_edges,
+        'length': rng.uniform(20, 500, n_edges), 'speed_kph': np.full(n_edges, 50.0),
+        'travel_time': rng.uniform(2, 40, n_edges), 'lanes': np.ones(n_edges), 'oneway': np.ones(n_edges, bool),
+    }
+    return RoadGraph.from_edge_features(pd.DataFrame(edges))
+
+
+def test_deltas_are_copy_on_write():
+    graph = _graph()
+    overlay = TrafficOverlay(graph, block_size=100)
+    notified = []
+    overlay.subscribe(lambda snapshot, changed: notified.append((snapshot.version, sorted(changed))))
+
+    first = overlay.snapshot()
+    second = overlay.apply([5, 250, 5, 999], [1.5, 2.0, 1.8, 1.0])  # 999 is unchanged, 5 is set twice
+
+    assert (first.version, second.version, overlay.version) == (0, 1, 1)
+    assert notified == [(1, [5, 250])]
+    np.testing.assert_array_equal(first.multipliers(), np.ones(1000, np.float32))
+    np.testing.assert_allclose(second.multipliers([5, 250, 999]), [1.8, 2.0, 1.0])
+    np.testing.assert_allclose(second.current_travel_time([5]), graph.columns['travel_time'][5] * 1.8)
+
+    # Only the touched blocks were copied
+    shared = [a is b for a, b in zip(first._blocks, second._blocks)]
+    assert shared.count(False) == 2 and len(shared) == 10
+
+
+def test_change_history_and_eviction():
+    overlay = TrafficOverlay(_graph(), block_size=64, max_snapshots=3)
+    overlay.apply([1, 2], 1.5)
+    overlay.apply([2, 3], 2.0)
+    np.testing.assert_array_equal(overlay.changed_since(1), [2, 3])
+    np.testing.assert_array_equal(overlay.changed_since(0), [1, 2, 3])
+
+    overlay.apply([4], 1.2)
+    with pytest.raises(KeyError):
+        overlay.snapshot(0)
+    with pytest.raises(KeyError):
+        overlay.changed_since(0)
+    with pytest.raises(ValueError):
+        overlay.apply([1], 0.0)
+
+
+def test_save_as_graph_overlay(tmp_path):
+    graph = _graph()
+    graph_dir = str(tmp_path / 'toy.graph')
+    graph.save(graph_dir)
+
+    overlay = TrafficOverlay(graph)
+    overlay.apply([0, 10], [1.25, 0.5], metadata={'feed': 'test'})
+    overlay.save(graph_dir)
+
+    loaded = RoadGraph.load(graph_dir, overlay='traffic')
+    np.testing.assert_allclose(loaded.columns['traffic_multiplier'][[0, 10, 11]], [1.25, 0.5, 1.0])
+    np.testing.assert_allclose(loaded.columns['current_travel_time'][10], graph.columns['travel_time'][10] * 0.5)
+
+    resumed = TrafficOverlay.load(loaded, graph_dir)
+    assert resumed.version == 1
+    assert resumed.snapshot().multipliers()[0] == pytest.approx(1.25)
+
+
+def test_concurrent_deltas_notify_in_version_order():
+    overlay = TrafficOverlay(_graph(), block_size=100)
+    notified = []
+    overlay.subscribe(lambda snapshot, changed: notified.append(snapshot.version))
+    rng = np.random.default_rng(1)
+    deltas = [(rng.integers(0, 1000, 50), rng.uniform(1.1, 3.0, 50)) for _ in range(40)]
+    threads = [threading.Thread(target=lambda d=deltas[i::4]: [overlay.apply(*delta) for delta in d])
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert notified == list(range(1, 41)) and overlay.version == 40
@@ -0,0 +1,172 @@
+import json
+
+import numpy as np
+import pytest
+
+from route_recommendation.src.models.user_profile import PREFERENCE_KEYS, RouteTable, UserProfile
+
+
+def test_slotted_profile_keeps_dict_api_and_json_format(tmp_path):
+    user = UserProfile(preferences={'time': 0.7, 'safety': 0.3})
+    assert not hasattr(user, '__dict__')
+    assert user.preference_array.dtype == np.float32
+    assert dict(user.preferences) == pytest.approx({'time': 0.7, 'distance': 0.0, 'safety': 0.3,
+                                                    'scenery': 0.0, 'simplicity': 0.0})
+
+    # Writes through the dict view land in the vector
+    user.preferences['scenery'] = 0.25
+    assert user.preference_array[PREFERENCE_KEYS.index('scenery')] == np.float32(0.25)
+    with pytest.raises(KeyError):
+        user.preferences['noise'] = 1.0
+
+    commute = {'route_id': 0, 'nodes': [1, 2, 3]}
+    for hour in [8, 8, 17]:
+        user.add_route_to_history(1, 3, commute, [commute, {'route_id': 1}], {'hour': hour})
+    assert len(user.history) == 3
+    assert user.history[-1]['context'] == {'hour': 17}
+    assert len(user.history.table) == 6  # 2 end points, 2 routes and 2 contexts for 3 records
+    assert user.history.timestamps.dtype == np.int64
+
+    path = tmp_path / 'user.json'
+    user.save(str(path))
+    data = json.loads(path.read_text())
+    assert list(data['preferences']) == PREFERENCE_KEYS
+    assert data['history'][0] == {**user.history[0], 'alternatives': [commute, {'route_id': 1}]}
+
+    loaded = UserProfile.load(str(path))
+    assert loaded.history == user.history
+    assert loaded.preferences == pytest.approx(dict(user.preferences))
+
+
+def test_history_appends_while_timestamps_are_held():
+    user = UserProfile()
+    user.add_route_to_history(1, 2, {'route_id': 0}, [], {})
+    timestamps = user.history.timestamps
+    user.add_route_to_history(1, 2, {'route_id': 1}, [], {})
+    assert len(timestamps) == 1 and len(user.history.timestamps) == 2
+
+
+def test_preference_keys_are_fixed():
+    user = UserProfile(preferences={'time': 0.6, 'safety': 0.4})
+    with pytest.raises(TypeError):
+        user.preferences.pop('time')
+    with pytest.raises(TypeError):
+        del user.preferences['safety']
+    with pytest.raises(TypeError):
+        user.preferences.popitem()
+    assert user.preferences['time'] == pytest.approx(0.6)
+
+    user.preferences.clear()
+    assert list(user.preferences) == PREFERENCE_KEYS
+    assert not user.preference_array.any()
+
+
+def test_history_accepts_numpy_routes_and_keeps_utc_offsets():
+    from route_recommendation.benchmarks.synthetic import synthetic_network
+    from route_recommendation.src.models.preference_learning import record_features
+    from route_recommendation.src.models.road_graph import RoadGraph
+    from route_recommendation.src.models.scoring import route_feature_matrix
+    from route_recommendation.src.routing.engine import RoutingEngine
+
+    graph = RoadGraph.from_networkx(synthetic_network(400))
+    engine = RoutingEngine(graph)
+    routes = [engine.route(0, graph.n_nodes - 1), engine.route(0, graph.n_nodes // 2)]
+    features = route_feature_matrix(engine, [route['edges'] for route in routes])['features']
+    chosen = {'edges': np.asarray(routes[0]['edges']), 'features': features[0]}
+    alternative = {'edges': routes[1]['edges'], 'features': features[1], 'end': (np.int64(7), 8)}
+
+    user = UserProfile()
+    user.add_route_to_history(np.int64(0), np.int64(graph.n_nodes - 1), chosen, [alternative],
+                              {'hour': np.int32(8)})
+    record = user.history[0]
+    assert record['origin'] == 0 and record['context'] == {'hour': 8}
+    assert record['chosen_route']['edges'] == routes[0]['edges']
+    assert record['alternatives'][0]['end'] == [7, 8]
+    [(learned_chosen, learned_alternatives)] = record_features([record])
+    np.testing.assert_allclose(learned_chosen, features[0])
+    np.testing.assert_allclose(learned_alternatives, features[1:])
+
+    user.history = [{**record, 'timestamp': '2026-03-01T08:30:00+02:00'}, record]
+    assert user.history[0]['timestamp'] == '2026-03-01T08:30:00+02:00'
+    assert user.history[1]['timestamp'] == record['timestamp']
+
+
+def test_route_table_interns_equal_values():
+    table = RouteTable()
+    first = table.intern({'a': 1, 'b': [1, 2]})
+    assert table.intern({'b': [1, 2], 'a': 1}) == first
+    assert table.intern(None) != first
+    assert len(table) == 2 and table[first] == {'a': 1, 'b': [1, 2]}
+
+
+def test_history_records_are_copies():
+    user = UserProfile()
+    route, context = {'route_id': 0, 'nodes': [1, 2]}, {'hour': 8}
+    user.add_route_to_history(1, 2, route, [], context)
+    context['hour'] = 9
+    route['nodes'].append(3)
+    user.add_route_to_history(1, 2, route, [], context)
+    assert [r['context'] for r in user.history] == [{'hour': 8}, {'hour': 9}]
+    assert user.history[0]['chosen_route'] == {'route_id': 0, 'nodes': [1, 2]}
+
+    user.history[0]['context']['hour'] = 23
+    assert user.history[0]['context'] == {'hour': 8}
+    # Profiles only share a table when given one
+    assert UserProfile().history.table is not user.history.table
+
+
+def _simulated_users(count, records, seed=0):
+    """Users choosing the cheapest of 4 random routes under hidden weights"""
+    rng = np.random.default_rng(seed)
+    true_weights = rng.dirichlet(np.ones(len(PREFERENCE_KEYS)), size=count)
+    profiles = []
+    for weights in true_weights:
+        user = UserProfile()
+        for _ in range(records):
+            routes = rng.uniform(100, 1000, size=(4, len(PREFERENCE_KEYS)))
+            best = int(np.argmin(routes @ weights))
+            user.add_route_to_history(0, 1, {'features': routes[best].tolist()},
+                                      [{'features': r.tolist()} for i, r in enumerate(routes) if i != best], {})
+        profiles.append(user)
+    return profiles, true_weights
+
+
+def test_preference_learning_recovers_hidden_weights():
+    from route_recommendation.src.models.preference_learning import (
+        fit_preferences,
+        learn_from_record,
+        project_to_simplex,
+    )
+    from route_recommendation.src.models.profile_store import ProfileStore
+
+    projected = project_to_simplex([[0.5, 0.9, -0.2, 0.1, 0.0], [0.2] * 5])
+    np.testing.assert_allclose(projected.sum(axis=1), 1.0)
+    assert projected.min() >= 0 and np.allclose(projected[1], 0.2)
+
+    profiles, true_weights = _simulated_users(20, 40)
+
+    def error(weights):
+        return np.abs(weights - true_weights).sum(axis=1).mean()
+
+    before = error(np.array([p.preference_array for p in profiles]))
+    fitted = fit_preferences(profiles, update=False)
+    assert error(fitted) < before / 2
+    assert error(np.array([p.preference_array for p in profiles])) == before  # update=False
+
+    # A batch fit of one record for one epoch is exactly one online step
+    user = profiles[0]
+    single = UserProfile(preferences=dict(user.preferences))
+    single.history = user.history[:1]
+    step = fit_preferences([single], epochs=1, learning_rate=0.05, prior=0.0, update=False)[0]
+    with ProfileStore(':memory:') as store:
+        store.save_profile(user)
+        learn_from_record(user, user.history[0], learning_rate=0.05)
+        np.testing.assert_allclose(user.preference_array, step, atol=1e-6)
+        np.testing.assert_allclose(store.preference_matrix()[1][0], step, atol=1e-6)
+    user.store = None
+
+    # Replaying the history online also moves towards the hidden weights
+    for profile in profiles:
+        for record in profile.history:
+            learn_from_record(profile, record)
+    assert error(np.array([p.preference_array for p in profiles])) < before